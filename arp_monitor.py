@@ -0,0 +1,272 @@
+"""
+This program was written by Yonatan Deri.
+It follows the PEP8 guidelines.
+
+Description:
+    This file serves as a module in the network_visualizer project.
+    It implements the passive discovery mode: instead of sweeping subnets, it listens to the ARP traffic
+    (requests, replies and gratuitous announcements) on every active interface, and optionally to DHCP
+    acknowledgements, keeping the set of devices up to date. Changes are published as join/leave/change events
+    on a bounded queue, consumed by the GUI and the CLI. Linux only, requires root.
+
+License:
+    This program is under the GNU GPLv3 License.
+"""
+
+import ipaddress
+import queue
+import select
+import threading
+import time
+from typing import NamedTuple, Optional
+
+# Imports of Self-Made files
+import arp_scan
+import raw_arp
+
+JOIN = "join"
+LEAVE = "leave"
+CHANGE = "change"  # Same IP, different MAC (a replaced device, or possibly ARP spoofing)
+
+LEAVE_AFTER = 15 * 60  # Seconds without traffic after which a device is considered gone
+EXPIRE_INTERVAL = 5  # Seconds between two checks for gone devices
+POLL_INTERVAL = 0.5  # Maximum seconds between two checks of the stop request
+EVENT_QUEUE_SIZE = 10000
+
+
+class DeviceEvent(NamedTuple):
+    """
+    A change of the set of devices seen by the monitor.
+    """
+    kind: str  # JOIN, LEAVE or CHANGE
+    network: ipaddress.IPv4Network
+    ip: str
+    mac: str
+    timestamp: float
+    previous_mac: Optional[str] = None
+
+
+def put_dropping_oldest(events: queue.Queue, event) -> int:
+    """
+    Puts an event on a bounded queue, dropping the oldest events while the queue is full.
+    :param events: the queue.
+    :param event: the event.
+    :return int: the number of events dropped.
+    """
+    dropped = 0
+    while True:
+        try:
+            events.put_nowait(event)
+            return dropped
+        except queue.Full:
+            try:
+                events.get_nowait()
+                dropped += 1
+            except queue.Empty:
+                pass
+
+
+class ArpMonitor:
+    """
+    Passive device discovery, by sniffing ARP (and optionally DHCP) traffic.
+    Events are put on the bounded `events` queue; when it is full, the oldest events are dropped (and counted
+    in `dropped_events`) so a slow consumer never blocks the capture.
+    """
+
+    def __init__(self, interfaces: Optional[list] = None, leave_after: float = LEAVE_AFTER,
+                 gratuitous: bool = True, dhcp: bool = False, queue_size: int = EVENT_QUEUE_SIZE):
+        """
+        :param interfaces: (interface, subnet) tuples to listen on. Defaults to arp_scan.get_active_interfaces().
+        :param leave_after: seconds without traffic after which a device is reported as gone.
+        :param gratuitous: whether gratuitous ARP announcements are taken into account.
+        :param dhcp: whether DHCP acknowledgements are sniffed too (through scapy).
+        :param queue_size: maximum number of events waiting on the queue.
+        """
+        self.interfaces = interfaces
+        self.leave_after = leave_after
+        self.gratuitous = gratuitous
+        self.dhcp = dhcp
+        self.events = queue.Queue(maxsize=queue_size)
+        self.dropped_events = 0
+        self._devices = {}  # (network, ip) -> [mac, last_seen]
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._dhcp_sniffers = []
+
+    def start(self) -> None:
+        """
+        Starts listening, in a background thread.
+        :return None:
+        """
+        interfaces = self.interfaces if self.interfaces is not None else arp_scan.get_active_interfaces()
+        sockets = {}
+        try:
+            for iface, network in interfaces:
+                sockets[raw_arp.open_socket(iface)] = ipaddress.ip_network(str(network), strict=False)
+        except OSError:
+            for sock in sockets:
+                sock.close()
+            raise
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._capture, args=(sockets,), name="arp_monitor", daemon=True)
+        self._thread.start()
+        if self.dhcp:
+            self._start_dhcp_sniffers([iface for iface, _ in interfaces], list(sockets.values()))
+
+    def stop(self) -> None:
+        """
+        Stops listening.
+        :return None:
+        """
+        self._stop.set()
+        for sniffer in self._dhcp_sniffers:
+            sniffer.stop(join=False)
+        self._dhcp_sniffers = []
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def running(self) -> bool:
+        """
+        Whether the monitor is listening.
+        :return bool:
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def seed(self, network, devices: [(str, str)], seen_at: Optional[float] = None) -> None:
+        """
+        Adds devices known from another source (e.g. a sweep), so they are not reported as joining.
+        :param network: the subnet of the devices.
+        :param devices: (ip, mac) tuples.
+        :param seen_at: when the devices were seen (UNIX timestamp). Defaults to now.
+        :return None:
+        """
+        seen_at = time.time() if seen_at is None else seen_at
+        network = ipaddress.ip_network(str(network), strict=False)
+        with self._lock:
+            for ip, mac in devices:
+                self._devices[(network, ip)] = [mac, seen_at]
+
+    def devices(self) -> {ipaddress.IPv4Network: [(str, str)]}:
+        """
+        Gets the devices currently considered present.
+        :return dict: subnet -> (ip, mac) tuples.
+        """
+        devices = {}
+        with self._lock:
+            for (network, ip), (mac, _) in self._devices.items():
+                devices.setdefault(network, []).append((ip, mac))
+        return devices
+
+    def observe(self, network, ip: str, mac: str, timestamp: Optional[float] = None) -> None:
+        """
+        Records that a device was seen, publishing a JOIN or CHANGE event if it is new or changed its MAC.
+        :param network: the subnet the device was seen in.
+        :param ip: the IP address of the device.
+        :param mac: the MAC address of the device.
+        :param timestamp: when the device was seen (UNIX timestamp). Defaults to now.
+        :return None:
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        if not isinstance(network, ipaddress.IPv4Network):
+            network = ipaddress.ip_network(str(network), strict=False)
+        key = (network, ip)
+        with self._lock:
+            known = self._devices.get(key)
+            self._devices[key] = [mac, timestamp]
+        if known is None:
+            self._emit(DeviceEvent(JOIN, network, ip, mac, timestamp))
+        elif known[0] != mac:
+            self._emit(DeviceEvent(CHANGE, network, ip, mac, timestamp, previous_mac=known[0]))
+
+    def expire(self, now: Optional[float] = None) -> None:
+        """
+        Removes the devices not seen for leave_after seconds, publishing a LEAVE event for each of them.
+        :param now: the current time (UNIX timestamp). Defaults to now.
+        :return None:
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            gone = [(key, mac) for key, (mac, last_seen) in self._devices.items()
+                    if now - last_seen >= self.leave_after]
+            for key, _ in gone:
+                del self._devices[key]
+        for (network, ip), mac in gone:
+            self._emit(DeviceEvent(LEAVE, network, ip, mac, now))
+
+    def _emit(self, event: DeviceEvent) -> None:
+        """
+        Puts an event on the queue, dropping the oldest one if the queue is full.
+        :param event: the event.
+        :return None:
+        """
+        self.dropped_events += put_dropping_oldest(self.events, event)
+
+    def _capture(self, sockets: dict) -> None:
+        """
+        Reads the ARP frames of every interface until stopped, checking for gone devices periodically.
+        :param sockets: socket -> subnet of its interface.
+        :return None:
+        """
+        view = memoryview(bytearray(raw_arp.MAX_FRAME_SIZE))
+        last_expire = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                ready, _, _ = select.select(list(sockets), [], [], POLL_INTERVAL)
+                for sock in ready:
+                    self._read_socket(sock, sockets[sock], view)
+                if time.monotonic() - last_expire >= EXPIRE_INTERVAL:
+                    self.expire()
+                    last_expire = time.monotonic()
+        finally:
+            for sock in sockets:
+                sock.close()
+
+    def _read_socket(self, sock, network: ipaddress.IPv4Network, view: memoryview) -> None:
+        """
+        Processes every ARP frame waiting on a socket.
+        :param sock: socket opened with raw_arp.open_socket().
+        :param network: the subnet of the socket's interface.
+        :param view: memoryview over the buffer frames are read into.
+        :return None:
+        """
+        first, last = int(network.network_address), int(network.broadcast_address)
+        while True:
+            try:
+                size = sock.recv_into(view)
+            except BlockingIOError:
+                return
+            frame = raw_arp.parse_frame(view, size)
+            if frame is None:
+                continue
+            _, sender, sender_mac, target = frame
+            if not first <= sender <= last:  # Also skips ARP probes, sent from 0.0.0.0
+                continue
+            if sender == target and not self.gratuitous:
+                continue
+            self.observe(network, str(ipaddress.IPv4Address(sender)), sender_mac.hex(':'))
+
+    def _start_dhcp_sniffers(self, ifaces: [str], networks: [ipaddress.IPv4Network]) -> None:
+        """
+        Starts sniffing DHCP acknowledgements, which announce the address leased to a device.
+        :param ifaces: the interfaces to sniff on.
+        :param networks: the subnets of the interfaces.
+        :return None:
+        """
+        from scapy.sendrecv import AsyncSniffer
+        from scapy.layers.dhcp import BOOTP, DHCP
+
+        def handle(packet) -> None:
+            if DHCP not in packet or ('message-type', 5) not in packet[DHCP].options:
+                return
+            ip = ipaddress.ip_address(packet[BOOTP].yiaddr)
+            for network in networks:
+                if ip in network:
+                    self.observe(network, str(ip), bytes(packet[BOOTP].chaddr[:6]).hex(':'))
+
+        for iface in ifaces:
+            sniffer = AsyncSniffer(iface=iface, filter="udp and (port 67 or port 68)", prn=handle, store=False)
+            sniffer.start()
+            self._dhcp_sniffers.append(sniffer)
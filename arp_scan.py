@@ -9,18 +9,55 @@ License:
     This program is under the GNU GPLv3 License.
 """
 
+from __future__ import annotations
+
 import netifaces
-import scapy.all as scapy
-from scapy.layers.l2 import ARP, Ether
 import ipaddress
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, NamedTuple, Optional
 
+if TYPE_CHECKING:
+    # scapy takes seconds to import, so it is only imported by the functions sending packets (on first scan)
+    import scapy.all as scapy
 
-def get_active_networks() -> []:
+# Imports of Self-Made files
+import metrics
+import raw_arp
+
+DEFAULT_TIMEOUT = 1
+PROBE_TIMEOUT = 0.3
+BROADCAST_MAC = 'ff:ff:ff:ff:ff:ff'
+
+# Ranges with more addresses than this are scanned with sweep() instead of a single srp() call
+SWEEP_THRESHOLD = 1024
+SWEEP_CHUNK_SIZE = 256
+SWEEP_RATE_LIMIT = 2000  # Packets per second
+SWEEP_RETRIES = 2
+SWEEP_MIN_TIMEOUT = 0.2
+SWEEP_TIMEOUT_RTT_FACTOR = 3
+
+# "scapy" builds and matches scapy packets, "raw" sends prebuilt frames over an AF_PACKET socket (Linux only)
+ENGINES = ("scapy", "raw")
+DEFAULT_ENGINE = "scapy"
+
+
+class SubnetScanResult(NamedTuple):
     """
-    Get active subnets inside a network of the current device.
-    :return list: list, containing all active subnets inside the local network of the current device.
+    Result of scanning a single subnet, as yielded by scan_concurrently.
     """
-    networks = []
+    network: ipaddress.IPv4Network
+    devices: [(str, str)]
+    elapsed: float
+    error: Optional[Exception] = None  # Why the scan failed (then devices is empty), None if it succeeded
+
+
+def get_active_interfaces() -> [(str, ipaddress.IPv4Network)]:
+    """
+    Get the active interfaces of the current device, together with the subnet each one is attached to.
+    :return list: list of (interface name, subnet) tuples, excluding the loopback interface.
+    """
+    active_interfaces = []
     interfaces = netifaces.interfaces()
     for interface in interfaces:
         addresses = netifaces.ifaddresses(interface)
@@ -31,19 +68,261 @@ def get_active_networks() -> []:
                 continue
             subnet_mask = ipv4_info['netmask']
             network = ipaddress.ip_network(f"{ip}/{subnet_mask}", strict=False)
-            networks.append(network)
-    return networks
+            active_interfaces.append((interface, network))
+    return active_interfaces
 
 
-def scan(ip_range) -> scapy.SndRcvList:
+def get_active_networks() -> []:
+    """
+    Get active subnets inside a network of the current device.
+    :return list: list, containing all active subnets inside the local network of the current device.
+    """
+    return [network for _, network in get_active_interfaces()]
+
+
+def get_local_address(ip_range) -> Optional[str]:
+    """
+    Get the IPv4 address of the current device inside an ip range.
+    :param ip_range: the ip range (subnet).
+    :return str: the address, or None if no interface of the current device is attached to the ip range.
+    """
+    network = ipaddress.ip_network(str(ip_range), strict=False)
+    for interface in netifaces.interfaces():
+        for address in netifaces.ifaddresses(interface).get(netifaces.AF_INET, []):
+            if ipaddress.ip_address(address['addr']) in network:
+                return address['addr']
+    return None
+
+
+def get_gateways() -> [str]:
+    """
+    Get the IPv4 gateways of the current device.
+    :return list: list, containing the ip addresses of all IPv4 gateways (default ones first).
+    """
+    gateways = netifaces.gateways()
+    default = gateways.get('default', {}).get(netifaces.AF_INET)
+    addresses = [default[0]] if default else []
+    for gateway, _, _ in gateways.get(netifaces.AF_INET, []):
+        if gateway not in addresses:
+            addresses.append(gateway)
+    return addresses
+
+
+def scan(ip_range, iface: Optional[str] = None, timeout: float = DEFAULT_TIMEOUT) -> scapy.SndRcvList:
     """
     Scans an ip range for discovering active devices in it.
+    Ranges larger than SWEEP_THRESHOLD addresses are scanned in chunks, using sweep().
     :param ip_range:
+    :param iface: interface to send the requests on. If None, scapy picks it according to its routing table.
+    :param timeout: how much time (in seconds) to wait for replies after the last request has been sent.
     :return scapy.SndRcvList: list, containing all devices discovered in the network.
     """
+    import scapy.all as scapy
+    from scapy.layers.l2 import ARP, Ether
+
+    if ipaddress.ip_network(str(ip_range), strict=False).num_addresses > SWEEP_THRESHOLD:
+        return scapy.SndRcvList(list(sweep(ip_range, iface=iface, timeout=timeout)))
+
     request = ARP(pdst=str(ip_range))
-    broadcast = Ether(dst='ff:ff:ff:ff:ff:ff')
+    broadcast = Ether(dst=BROADCAST_MAC)
     request_broadcast = broadcast / request
 
-    clients = scapy.srp(request_broadcast, timeout=1, verbose=False)[0]
+    clients, unanswered = scapy.srp(request_broadcast, iface=iface, timeout=timeout, verbose=False)
+    _record_answers(clients, len(clients) + len(unanswered))
     return clients
+
+
+def sweep(ip_range, iface: Optional[str] = None, chunk_size: int = SWEEP_CHUNK_SIZE,
+          rate_limit: Optional[float] = SWEEP_RATE_LIMIT, timeout: float = DEFAULT_TIMEOUT,
+          retries: int = SWEEP_RETRIES) -> Iterator[scapy.QueryAnswer]:
+    """
+    Scans an ip range (or specific hosts) chunk by chunk, for ranges too large to be sent as a single burst
+    (/16 and wider).
+
+    Only one chunk of requests is built at a time, so memory stays flat regardless of the range size.
+    The timeout of every chunk adapts to the round trip times measured on the previous chunks, and hosts
+    that did not answer are asked again (with a doubled timeout) up to `retries` times.
+
+    :param ip_range: the ip range (subnet) to scan, or an iterable of ip addresses.
+    :param iface: interface to send the requests on. If None, scapy picks it according to its routing table.
+    :param chunk_size: number of requests sent in every chunk.
+    :param rate_limit: maximum number of requests sent per second. None for no limit.
+    :param timeout: initial (and maximum) timeout, in seconds, of a chunk.
+    :param retries: how many times hosts that did not answer are asked again.
+    :return Iterator[scapy.QueryAnswer]: (sent, received) pairs of every device discovered, chunk after chunk.
+    """
+    import scapy.all as scapy
+    from scapy.layers.l2 import ARP, Ether
+
+    inter = 1 / rate_limit if rate_limit else 0
+    chunk_timeout = timeout
+    for targets in _chunks(ip_range, chunk_size):
+        attempt_timeout = chunk_timeout
+        for attempt in range(retries + 1):
+            request_broadcast = Ether(dst=BROADCAST_MAC) / ARP(pdst=targets)
+            answered, unanswered = scapy.srp(request_broadcast, iface=iface, timeout=attempt_timeout,
+                                             inter=inter, verbose=False)
+            _record_answers(answered, len(targets), retry=attempt > 0)
+            yield from answered
+
+            chunk_timeout = _adapt_timeout(answered, chunk_timeout, timeout)
+            targets = [request[ARP].pdst for request in unanswered]
+            if not targets:
+                break
+            attempt_timeout = min(attempt_timeout * 2, timeout)
+
+
+def _chunks(ip_range, chunk_size: int) -> Iterator[list]:
+    """
+    Splits an ip range (or an iterable of ip addresses) into lists of at most chunk_size addresses, lazily.
+    :param ip_range: the ip range (subnet) to split, or an iterable of ip addresses.
+    :param chunk_size: maximum number of addresses in every chunk.
+    :return Iterator[list]: lists of host addresses (as strings).
+    """
+    if isinstance(ip_range, (str, ipaddress.IPv4Network)):
+        ip_range = ipaddress.ip_network(str(ip_range), strict=False).hosts()
+    chunk = []
+    for host in ip_range:
+        chunk.append(str(host))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _record_answers(answered: scapy.SndRcvList, sent: int, retry: bool = False) -> None:
+    """
+    Records the requests sent and the replies received by the scapy engine in the metrics.
+    :param answered: the answers received.
+    :param sent: the number of requests sent.
+    :param retry: whether the requests were sent again, to hosts that did not answer.
+    :return None:
+    """
+    metrics.ARP_REQUESTS_SENT.inc(sent, engine="scapy")
+    metrics.ARP_REPLIES_RECEIVED.inc(len(answered), engine="scapy")
+    if retry:
+        metrics.ARP_RETRIES.inc(sent, engine="scapy")
+    for sent_packet, received in answered:
+        if sent_packet.sent_time is not None:
+            metrics.ARP_REPLY_LATENCY.observe(float(received.time - sent_packet.sent_time), engine="scapy")
+
+
+def _adapt_timeout(answered: scapy.SndRcvList, current: float, maximum: float) -> float:
+    """
+    Computes the timeout of the next chunk, from the round trip times of the answers to the last one.
+    :param answered: the answers received for the last chunk.
+    :param current: the timeout currently used.
+    :param maximum: upper bound for the timeout.
+    :return float: the timeout for the next chunk. Unchanged if no round trip time could be measured.
+    """
+    rtts = [received.time - sent.sent_time for sent, received in answered if sent.sent_time is not None]
+    if not rtts:
+        return current
+    max_rtt = float(max(rtts))
+    return min(max(max_rtt * SWEEP_TIMEOUT_RTT_FACTOR, SWEEP_MIN_TIMEOUT), maximum)
+
+
+def discover(ip_range, iface: Optional[str] = None, timeout: float = DEFAULT_TIMEOUT,
+             engine: str = DEFAULT_ENGINE) -> [(str, str)]:
+    """
+    Scans an ip range with the given engine, returning the discovered devices in an engine independent form.
+    :param ip_range: the ip range (subnet) to scan.
+    :param iface: interface to send the requests on. Required by the "raw" engine, looked up if None.
+    :param timeout: how much time (in seconds) to wait for replies after the last request has been sent.
+    :param engine: one of ENGINES.
+    :return list: (ip, mac) tuples of every device discovered.
+    """
+    start_time = time.perf_counter()
+    network = ipaddress.ip_network(str(ip_range), strict=False)
+    if engine == "scapy":
+        devices = [(received.psrc, received.hwsrc) for _, received in scan(ip_range, iface=iface, timeout=timeout)]
+    elif engine == "raw":
+        large = network.num_addresses > SWEEP_THRESHOLD
+        devices = raw_arp.scan(ip_range, iface or get_interface_of(ip_range), timeout=timeout,
+                               rate_limit=SWEEP_RATE_LIMIT if large else None,
+                               retries=SWEEP_RETRIES if large else 0)
+    else:
+        raise ValueError(f"Unknown scan engine: {engine}, expected one of {ENGINES}")
+    first, last = raw_arp.host_range(network)
+    metrics.observe_scan(network, "discover", last - first + 1, len(devices), time.perf_counter() - start_time)
+    return devices
+
+
+def probe(hosts: Iterable, iface: Optional[str] = None, timeout: float = PROBE_TIMEOUT,
+          engine: str = DEFAULT_ENGINE, subnet=None, kind: str = "probe") -> [(str, str)]:
+    """
+    Asks specific hosts (e.g. already known devices) whether they are up, instead of sweeping a whole range.
+    :param hosts: ip addresses of the hosts.
+    :param iface: interface to send the requests on. Required by the "raw" engine, looked up if None.
+    :param timeout: how much time (in seconds) to wait for replies after the last request has been sent.
+    :param engine: one of ENGINES.
+    :param subnet: the subnet of the hosts, labelling the metrics of the probe (unlabelled if None).
+    :param kind: labels the metrics of the probe, e.g. "sweep" when the hosts are the rest of a range.
+    :return list: (ip, mac) tuples of every host that answered.
+    """
+    hosts = [str(host) for host in hosts]
+    if not hosts:
+        return []
+    start_time = time.perf_counter()
+    if engine == "scapy":
+        devices = [(received.psrc, received.hwsrc)
+                   for _, received in sweep(hosts, iface=iface, timeout=timeout, retries=0)]
+    elif engine == "raw":
+        devices = raw_arp.scan(hosts, iface or get_interface_of(hosts[0]), timeout=timeout,
+                               rate_limit=SWEEP_RATE_LIMIT)
+    else:
+        raise ValueError(f"Unknown scan engine: {engine}, expected one of {ENGINES}")
+    metrics.observe_scan(subnet or "", kind, len(hosts), len(devices), time.perf_counter() - start_time)
+    return devices
+
+
+def get_interface_of(ip_range) -> str:
+    """
+    Gets the name of the active interface attached to an ip range.
+    :param ip_range: the ip range (subnet).
+    :return str: the interface name.
+    """
+    network = ipaddress.ip_network(str(ip_range), strict=False)
+    for interface, interface_network in get_active_interfaces():
+        if interface_network.overlaps(network):
+            return interface
+    raise ValueError(f"No active interface is attached to {network}")
+
+
+def scan_concurrently(targets: Iterable, timeout: float = DEFAULT_TIMEOUT, max_workers: Optional[int] = None,
+                      engine: str = DEFAULT_ENGINE,
+                      scan_function: Optional[Callable] = None) -> Iterator[SubnetScanResult]:
+    """
+    Scans several subnets at the same time, each one in its own worker thread.
+
+    Results are yielded as soon as each subnet finishes, so the overall wall-clock time is bounded by the
+    slowest subnet instead of the sum of all of them (as it is when calling scan() in a loop).
+    A subnet whose scan raises is yielded with the exception as its error, so the other subnets still are.
+
+    :param targets: subnets to scan, or (interface, subnet) tuples as returned by get_active_interfaces().
+    :param timeout: reply timeout (in seconds) of every single subnet scan.
+    :param max_workers: maximum number of subnets scanned at the same time. Defaults to the number of targets.
+    :param engine: one of ENGINES.
+    :param scan_function: scans a single subnet, called as scan_function(network, iface=, timeout=, engine=)
+                          and returning (ip, mac) tuples. Defaults to discover().
+    :return Iterator[SubnetScanResult]: the scan result of every subnet, in order of completion.
+    """
+    targets = [target if isinstance(target, tuple) else (None, target) for target in targets]
+    if not targets:
+        return
+    scan_function = scan_function or discover
+
+    def timed_scan(iface, network) -> SubnetScanResult:
+        start_time = time.perf_counter()
+        try:
+            devices = scan_function(network, iface=iface, timeout=timeout, engine=engine)
+        except Exception as error:
+            return SubnetScanResult(network, [], time.perf_counter() - start_time, error)
+        return SubnetScanResult(network, devices, time.perf_counter() - start_time)
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(targets),
+                            thread_name_prefix="arp_scan") as executor:
+        futures = [executor.submit(timed_scan, iface, network) for iface, network in targets]
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,241 @@
+"""
+This program was written by Yonatan Deri.
+It follows the PEP8 guidelines.
+
+Description:
+    This file serves as a benchmark in the network_visualizer project.
+    It is a reproducible benchmark suite needing neither root nor a real LAN:
+     - scan: the raw engine of raw_arp.py sweeps simulated /24, /20 and /16 subnets (see simulated_network.py),
+       with a configurable density of live hosts, reply latency, jitter and loss. For every subnet it records
+       the sweep time (median of --repeat runs), the accuracy (share of the live hosts found, and devices
+       reported that do not exist or with a wrong MAC address) and the peak memory allocated by the sweep
+       (traced with tracemalloc, in a separate run).
+     - render: the topology, layout and canvas render times of render_benchmark.py for every layout and size
+       (render times need a display, otherwise only the topology and layout times are measured).
+    The results are compared with a stored baseline (benchmarks/baseline.json by default), and the program
+    exits with status 1 if a time or the peak memory grew, or the accuracy dropped, beyond the tolerance.
+    Timings depend on the machine: save a baseline of your own (--save-baseline) before comparing changes.
+
+    Usage: python benchmarks/benchmark_suite.py [--prefixes 24 20 16] [--density 0.25] [--latency 0.002]
+                                                [--jitter 0.001] [--loss 0.01] [--retries 1] [--repeat 3]
+                                                [--render-sizes 100 1000 10000] [--headless]
+                                                [--baseline PATH] [--save-baseline] [--tolerance 0.25] [--json]
+
+License:
+    This program is under the GNU GPLv3 License.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+import tkinter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+# Imports of Self-Made files
+import layouts  # noqa: E402
+import raw_arp  # noqa: E402
+import render_benchmark  # noqa: E402
+from simulated_network import SimulatedNetwork  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "baseline.json")
+SCAN_NETWORK = "10.0.0.0"
+
+# Measurements compared with the baseline
+COMPARED = {"time", "memory_peak", "recall", "false_devices", "topology_time", "layout_time", "star_render_time",
+            "viewport_render_time"}
+ACCURACY_TOLERANCE = 0.01  # Absolute tolerance of the recall
+MIN_TIME_DIFFERENCE = 0.001  # Time differences below it (in seconds) are noise, never regressions
+RENDER_TIMES = ["topology_time", "layout_time", "star_render_time", "viewport_render_time"]
+
+
+def benchmark_scan(prefix: int, args: argparse.Namespace) -> dict:
+    """
+    Sweeps a simulated subnet with the raw engine.
+    :param prefix: the prefix length of the subnet.
+    :param args: the parsed command line arguments.
+    :return dict: the measurements.
+    """
+    subnet = f"{SCAN_NETWORK}/{prefix}"
+    first, last = raw_arp.host_range(subnet)
+    hosts = args.hosts if args.hosts is not None else round((last - first + 1) * args.density)
+    network = SimulatedNetwork(subnet, hosts, latency=args.latency, jitter=args.jitter, loss=args.loss,
+                               seed=args.seed)
+
+    def sweep() -> [(str, str)]:
+        return raw_arp.scan_socket(network.socket, *network.source, network.subnet, timeout=args.timeout,
+                                   retries=args.retries)
+
+    times = []
+    devices = []
+    for _ in range(args.repeat):
+        with network:
+            start_time = time.perf_counter()
+            devices = sweep()
+            times.append(time.perf_counter() - start_time)
+    with network:
+        tracemalloc.start()
+        sweep()
+        _, memory_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    expected = network.devices()
+    found = set(devices)
+    return {"subnet": subnet, "addresses": last - first + 1, "hosts": len(expected), "time": statistics.median(times),
+            "found": len(found & expected), "recall": len(found & expected) / len(expected) if expected else 1.0,
+            "false_devices": len(found - expected), "memory_peak": memory_peak}
+
+
+def benchmark_render(count: int, layout: str, canvas, image, repeat: int) -> dict:
+    """
+    Measures the topology, layout and render times of a synthetic subnet (medians of the runs).
+    :param count: the number of devices.
+    :param layout: name of the layout, one of layouts.LAYOUTS.
+    :param canvas: the canvas to draw on, or None to skip the render times.
+    :param image: the image drawn for every device.
+    :param repeat: the number of runs.
+    :return dict: the measurements.
+    """
+    runs = [render_benchmark.benchmark(count, layout, canvas, image, all_pairs_limit=0) for _ in range(repeat)]
+    result = {"devices": count, "layout": layout, "viewport_items": runs[0]["viewport_items"]}
+    for key in RENDER_TIMES:
+        values = [run[key] for run in runs if run[key] is not None]
+        result[key] = statistics.median(values) if values else None
+    return result
+
+
+def flatten(results: dict) -> {str: float}:
+    """
+    Flattens results into the compared measurements.
+    :param results: results of the suite.
+    :return dict: "scan <subnet> <measurement>" / "render <layout> <devices> <measurement>" -> value.
+    """
+    values = {}
+    for result in results["scan"]:
+        for key in COMPARED & result.keys():
+            values[f"scan {result['subnet']} {key}"] = result[key]
+    for result in results["render"]:
+        for key in COMPARED & result.keys():
+            values[f"render {result['layout']} {result['devices']} {key}"] = result[key]
+    return {name: value for name, value in values.items() if value is not None}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> [(str, float, float, bool)]:
+    """
+    Compares results with a baseline.
+    :param results: results of the suite.
+    :param baseline: results of the suite stored as the baseline.
+    :param tolerance: allowed relative growth of times and memory.
+    :return list: (measurement, baseline value, current value, whether it regressed) tuples.
+    """
+    current, previous = flatten(results), flatten(baseline)
+    rows = []
+    for name in sorted(current.keys() & previous.keys()):
+        key = name.rsplit(" ", 1)[1]
+        if key == "recall":
+            regressed = current[name] < previous[name] - ACCURACY_TOLERANCE
+        elif key == "false_devices":
+            regressed = current[name] > previous[name]
+        elif key == "memory_peak":
+            regressed = current[name] > previous[name] * (1 + tolerance)
+        else:
+            regressed = current[name] > max(previous[name] * (1 + tolerance), previous[name] + MIN_TIME_DIFFERENCE)
+        rows.append((name, previous[name], current[name], regressed))
+    return rows
+
+
+def main() -> None:
+    """
+    Runs the suite, prints the results and their comparison with the baseline, exiting with status 1 on a
+    regression.
+    :return None:
+    """
+    parser = argparse.ArgumentParser(description="Benchmark scans of simulated networks and the rendering.")
+    parser.add_argument("--prefixes", type=int, nargs="+", default=[24, 20, 16], help="subnets to sweep")
+    parser.add_argument("--density", type=float, default=0.25, help="share of the addresses that are live hosts")
+    parser.add_argument("--hosts", type=int, help="number of live hosts in every subnet (overrides --density)")
+    parser.add_argument("--latency", type=float, default=0.002, help="mean reply latency, in seconds")
+    parser.add_argument("--jitter", type=float, default=0.001, help="maximum deviation of the latency")
+    parser.add_argument("--loss", type=float, default=0.01, help="probability that a request is lost")
+    parser.add_argument("--timeout", type=float, default=0.2, help="reply timeout of the sweeps, in seconds")
+    parser.add_argument("--retries", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (the median is kept)")
+    parser.add_argument("--render-sizes", type=int, nargs="*", default=[100, 1000, 10000])
+    parser.add_argument("--layouts", nargs="*", choices=list(layouts.LAYOUTS), default=list(layouts.LAYOUTS))
+    parser.add_argument("--headless", action="store_true", help="do not draw, only measure topology and layouts")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline file (default: %(default)s)")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative growth of times/memory")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    canvas = image = None
+    if not args.headless:
+        try:
+            root = tkinter.Tk()
+            canvas = tkinter.Canvas(root, width=700, height=479)
+            canvas.pack()
+            image = tkinter.PhotoImage(file=render_benchmark.IMAGE_PATH)
+        except tkinter.TclError:
+            print("No display available, measuring the topology and layouts only.", file=sys.stderr)
+
+    settings = {name: getattr(args, name) for name in ("density", "hosts", "latency", "jitter", "loss", "timeout",
+                                                       "retries", "seed", "repeat")}
+    results = {"machine": {"python": platform.python_version(), "platform": platform.platform(),
+                           "processor": platform.machine(), "cpus": os.cpu_count()},
+               "settings": settings, "display": canvas is not None,
+               "scan": [benchmark_scan(prefix, args) for prefix in args.prefixes],
+               "render": [benchmark_render(count, layout, canvas, image, args.repeat)
+                          for layout in args.layouts for count in args.render_sizes]}
+
+    baseline = None
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=1)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    comparison = compare(results, baseline, args.tolerance) if baseline else []
+    regressions = [name for name, _, _, regressed in comparison if regressed]
+
+    if args.json:
+        print(json.dumps(dict(results, comparison=comparison, regressions=regressions)))
+        sys.exit(1 if regressions else 0)
+
+    print(f"{'Subnet':<16}{'Hosts':>8}{'Sweep (s)':>11}{'Found':>8}{'Recall':>9}{'False':>7}{'Peak (MiB)':>12}")
+    for result in results["scan"]:
+        print(f"{result['subnet']:<16}{result['hosts']:>8}{result['time']:>11.3f}{result['found']:>8}"
+              f"{result['recall']:>9.2%}{result['false_devices']:>7}{result['memory_peak'] / 2 ** 20:>12.2f}")
+
+    def milliseconds(value) -> str:
+        return "-" if value is None else f"{value * 1000:.2f}"
+
+    print(f"\n{'Layout':<8}{'Devices':>9}{'Topology (ms)':>15}{'Layout (ms)':>13}{'Star render (ms)':>18}"
+          f"{'Viewport render (ms)':>22}")
+    for result in results["render"]:
+        print(f"{result['layout']:<8}{result['devices']:>9}{milliseconds(result['topology_time']):>15}"
+              f"{milliseconds(result['layout_time']):>13}{milliseconds(result['star_render_time']):>18}"
+              f"{milliseconds(result['viewport_render_time']):>22}")
+
+    if args.save_baseline:
+        print(f"\nBaseline saved to {args.baseline}")
+    elif baseline is None:
+        print(f"\nNo baseline at {args.baseline} (store one with --save-baseline)")
+    else:
+        if baseline["settings"] != settings or baseline["machine"] != results["machine"]:
+            print("\nWarning: the baseline was measured with other settings or on another machine")
+        print(f"\n{'Compared with the baseline':<40}{'Baseline':>14}{'Current':>14}{'Change':>10}")
+        for name, previous, current, regressed in comparison:
+            change = f"{(current - previous) / previous:+.1%}" if previous else "-"
+            print(f"{name:<40}{previous:>14.6g}{current:>14.6g}{change:>10}{'  REGRESSION' if regressed else ''}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
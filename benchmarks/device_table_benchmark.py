@@ -0,0 +1,153 @@
+"""
+This program was written by Yonatan Deri.
+It follows the PEP8 guidelines.
+
+Description:
+    This file serves as a benchmark in the network_visualizer project.
+    It compares the DeviceTable of device_table.py with the former store of main.py (a dictionary of lists of
+    (ip, mac) string tuples) for synthetic devices (100,000 by default, in /24 subnets): the memory used (traced
+    with tracemalloc), the time to fill the store, to look a device up by IP address, to read a subnet, and to
+    filter the devices by IP range and by vendor prefix.
+
+    Usage: python benchmarks/device_table_benchmark.py [--devices 100000] [--lookups 1000] [--json]
+
+License:
+    This program is under the GNU GPLv3 License.
+"""
+
+import argparse
+import ipaddress
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+# Imports of Self-Made files
+import device_table  # noqa: E402
+
+SUBNET_SIZE = 254  # Devices per synthetic /24 subnet
+
+
+def synthetic_scans(count: int) -> [(ipaddress.IPv4Network, [(bytes, bytes)])]:
+    """
+    Generates the scan results of synthetic /24 subnets of 10.0.0.0/8, the addresses packed (not yet strings),
+    so the strings are only created when a store is filled, as after a scan.
+    :param count: the number of devices.
+    :return list: (subnet, [(packed ip, packed mac)]) tuples.
+    """
+    generator = random.Random(0)
+    scans = []
+    for start in range(0, count, SUBNET_SIZE):
+        network = ipaddress.ip_network(f"10.{start // SUBNET_SIZE >> 8 & 255}.{start // SUBNET_SIZE & 255}.0/24")
+        hosts = min(SUBNET_SIZE, count - start)
+        scans.append((network, [((int(network.network_address) + host + 1).to_bytes(4, "big"),
+                                 generator.randbytes(6)) for host in range(hosts)]))
+    return scans
+
+
+def as_strings(devices: [(bytes, bytes)]) -> [(str, str)]:
+    return [(str(ipaddress.IPv4Address(ip)), mac.hex(":")) for ip, mac in devices]
+
+
+def measure(function) -> (object, float, int):
+    """
+    Runs a function, measuring its duration and the memory it allocated and kept.
+    :param function: the function.
+    :return tuple: (result, duration in seconds, bytes still allocated by it).
+    """
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    result = function()
+    duration = time.perf_counter() - start_time
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, duration, allocated
+
+
+def main() -> None:
+    """
+    Runs the benchmark and prints the results.
+    :return None:
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the device store.")
+    parser.add_argument("--devices", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=1000)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    scans = synthetic_scans(args.devices)
+    generator = random.Random(1)
+    probes = [(network, str(ipaddress.IPv4Address(generator.choice(devices)[0])))
+              for network, devices in generator.choices(scans, k=args.lookups)]
+    ip_range = ipaddress.ip_network("10.0.0.0/20")
+    vendor_prefix = "00:50:56"
+
+    def fill_dictionary():
+        return {network: as_strings(devices) for network, devices in scans}
+
+    def fill_table():
+        table = device_table.DeviceTable()
+        for network, devices in scans:
+            table.replace(network, as_strings(devices), seen_at=0)
+        table.compact()
+        return table
+
+    dictionary, dictionary_fill_time, dictionary_bytes = measure(fill_dictionary)
+    table, table_fill_time, table_bytes = measure(fill_table)
+    results = {"devices": args.devices, "subnets": len(scans),
+               "dictionary": {"bytes": dictionary_bytes, "fill_time": dictionary_fill_time},
+               "table": {"bytes": table_bytes, "nbytes": table.nbytes, "fill_time": table_fill_time}}
+
+    start_time = time.perf_counter()
+    for network, wanted in probes:
+        next((mac for ip, mac in dictionary[network] if ip == wanted), None)
+    results["dictionary"]["lookup_time"] = (time.perf_counter() - start_time) / len(probes)
+    start_time = time.perf_counter()
+    for network, wanted in probes:
+        table.get(network, wanted)
+    results["table"]["lookup_time"] = (time.perf_counter() - start_time) / len(probes)
+
+    network = scans[len(scans) // 2][0]
+    start_time = time.perf_counter()
+    list(dictionary[network])
+    results["dictionary"]["subnet_time"] = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    table.devices(network)
+    results["table"]["subnet_time"] = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    [ip for devices in dictionary.values() for ip, _ in devices if ipaddress.IPv4Address(ip) in ip_range]
+    results["dictionary"]["range_filter_time"] = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    table.select(ip_range=ip_range)
+    results["table"]["range_filter_time"] = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    [mac for devices in dictionary.values() for _, mac in devices if mac.startswith(vendor_prefix)]
+    results["dictionary"]["vendor_filter_time"] = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    table.select(vendor_prefix=vendor_prefix)
+    results["table"]["vendor_filter_time"] = time.perf_counter() - start_time
+
+    if args.json:
+        print(json.dumps(results))
+        return
+
+    print(f"{results['devices']:,} devices in {results['subnets']} subnets "
+          f"(DeviceTable arrays and index: {table.nbytes / 2 ** 20:.2f} MiB)")
+    print(f"{'':<26}{'dict of lists':>16}{'DeviceTable':>16}")
+    rows = [("memory (MiB)", "bytes", 2 ** 20, ".2f"), ("fill (s)", "fill_time", 1, ".3f"),
+            ("lookup by IP (us)", "lookup_time", 1e-6, ".1f"), ("read a subnet (ms)", "subnet_time", 1e-3, ".3f"),
+            ("filter by IP range (ms)", "range_filter_time", 1e-3, ".1f"),
+            ("filter by vendor (ms)", "vendor_filter_time", 1e-3, ".1f")]
+    for name, key, unit, number_format in rows:
+        print(f"{name:<26}{results['dictionary'][key] / unit:>16{number_format}}"
+              f"{results['table'][key] / unit:>16{number_format}}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+This program was written by Yonatan Deri.
+It follows the PEP8 guidelines.
+
+Description:
+    This file serves as a benchmark in the network_visualizer project.
+    It compares the "scapy" and "raw" scan engines of arp_scan.py: requests sent per second, total scan time,
+    peak memory (RSS) and whether both engines discovered the same devices.
+    Every engine runs in its own process, so their memory footprints (imports included) do not mix.
+    Requires root (raw sockets).
+
+    Usage: sudo python benchmarks/engines_benchmark.py <subnet> [--iface IFACE] [--timeout SECONDS]
+
+License:
+    This program is under the GNU GPLv3 License.
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+
+def measure_send_rate(engine: str, subnet: str, iface: str) -> float:
+    """
+    Measures how many requests per second an engine sends, excluding the time spent waiting for replies.
+    :param engine: one of arp_scan.ENGINES.
+    :param subnet: the subnet to send requests to.
+    :param iface: interface to send the requests on.
+    :return float: requests sent per second.
+    """
+    import raw_arp
+
+    first, last = raw_arp.host_range(subnet)
+    if engine == "raw":
+        template = raw_arp.build_request(*raw_arp.get_interface_addresses(iface))
+        with raw_arp.open_socket(iface) as sock:
+            start_time = time.perf_counter()
+            sent = raw_arp.send_requests(sock, template, range(first, last + 1))
+            return sent / (time.perf_counter() - start_time)
+
+    import scapy.all as scapy
+    from scapy.layers.l2 import ARP, Ether
+
+    start_time = time.perf_counter()
+    scapy.sendp(Ether(dst="ff:ff:ff:ff:ff:ff") / ARP(pdst=subnet), iface=iface, verbose=False)
+    return (last - first + 1) / (time.perf_counter() - start_time)
+
+
+def run_engine(engine: str, subnet: str, iface: str, timeout: float) -> dict:
+    """
+    Benchmarks a single engine inside the current process.
+    :param engine: one of arp_scan.ENGINES.
+    :param subnet: the subnet to scan.
+    :param iface: interface to send the requests on.
+    :param timeout: reply timeout (in seconds) of the scan.
+    :return dict: the measurements of the engine.
+    """
+    start_time = time.perf_counter()
+    import arp_scan
+    import_time = time.perf_counter() - start_time
+
+    send_rate = measure_send_rate(engine, subnet, iface)
+
+    start_time = time.perf_counter()
+    devices = arp_scan.discover(subnet, iface=iface, timeout=timeout, engine=engine)
+    scan_time = time.perf_counter() - start_time
+
+    return {"engine": engine, "import_time": import_time, "send_rate": send_rate, "scan_time": scan_time,
+            "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, "devices": sorted(devices)}
+
+
+def main() -> None:
+    """
+    Runs every engine in a child process and prints a comparison table.
+    :return None:
+    """
+    parser = argparse.ArgumentParser(description="Compare the scan engines of arp_scan.py.")
+    parser.add_argument("subnet")
+    parser.add_argument("--iface", help="interface attached to the subnet (looked up if omitted)")
+    parser.add_argument("--timeout", type=float, default=1)
+    parser.add_argument("--engine", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.iface is None:
+        import arp_scan
+        args.iface = arp_scan.get_interface_of(args.subnet)
+
+    if args.engine:
+        print(json.dumps(run_engine(args.engine, args.subnet, args.iface, args.timeout)))
+        return
+
+    results = []
+    for engine in ("scapy", "raw"):
+        output = subprocess.run([sys.executable, os.path.realpath(__file__), args.subnet, "--iface", args.iface,
+                                 "--timeout", str(args.timeout), "--engine", engine],
+                                check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.splitlines()[-1]))
+
+    print(f"{'Engine':<8}{'Import (s)':>12}{'Requests/s':>14}{'Scan (s)':>10}{'Max RSS (MB)':>14}{'Devices':>9}")
+    for result in results:
+        print(f"{result['engine']:<8}{result['import_time']:>12.3f}{result['send_rate']:>14.0f}"
+              f"{result['scan_time']:>10.3f}{result['max_rss_kb'] / 1024:>14.1f}{len(result['devices']):>9}")
+    same = results[0]["devices"] == results[1]["devices"]
+    print(f"Same devices discovered: {'yes' if same else 'no'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+This program was written by Yonatan Deri.
+It follows the PEP8 guidelines.
+
+Description:
+    This file serves as a benchmark in the network_visualizer project.
+    It measures the throughput (devices per second) of the enrichment stage of enrichment.py for synthetic
+    devices (1,000 by default): building and opening the vendor index, vendor lookups (one by one and batched),
+    and the asyncio enrichment with reverse DNS and/or TCP port probes, cold and then served from the TTL caches.
+    The devices are given loopback addresses by default (127.0.0.0/8, so port probes are answered locally);
+    reverse DNS times depend on the configured resolver.
+
+    Usage: python benchmarks/enrichment_benchmark.py [--devices 1000] [--subnet 127.0.0.0/8] [--ports 22 80]
+                                                     [--no-dns] [--json]
+
+License:
+    This program is under the GNU GPLv3 License.
+"""
+
+import argparse
+import asyncio
+import ipaddress
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+# Imports of Self-Made files
+import enrichment  # noqa: E402
+
+
+def synthetic_devices(count: int, subnet: str) -> [(str, str)]:
+    """
+    Generates devices, half of them with the MAC prefix of a registered vendor, the rest locally administered.
+    :param count: the number of devices.
+    :param subnet: the subnet the IP addresses are taken from.
+    :return list: (ip, mac) tuples.
+    """
+    generator = random.Random(0)
+    prefixes = [prefix for bits, prefix, _ in enrichment.read_manuf(enrichment.manuf_lines()) if bits == 24]
+    hosts = itertools.islice(ipaddress.ip_network(subnet).hosts(), count)
+    devices = []
+    for i, ip in enumerate(hosts):
+        prefix = generator.choice(prefixes) if i % 2 == 0 else 0x020000 | generator.randrange(1 << 16)
+        mac = (prefix << 24) | generator.randrange(1 << 24)
+        devices.append((str(ip), mac.to_bytes(6, "big").hex(":")))
+    return devices
+
+
+def measure_enrichment(table: enrichment.OuiTable, devices: [(str, str)], ports: [int],
+                       resolve_names: bool) -> (float, float):
+    """
+    Enriches the devices twice with the same Enricher: cold, then from the caches.
+    :param table: the vendor table.
+    :param devices: (ip, mac) tuples.
+    :param ports: TCP ports to probe.
+    :param resolve_names: whether host names are resolved.
+    :return tuple: (cold, cached) durations in seconds.
+    """
+    enricher = enrichment.Enricher(ports=ports, oui_table=table, resolve_names=resolve_names)
+
+    async def enrich_all():
+        return [info async for info in enricher.enrich(devices)]
+
+    durations = []
+    for _ in range(2):
+        start_time = time.perf_counter()
+        asyncio.run(enrich_all())
+        durations.append(time.perf_counter() - start_time)
+    return tuple(durations)
+
+
+def main() -> None:
+    """
+    Runs the benchmark and prints the results.
+    :return None:
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the device enrichment stage.")
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--subnet", default="127.0.0.0/8")
+    parser.add_argument("--ports", type=int, nargs="*", default=[22, 80])
+    parser.add_argument("--no-dns", dest="dns", action="store_false", help="skip the reverse DNS measurements")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    results = {"devices": args.devices}
+    with tempfile.TemporaryDirectory() as directory:
+        index_path = os.path.join(directory, "oui.idx")
+        start_time = time.perf_counter()
+        enrichment.build_oui_index(index_path)
+        results["index_build_time"] = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        table = enrichment.OuiTable(index_path)
+        results["index_open_time"] = time.perf_counter() - start_time
+        results["index_entries"] = len(table)
+
+        devices = synthetic_devices(args.devices, args.subnet)
+        macs = [mac for _, mac in devices]
+        start_time = time.perf_counter()
+        for mac in macs:
+            table.vendor(mac)
+        results["vendor_single_time"] = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        table.vendors(macs)
+        results["vendor_batch_time"] = time.perf_counter() - start_time
+
+        stages = {"ports": (args.ports, False)}
+        if args.dns:
+            stages["dns"] = ([], True)
+            stages["dns_and_ports"] = (args.ports, True)
+        for name, (ports, resolve_names) in stages.items():
+            results[f"{name}_time"], results[f"{name}_cached_time"] = measure_enrichment(table, devices, ports,
+                                                                                          resolve_names)
+        table.close()
+
+    if args.json:
+        print(json.dumps(results))
+        return
+
+    print(f"Vendor index: {results['index_entries']} entries, built in {results['index_build_time']:.3f} s, "
+          f"opened in {results['index_open_time'] * 1000:.2f} ms")
+    print(f"{'Stage':<28}{'Time (s)':>10}{'Devices/s':>14}")
+    rows = [("vendor lookup (one by one)", results["vendor_single_time"]),
+            ("vendor lookup (batched)", results["vendor_batch_time"])]
+    for name in stages:
+        rows += [(f"{name} (cold)", results[f"{name}_time"]), (f"{name} (cached)", results[f"{name}_cached_time"])]
+    for name, seconds in rows:
+        print(f"{name:<28}{seconds:>10.3f}{args.devices / seconds:>14,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+This program was written by Yonatan Deri.
+It follows the PEP8 guidelines.
+
+Description:
+    This file serves as a benchmark in the network_visualizer project.
+    It renders synthetic subnets of 10, 100 and 1,000 devices and records, for the star topology of
+    topology.py (drawn in full, and through the virtualised CanvasRenderer showing a 700x479 viewport) and for
+    the former all-pairs drawing (two lines per pair of devices), the number of canvas items and the render time.
+    All-pairs drawings above --all-pairs-limit devices are only counted, not drawn.
+    Without a display (or with --headless) nothing is drawn: item counts and topology/layout times are reported.
+
+    Usage: python benchmarks/render_benchmark.py [--sizes 10 100 1000] [--layout grid] [--headless] [--json]
+
+License:
+    This program is under the GNU GPLv3 License.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tkinter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+# Imports of Self-Made files
+import canvas_renderer  # noqa: E402
+import layouts  # noqa: E402
+import topology  # noqa: E402
+
+IMAGE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "gui_images", "host.png")
+
+
+def synthetic_devices(count: int) -> [(str, str)]:
+    """
+    Generates devices of a synthetic 10.0.0.0/8 subnet, the first one being its gateway.
+    :param count: the number of devices.
+    :return list: (ip, mac) tuples.
+    """
+    return [(f"10.{i >> 16 & 255}.{i >> 8 & 255}.{(i & 255) + 1}", f"02:00:00:{i >> 16 & 255:02x}:"
+             f"{i >> 8 & 255:02x}:{i & 255:02x}") for i in range(count)]
+
+
+def render(canvas: tkinter.Canvas, draw) -> (int, float):
+    """
+    Clears the canvas, runs a drawing function and waits for Tk to process it.
+    :param canvas: the canvas.
+    :param draw: function drawing on the canvas.
+    :return tuple: (number of canvas items, render time in seconds).
+    """
+    canvas.delete("all")
+    canvas.update_idletasks()
+    start_time = time.perf_counter()
+    draw()
+    canvas.update_idletasks()
+    return len(canvas.find_all()), time.perf_counter() - start_time
+
+
+def benchmark(count: int, layout: str, canvas, image, all_pairs_limit: int) -> dict:
+    """
+    Benchmarks the rendering of a single synthetic subnet.
+    :param count: the number of devices.
+    :param layout: name of the layout, one of layouts.LAYOUTS.
+    :param canvas: the canvas to draw on, or None to only count items.
+    :param image: the image drawn for every device.
+    :param all_pairs_limit: maximum number of devices drawn with the all-pairs baseline.
+    :return dict: the measurements.
+    """
+    devices = synthetic_devices(count)
+    start_time = time.perf_counter()
+    subnet_topology = topology.build_topology("10.0.0.0/8", devices, gateways=[devices[0][0]])
+    topology_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    coordinates = layouts.LAYOUTS[layout](len(subnet_topology.nodes), center=subnet_topology.hub,
+                                          edges=subnet_topology.all_edges())
+    positions = dict(zip(subnet_topology.nodes, map(tuple, coordinates)))
+    layout_time = time.perf_counter() - start_time
+
+    result = {"devices": count, "topology_time": topology_time, "layout_time": layout_time,
+              "star_items": 2 * len(subnet_topology.nodes) + len(subnet_topology.all_edges()),
+              "all_pairs_items": 2 * count + count * (count - 1), "star_render_time": None,
+              "all_pairs_render_time": None, "viewport_items": None, "viewport_render_time": None}
+    if canvas is None:
+        return result
+
+    result["star_items"], result["star_render_time"] = render(
+        canvas, lambda: canvas_renderer.draw_topology(canvas, subnet_topology, positions, image))
+
+    renderer = canvas_renderer.CanvasRenderer(canvas, lambda: image)
+    result["viewport_items"], result["viewport_render_time"] = render(
+        canvas, lambda: renderer.set_topology(subnet_topology, positions))
+
+    if count <= all_pairs_limit:
+        def draw_all_pairs():
+            for i in range(count):
+                for j in range(i + 1, count):
+                    start, end = positions[devices[i][0]], positions[devices[j][0]]
+                    canvas.create_line(*start, *end, fill=canvas_renderer.EDGE_COLOR, arrow="last")
+                    canvas.create_line(*end, *start, fill=canvas_renderer.EDGE_COLOR, arrow="last")
+            for ip, mac in devices:
+                x, y = positions[ip]
+                canvas.create_image(x, y, image=image)
+                canvas.create_text(x, y + canvas_renderer.LABEL_OFFSET, text=f"{ip}\n{mac}")
+        result["all_pairs_items"], result["all_pairs_render_time"] = render(canvas, draw_all_pairs)
+    return result
+
+
+def main() -> None:
+    """
+    Runs the benchmark for every size and prints the results.
+    :return None:
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the rendering of the subnet overview canvas.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--layout", choices=list(layouts.LAYOUTS), default=layouts.DEFAULT_LAYOUT)
+    parser.add_argument("--all-pairs-limit", type=int, default=100)
+    parser.add_argument("--headless", action="store_true", help="do not draw, only count canvas items")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    canvas = image = None
+    if not args.headless:
+        try:
+            root = tkinter.Tk()
+            canvas = tkinter.Canvas(root, width=700, height=479)
+            canvas.pack()
+            image = tkinter.PhotoImage(file=IMAGE_PATH)
+        except tkinter.TclError:
+            print("No display available, running headless.", file=sys.stderr)
+
+    results = [benchmark(count, args.layout, canvas, image, args.all_pairs_limit) for count in args.sizes]
+    if args.json:
+        print(json.dumps(results))
+        return
+
+    def seconds(value) -> str:
+        return "-" if value is None else f"{value:.3f}"
+
+    print(f"{'Devices':>8}{'Star items':>12}{'Star render (s)':>17}{'Viewport items':>16}"
+          f"{'Viewport render (s)':>21}{'All-pairs items':>17}{'All-pairs render (s)':>22}{'Layout (s)':>12}")
+    for result in results:
+        print(f"{result['devices']:>8}{result['star_items']:>12}{seconds(result['star_render_time']):>17}"
+              f"{result['viewport_items'] if result['viewport_items'] is not None else '-':>16}"
+              f"{seconds(result['viewport_render_time']):>21}"
+              f"{result['all_pairs_items']:>17}{seconds(result['all_pairs_render_time']):>22}"
+              f"{result['layout_time']:>12.3f}")
+
+
+if __name__ == '__main__':
+    main()
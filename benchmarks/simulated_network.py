@@ -0,0 +1,177 @@
+"""
+This program was written by Yonatan Deri.
+It follows the PEP8 guidelines.
+
+Description:
+    This file serves as a helper of the benchmarks of the network_visualizer project.
+    It simulates a local network without root and without a real LAN: the scanner gets one end of a Unix
+    SOCK_SEQPACKET socket pair, which carries whole Ethernet frames like an AF_PACKET socket, and a responder
+    process on the other end answers the ARP requests sent to a configurable number of synthetic hosts, after
+    a configurable latency (plus jitter), dropping a configurable fraction of the requests.
+    Host addresses, MAC addresses and lost requests are drawn from a seeded generator, so runs are reproducible.
+
+    Usage: with SimulatedNetwork("10.0.0.0/24", hosts=64, latency=0.002, loss=0.01) as network:
+               devices = raw_arp.scan_socket(network.socket, *network.source, network.subnet)
+
+License:
+    This program is under the GNU GPLv3 License.
+"""
+
+import heapq
+import ipaddress
+import multiprocessing
+import os
+import random
+import select
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+# Imports of Self-Made files
+import raw_arp  # noqa: E402
+
+SCANNER_MAC = bytes.fromhex("020000000001")
+SEND_BUFFER_SIZE = 4 * 1024 * 1024
+
+
+def synthetic_hosts(subnet: ipaddress.IPv4Network, count: int, seed: int = 0) -> {int: bytes}:
+    """
+    Picks the live hosts of a simulated subnet. The first host address is kept for the scanner.
+    :param subnet: the subnet.
+    :param count: the number of live hosts (capped to the number of free addresses).
+    :param seed: seed of the generator.
+    :return dict: host address (integer) -> MAC address (6 bytes, locally administered).
+    """
+    generator = random.Random(seed)
+    first, last = raw_arp.host_range(subnet)
+    addresses = generator.sample(range(first + 1, last + 1), min(count, max(last - first, 0)))
+    return {address: b"\x02" + generator.randbytes(5) for address in sorted(addresses)}
+
+
+def build_reply(host_ip: int, host_mac: bytes, request: memoryview) -> bytes:
+    """
+    Builds the ARP reply of a host to a request.
+    :param host_ip: the address of the host (integer).
+    :param host_mac: the MAC address of the host (6 bytes).
+    :param request: the request frame.
+    :return bytes: the reply frame.
+    """
+    requester_mac = bytes(request[raw_arp.SENDER_MAC_OFFSET:raw_arp.SENDER_MAC_OFFSET + 6])
+    requester_ip = bytes(request[raw_arp.SENDER_IP_OFFSET:raw_arp.SENDER_IP_OFFSET + 4])
+    frame = bytearray(raw_arp.FRAME_SIZE)
+    raw_arp.ETHERNET_HEADER.pack_into(frame, 0, requester_mac, host_mac, raw_arp.ETH_P_ARP)
+    raw_arp.ARP_HEADER.pack_into(frame, raw_arp.ETHERNET_HEADER.size, 1, 0x0800, 6, 4, raw_arp.ARP_REPLY,
+                                 host_mac, raw_arp.UINT32.pack(host_ip), requester_mac, requester_ip)
+    return bytes(frame)
+
+
+def respond(sock: socket.socket, hosts: {int: bytes}, latency: float, jitter: float, loss: float,
+            seed: int) -> None:
+    """
+    Answers the ARP requests read from a socket until its other end is closed. Runs in the responder process.
+    Replies are queued until they are due and sent without blocking, so the responder keeps reading requests
+    while the scanner is busy sending.
+    :param sock: the responder end of the socket pair.
+    :param hosts: host address (integer) -> MAC address (6 bytes) of the live hosts.
+    :param latency: mean delay (in seconds) before a host replies.
+    :param jitter: maximum deviation (in seconds) from the mean delay, drawn uniformly.
+    :param loss: probability that a request (or its reply) is lost.
+    :param seed: seed of the generator deciding the losses and delays.
+    :return None:
+    """
+    generator = random.Random(seed)
+    sock.setblocking(False)
+    buffer = bytearray(raw_arp.MAX_FRAME_SIZE)
+    view = memoryview(buffer)
+    pending = []  # Heap of (due time, sequence number, reply frame)
+    sequence = 0
+    while True:
+        now = time.perf_counter()
+        while pending and pending[0][0] <= now:
+            try:
+                sock.send(pending[0][2])
+            except BlockingIOError:
+                break
+            except OSError:  # The scanner closed its end
+                return
+            heapq.heappop(pending)
+        blocked = bool(pending) and pending[0][0] <= now
+        timeout = None if not pending or blocked else pending[0][0] - now
+        readable, _, _ = select.select([sock], [sock] if blocked else [], [], timeout)
+        if not readable:
+            continue
+        while True:
+            try:
+                size = sock.recv_into(view)
+            except BlockingIOError:
+                break
+            if not size:
+                return
+            frame = raw_arp.parse_frame(view, size)
+            if frame is None or frame[0] != raw_arp.ARP_REQUEST or frame[3] not in hosts:
+                continue
+            if loss and generator.random() < loss:
+                continue
+            due = time.perf_counter() + max(latency + generator.uniform(-jitter, jitter), 0)
+            heapq.heappush(pending, (due, sequence, build_reply(frame[3], hosts[frame[3]], view)))
+            sequence += 1
+
+
+def _run_responder(scanner_socket: socket.socket, responder_socket: socket.socket, *args) -> None:
+    """
+    Entry point of the responder process: closes its copy of the scanner end, so closing it in the scanner
+    ends the responder, then answers requests with respond().
+    :param scanner_socket: the scanner end of the socket pair, inherited from the parent process.
+    :param responder_socket: the responder end of the socket pair.
+    :param args: the other arguments of respond().
+    :return None:
+    """
+    scanner_socket.close()
+    respond(responder_socket, *args)
+
+
+class SimulatedNetwork:
+    """
+    A simulated subnet, answered by a responder process. Used as a context manager.
+    """
+
+    def __init__(self, subnet, hosts: int, latency: float = 0.001, jitter: float = 0, loss: float = 0,
+                 seed: int = 0):
+        """
+        :param subnet: the simulated subnet.
+        :param hosts: the number of live hosts.
+        :param latency: mean delay (in seconds) before a host replies.
+        :param jitter: maximum deviation (in seconds) from the mean delay.
+        :param loss: probability that a request is lost.
+        :param seed: seed of the generators (hosts, losses and delays).
+        """
+        self.subnet = ipaddress.ip_network(str(subnet), strict=False)
+        self.hosts = synthetic_hosts(self.subnet, hosts, seed)
+        self.source = (SCANNER_MAC, raw_arp.UINT32.pack(raw_arp.host_range(self.subnet)[0]))
+        self.latency, self.jitter, self.loss, self.seed = latency, jitter, loss, seed
+        self.socket = None
+        self._process = None
+
+    def devices(self) -> {(str, str)}:
+        """
+        :return set: the (ip, mac) tuples of the live hosts, as a perfect scan would report them.
+        """
+        return {(str(ipaddress.IPv4Address(ip)), mac.hex(":")) for ip, mac in self.hosts.items()}
+
+    def __enter__(self) -> "SimulatedNetwork":
+        self.socket, responder_socket = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        for sock in (self.socket, responder_socket):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER_SIZE)
+        self._process = multiprocessing.get_context("fork").Process(
+            target=_run_responder, daemon=True,
+            args=(self.socket, responder_socket, self.hosts, self.latency, self.jitter, self.loss, self.seed))
+        self._process.start()
+        responder_socket.close()
+        self.socket.setblocking(False)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.socket.close()
+        self._process.join()
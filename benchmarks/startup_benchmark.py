@@ -0,0 +1,106 @@
+"""
+This program was written by Yonatan Deri.
+It follows the PEP8 guidelines.
+
+Description:
+    This file serves as a benchmark in the network_visualizer project.
+    It measures the startup cost of the application: the import time of every module (each one in a fresh
+    interpreter, using python -X importtime), and the time until the first frame of the GUI is drawn.
+    With --headless (or when no display is available) only the import times are measured, so it can run in CI.
+    It exits with a non-zero status if a module imports too slowly, or if importing the GUI pulls in scapy.
+
+    Usage: python benchmarks/startup_benchmark.py [--headless] [--max-import-time SECONDS] [--json]
+
+License:
+    This program is under the GNU GPLv3 License.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+MODULES = ["raw_arp", "arp_scan", "main"]
+
+# Modules that must not be imported at startup, only on first use
+DEFERRED_MODULES = ["scapy"]
+
+
+def measure_import(module: str) -> dict:
+    """
+    Imports a module in a fresh interpreter and measures how long it took.
+    :param module: the module name.
+    :return dict: the cumulative import time (in seconds) of the module, and the deferred modules it imported.
+    """
+    code = f"import sys, {module}; print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))"
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=PROJECT_DIR,
+                             check=True, capture_output=True, text=True)
+    cumulative_us = 0
+    for line in process.stderr.splitlines():
+        if line.startswith("import time:") and line.split("|")[-1].strip() == module:
+            cumulative_us = int(line.split("|")[1])
+    imported = process.stdout.strip()
+    return {"module": module, "import_time": cumulative_us / 1e6,
+            "deferred_imported": imported.split(",") if imported else []}
+
+
+def measure_first_frame() -> float:
+    """
+    Creates the application window and measures the time until its first frame is drawn. Needs a display.
+    The background services (scans, inventory, enrichment, rescans, metrics server) are not started, so the
+    measure includes neither network traffic nor a port bind, and runs never collide on the metrics port.
+    :return float: seconds from the start of the import of main.py until the window is mapped and idle.
+    """
+    sys.path.insert(0, PROJECT_DIR)
+    os.chdir(PROJECT_DIR)
+    start_time = time.perf_counter()
+    import main
+
+    app = main.App(services=False)
+    app.wait_visibility()
+    app.update_idletasks()
+    first_frame = time.perf_counter() - start_time
+    app.destroy()
+    return first_frame
+
+
+def main() -> None:
+    """
+    Runs the measurements and prints them, exiting with status 1 on a startup regression.
+    :return None:
+    """
+    parser = argparse.ArgumentParser(description="Measure the startup time of the Network Visualizer.")
+    parser.add_argument("--headless", action="store_true", help="only measure imports, do not open a window")
+    parser.add_argument("--max-import-time", type=float, help="fail if a module takes longer (seconds) to import")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    results = {"imports": [measure_import(module) for module in MODULES], "first_frame": None}
+    if not args.headless and (os.environ.get("DISPLAY") or sys.platform in ("win32", "darwin")):
+        results["first_frame"] = measure_first_frame()
+
+    failures = []
+    for result in results["imports"]:
+        if result["deferred_imported"]:
+            failures.append(f"{result['module']} imports {', '.join(result['deferred_imported'])} at startup")
+        if args.max_import_time is not None and result["import_time"] > args.max_import_time:
+            failures.append(f"{result['module']} takes {result['import_time']:.3f}s to import")
+
+    if args.json:
+        print(json.dumps(dict(results, failures=failures)))
+    else:
+        for result in results["imports"]:
+            print(f"import {result['module']:<10}{result['import_time']:>8.3f}s")
+        if results["first_frame"] is not None:
+            print(f"first frame      {results['first_frame']:>8.3f}s")
+        for failure in failures:
+            print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
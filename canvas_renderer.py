@@ -0,0 +1,386 @@
+"""
+This program was written by Yonatan Deri.
+It follows the PEP8 guidelines.
+
+Description:
+    This file serves as a module in the network_visualizer project.
+    It draws the topology of a subnet (see topology.py) on a Tk canvas: one line per edge, then one image and
+    one label per node.
+    CanvasRenderer is the virtualised renderer used by the GUI: it only draws what lies inside the visible part
+    of the canvas (plus a margin), collapses labels and clusters dense areas when zoomed out, and supports
+    zooming with the mouse wheel and panning by dragging. Its cost depends on what is visible, not on the
+    size of the subnet.
+
+License:
+    This program is under the GNU GPLv3 License.
+"""
+
+import math
+import tkinter
+from typing import Optional
+
+import numpy as np
+
+# Imports of Self-Made files
+import metrics
+from topology import Topology
+
+NODE_RADIUS = 33  # Radius of the nodes, edges start and end on their border
+LABEL_OFFSET = 45  # Distance between the center of a node and its label
+
+EDGE_COLOR = "#44475a"
+NEIGHBOR_EDGE_COLOR = "#6272a4"
+HUB_COLOR = "#6272a4"
+LABEL_COLOR = "white"
+LABEL_FONT = ("TimesNewRoman", 8)
+CLUSTER_COLOR = "#44475a"
+DOT_RADIUS = 4
+
+VIEWPORT_MARGIN = 200  # Pixels drawn around the visible part of the canvas, so short pans need no redraw
+SCROLLREGION_MARGIN = 100
+MIN_ZOOM = 0.05
+MAX_ZOOM = 4
+ZOOM_STEP = 1.2
+LABEL_MIN_ZOOM = 0.75  # Below this zoom, labels are not drawn
+IMAGE_MIN_ZOOM = 0.4  # Below this zoom, devices are drawn as dots instead of images
+CLUSTER_MAX_ZOOM = 0.2  # Below this zoom, nearby devices are drawn as aggregate nodes
+MAX_VISIBLE_NODES = 1500  # Above this number of visible devices, they are drawn as aggregate nodes
+CLUSTER_CELL = 60  # Side (in pixels) of the screen area merged into a single aggregate node
+EDGE_SECTORS = 32  # Edges leaving the visible area from the same node are bundled per direction sector
+
+
+def draw_topology(canvas: tkinter.Canvas, topology: Topology, positions: {str: (float, float)},
+                  image: tkinter.PhotoImage) -> None:
+    """
+    Draws a subnet topology. Edges are drawn first, so the nodes are drawn over them.
+    :param canvas: the canvas to draw on.
+    :param topology: the topology of the subnet.
+    :param positions: node id -> (x, y) canvas position.
+    :param image: the image drawn for every device.
+    :return None:
+    """
+    for edges, color in ((topology.edges, EDGE_COLOR), (topology.neighbor_edges, NEIGHBOR_EDGE_COLOR)):
+        for i, j in edges:
+            draw_edge(canvas, positions[topology.nodes[i]], positions[topology.nodes[j]], color)
+
+    for i, (node, label) in enumerate(zip(topology.nodes, topology.labels)):
+        x, y = positions[node]
+        if i == topology.hub and topology.virtual_hub:
+            canvas.create_oval(x - NODE_RADIUS / 2, y - NODE_RADIUS / 2, x + NODE_RADIUS / 2, y + NODE_RADIUS / 2,
+                               fill=HUB_COLOR, outline="")
+        else:
+            canvas.create_image(x, y, image=image)
+        canvas.create_text(x, y + LABEL_OFFSET, text=label, fill=LABEL_COLOR, font=LABEL_FONT)
+
+
+def draw_edge(canvas: tkinter.Canvas, start: (float, float), end: (float, float), color: str = EDGE_COLOR) -> None:
+    """
+    Draws a bidirectional edge between two nodes, as a single line item with an arrow on both ends.
+    The line is shortened by NODE_RADIUS on both ends, so it stops at the border of the nodes.
+    :param canvas: the canvas to draw on.
+    :param start: (x, y) position of the first node.
+    :param end: (x, y) position of the second node.
+    :param color: the color of the line.
+    :return None:
+    """
+    (x1, y1), (x2, y2) = start, end
+    angle = math.atan2(y2 - y1, x2 - x1)
+    dx, dy = NODE_RADIUS * math.cos(angle), NODE_RADIUS * math.sin(angle)
+    canvas.create_line(x1 + dx, y1 + dy, x2 - dx, y2 - dy, fill=color, arrow="both")
+
+
+class CanvasRenderer:
+    """
+    Virtualised renderer of a subnet topology on a Tk canvas.
+    Node positions are kept in world coordinates (as computed by the layouts), the canvas shows them scaled by
+    the zoom factor. Every pan, zoom or resize schedules a single redraw of the visible area, on idle.
+    """
+
+    def __init__(self, canvas: tkinter.Canvas, image_getter):
+        """
+        :param canvas: the canvas to draw on.
+        :param image_getter: function returning the image drawn for every device (called on first draw).
+        """
+        self.canvas = canvas
+        self.image_getter = image_getter
+        self.zoom = 1.0
+        self.topology = None  # type: Optional[Topology]
+        self.positions = np.empty((0, 2))
+        self.edges = np.empty((0, 2), dtype=np.int64)
+        self.neighbor_edge_count = 0
+        self._node_index = {}  # Node id -> index in the topology
+        self._redraw_job = None
+        self._drawn_area = None  # World (left, top, right, bottom) area drawn by the last redraw, margin included
+        self._x_scrollbar = self._y_scrollbar = None
+
+        canvas.bind("<Configure>", lambda event: self._on_view_change())
+        canvas.bind("<ButtonPress-1>", lambda event: canvas.scan_mark(event.x, event.y))
+        canvas.bind("<B1-Motion>", lambda event: canvas.scan_dragto(event.x, event.y, gain=1))
+        canvas.bind("<MouseWheel>", lambda event: self.zoom_at(event.x, event.y, ZOOM_STEP if event.delta > 0
+                                                               else 1 / ZOOM_STEP))
+        canvas.bind("<Button-4>", lambda event: self.zoom_at(event.x, event.y, ZOOM_STEP))
+        canvas.bind("<Button-5>", lambda event: self.zoom_at(event.x, event.y, 1 / ZOOM_STEP))
+
+    def attach_scrollbars(self, x_scrollbar, y_scrollbar) -> None:
+        """
+        Connects the scrollbars of the canvas, so scrolling redraws the newly visible area.
+        :param x_scrollbar: the horizontal scrollbar.
+        :param y_scrollbar: the vertical scrollbar.
+        :return None:
+        """
+        self._x_scrollbar, self._y_scrollbar = x_scrollbar, y_scrollbar
+        self.canvas.configure(xscrollcommand=self._on_x_scroll, yscrollcommand=self._on_y_scroll)
+
+    def _on_x_scroll(self, first, last) -> None:
+        self._x_scrollbar.set(first, last)
+        self._on_view_change()
+
+    def _on_y_scroll(self, first, last) -> None:
+        self._y_scrollbar.set(first, last)
+        self._on_view_change()
+
+    def _on_view_change(self) -> None:
+        """
+        Handles a pan, scroll or resize: schedules a redraw only if the visible part of the canvas is no longer
+        inside the area drawn by the last redraw (which extends VIEWPORT_MARGIN beyond it).
+        :return None:
+        """
+        if self._drawn_area is None:
+            self.schedule_redraw()
+            return
+        left, top, right, bottom = self.visible_area(margin=0)
+        drawn_left, drawn_top, drawn_right, drawn_bottom = self._drawn_area
+        if left < drawn_left or top < drawn_top or right > drawn_right or bottom > drawn_bottom:
+            self.schedule_redraw()
+
+    def set_topology(self, topology: Topology, positions: {str: (float, float)}) -> None:
+        """
+        Sets the topology to display, and draws its visible part, from the top left corner.
+        :param topology: the topology of the subnet.
+        :param positions: node id -> (x, y) position, in world coordinates.
+        :return None:
+        """
+        self._set_topology(topology, positions)
+        self.canvas.xview_moveto(0)
+        self.canvas.yview_moveto(0)
+        self.redraw()
+
+    def update_topology(self, topology: Topology, positions: {str: (float, float)}) -> None:
+        """
+        Replaces the displayed topology by a newer one of the same subnet (e.g. after devices joined or left),
+        keeping the zoom and the scroll position, and schedules a redraw of the visible area.
+        :param topology: the new topology of the subnet.
+        :param positions: node id -> (x, y) position, in world coordinates.
+        :return None:
+        """
+        self._set_topology(topology, positions)
+        self.schedule_redraw()
+
+    def update_labels(self, labels: {str: str}) -> None:
+        """
+        Replaces the labels of some nodes (e.g. once their host name is known), and schedules a redraw.
+        :param labels: node id -> new label. Nodes that are not displayed are ignored.
+        :return None:
+        """
+        if self.topology is None:
+            return
+        new_labels = list(self.topology.labels)
+        for node, label in labels.items():
+            index = self._node_index.get(node)
+            if index is not None:
+                new_labels[index] = label
+        self.topology = self.topology._replace(labels=new_labels)
+        self.schedule_redraw()
+
+    def _set_topology(self, topology: Topology, positions: {str: (float, float)}) -> None:
+        """
+        Sets the topology to display and the scroll region.
+        :param topology: the topology of the subnet.
+        :param positions: node id -> (x, y) position, in world coordinates.
+        :return None:
+        """
+        self.topology = topology
+        self.positions = np.array([positions[node] for node in topology.nodes], dtype=float).reshape(-1, 2)
+        self.edges = topology.all_edges()
+        self.neighbor_edge_count = len(topology.neighbor_edges)
+        self._node_index = {node: i for i, node in enumerate(topology.nodes)}
+        self._update_scrollregion()
+
+    def clear(self) -> None:
+        """
+        Removes the displayed topology.
+        :return None:
+        """
+        self.topology = None
+        self.positions = np.empty((0, 2))
+        self.edges = np.empty((0, 2), dtype=np.int64)
+        self._node_index = {}
+        self._drawn_area = None
+        self.canvas.delete("all")
+        self.canvas.configure(scrollregion=(0, 0, 0, 0))
+
+    def zoom_at(self, x: int, y: int, factor: float) -> None:
+        """
+        Zooms in or out, keeping the point under the given window coordinates in place.
+        :param x: window x coordinate of the zoom center (e.g. the mouse pointer).
+        :param y: window y coordinate of the zoom center.
+        :param factor: zoom multiplier (above 1 zooms in).
+        :return None:
+        """
+        new_zoom = min(max(self.zoom * factor, MIN_ZOOM), MAX_ZOOM)
+        if self.topology is None or new_zoom == self.zoom:
+            return
+        world_x, world_y = self.canvas.canvasx(x) / self.zoom, self.canvas.canvasy(y) / self.zoom
+        self.zoom = new_zoom
+        width, height = self._update_scrollregion()
+        self.canvas.xview_moveto(max(world_x * self.zoom - x, 0) / width)
+        self.canvas.yview_moveto(max(world_y * self.zoom - y, 0) / height)
+        self.schedule_redraw()
+
+    def _update_scrollregion(self) -> (float, float):
+        """
+        Sets the scroll region from the node positions (instead of computing the bounding box of every item).
+        :return tuple: the width and height of the scroll region.
+        """
+        if len(self.positions):
+            width, height = (self.positions.max(axis=0) + SCROLLREGION_MARGIN) * self.zoom
+        else:
+            width = height = 0
+        width, height = max(float(width), 1), max(float(height), 1)
+        self.canvas.configure(scrollregion=(0, 0, width, height))
+        return width, height
+
+    def schedule_redraw(self) -> None:
+        """
+        Schedules a redraw on idle. Several requests before it runs result in a single redraw.
+        :return None:
+        """
+        if self._redraw_job is None:
+            self._redraw_job = self.canvas.after_idle(self.redraw)
+
+    def visible_area(self, margin: float = VIEWPORT_MARGIN) -> (float, float, float, float):
+        """
+        Gets the area to draw, in world coordinates: the visible part of the canvas, extended by a margin.
+        :param margin: the margin, in pixels.
+        :return tuple: (left, top, right, bottom).
+        """
+        left = self.canvas.canvasx(0) - margin
+        top = self.canvas.canvasy(0) - margin
+        right = self.canvas.canvasx(self.canvas.winfo_width()) + margin
+        bottom = self.canvas.canvasy(self.canvas.winfo_height()) + margin
+        return left / self.zoom, top / self.zoom, right / self.zoom, bottom / self.zoom
+
+    def redraw(self) -> None:
+        """
+        Draws the part of the topology inside the visible area, at the level of detail of the current zoom.
+        The duration of every refresh is recorded in the render_duration_seconds metric.
+        :return None:
+        """
+        self._redraw_job = None
+        with metrics.RENDER_DURATION.time(view="subnet_overview"):
+            self._draw_visible()
+
+    def _draw_visible(self) -> None:
+        """
+        Replaces the canvas items by the ones of the visible area (see redraw()).
+        :return None:
+        """
+        self.canvas.delete("all")
+        self._drawn_area = None
+        if self.topology is None or not len(self.positions):
+            return
+        left, top, right, bottom = self._drawn_area = self.visible_area()
+        x, y = self.positions[:, 0], self.positions[:, 1]
+        visible = np.flatnonzero((x >= left) & (x <= right) & (y >= top) & (y <= bottom))
+
+        if self.zoom <= CLUSTER_MAX_ZOOM or len(visible) > MAX_VISIBLE_NODES:
+            self._draw_clusters(visible)
+            return
+
+        self._draw_edges(visible)
+
+        image = self.image_getter() if self.zoom >= IMAGE_MIN_ZOOM else None
+        for i in visible:
+            node_x, node_y = self.positions[i] * self.zoom
+            if i == self.topology.hub and self.topology.virtual_hub:
+                radius = NODE_RADIUS / 2 * min(self.zoom, 1)
+                self.canvas.create_oval(node_x - radius, node_y - radius, node_x + radius, node_y + radius,
+                                        fill=HUB_COLOR, outline="")
+            elif image is not None:
+                self.canvas.create_image(node_x, node_y, image=image)
+            else:
+                self.canvas.create_oval(node_x - DOT_RADIUS, node_y - DOT_RADIUS, node_x + DOT_RADIUS,
+                                        node_y + DOT_RADIUS, fill=LABEL_COLOR, outline="")
+            if self.zoom >= LABEL_MIN_ZOOM:
+                self.canvas.create_text(node_x, node_y + LABEL_OFFSET * self.zoom, text=self.topology.labels[i],
+                                        fill=LABEL_COLOR, font=LABEL_FONT)
+
+    def _draw_edges(self, visible: np.ndarray) -> None:
+        """
+        Draws the edges of the visible nodes. Edges between two visible nodes are drawn one by one. Edges leaving
+        the visible area (e.g. the edges of the gateway) are bundled: one line per visible node and direction
+        sector, towards the mean position of the nodes they lead to.
+        :param visible: indices of the visible nodes.
+        :return None:
+        """
+        inside = np.zeros(len(self.positions), dtype=bool)
+        inside[visible] = True
+        i, j = self.edges[:, 0], self.edges[:, 1]
+        first_neighbor_edge = len(self.edges) - self.neighbor_edge_count
+
+        for edge in np.flatnonzero(inside[i] & inside[j]):
+            color = NEIGHBOR_EDGE_COLOR if edge >= first_neighbor_edge else EDGE_COLOR
+            self._draw_edge(self.positions[i[edge]] * self.zoom, self.positions[j[edge]] * self.zoom, color)
+
+        leaving = np.flatnonzero(inside[i] != inside[j])
+        if not len(leaving):
+            return
+        anchor = np.where(inside[i[leaving]], i[leaving], j[leaving])
+        target = np.where(inside[i[leaving]], j[leaving], i[leaving])
+        delta = self.positions[target] - self.positions[anchor]
+        sector = ((np.arctan2(delta[:, 1], delta[:, 0]) + math.pi) / (2 * math.pi) * EDGE_SECTORS).astype(np.int64)
+        keys = anchor * EDGE_SECTORS + np.minimum(sector, EDGE_SECTORS - 1)
+        bundles, bundle_of = np.unique(keys, return_inverse=True)
+        bundle_of = bundle_of.ravel()
+        sizes = np.bincount(bundle_of)
+        ends = np.column_stack([np.bincount(bundle_of, self.positions[target, axis]) / sizes for axis in range(2)])
+        for bundle, end in zip(bundles, ends):
+            self._draw_edge(self.positions[bundle // EDGE_SECTORS] * self.zoom, end * self.zoom, EDGE_COLOR)
+
+    def _draw_edge(self, start: np.ndarray, end: np.ndarray, color: str) -> None:
+        """
+        Draws an edge between two canvas positions, shortened by the (zoomed) node radius on both ends.
+        :param start: canvas position of the first node.
+        :param end: canvas position of the second node.
+        :param color: the color of the line.
+        :return None:
+        """
+        (x1, y1), (x2, y2) = start, end
+        angle = math.atan2(y2 - y1, x2 - x1)
+        radius = NODE_RADIUS * min(self.zoom, 1)
+        dx, dy = radius * math.cos(angle), radius * math.sin(angle)
+        self.canvas.create_line(x1 + dx, y1 + dy, x2 - dx, y2 - dy, fill=color,
+                                arrow="both" if self.zoom >= IMAGE_MIN_ZOOM else None)
+
+    def _draw_clusters(self, visible: np.ndarray) -> None:
+        """
+        Draws the visible nodes as aggregate nodes: one circle (labelled with its size) per CLUSTER_CELL square
+        of the screen, linked to the hub.
+        :param visible: indices of the visible nodes.
+        :return None:
+        """
+        canvas_positions = self.positions[visible] * self.zoom
+        cells = np.floor(canvas_positions / CLUSTER_CELL).astype(np.int64)
+        _, cluster_of, sizes = np.unique(cells, axis=0, return_inverse=True, return_counts=True)
+        cluster_of = cluster_of.ravel()
+        centers = np.column_stack([np.bincount(cluster_of, canvas_positions[:, axis]) / sizes for axis in range(2)])
+
+        hub_x, hub_y = self.positions[self.topology.hub] * self.zoom
+        for (x, y), size in zip(centers, sizes):
+            self.canvas.create_line(hub_x, hub_y, x, y, fill=EDGE_COLOR)
+        for (x, y), size in zip(centers, sizes):
+            radius = DOT_RADIUS + 3 * math.log2(size)
+            self.canvas.create_oval(x - radius, y - radius, x + radius, y + radius, fill=CLUSTER_COLOR,
+                                    outline=HUB_COLOR)
+            if size > 1:
+                self.canvas.create_text(x, y, text=str(size), fill=LABEL_COLOR, font=LABEL_FONT)
@@ -0,0 +1,385 @@
+"""
+This program was written by Yonatan Deri.
+It follows the PEP8 guidelines.
+
+Description:
+    This file serves as the headless entry point of the network_visualizer project. It relies on the arp_scan.py file.
+    It scans the local network without a display, streaming the discovered devices (and per-phase timings)
+    to stdout as JSON lines or CSV, for cron jobs and pipelines. It can keep rescanning periodically (--watch) or
+    monitor the network passively, streaming join/leave/change events. It can also export the overview of a subnet
+    (its devices from the inventory, their topology and layout) as a snapshot or an SVG/PNG image, for reports.
+
+    Usage: python cli.py scan [--interface IFACE ...] [--subnet SUBNET ...] [--timeout SECONDS]
+                              [--concurrency N] [--processes N] [--engine {scapy,raw}] [--format {jsonl,csv}]
+                              [--incremental] [--enrich] [--ports PORT ...] [--enrich-timeout SECONDS]
+                              [--watch SECONDS] [--metrics-port PORT] [--metrics-json PATH]
+           python cli.py monitor [--interface IFACE ...] [--leave-after SECONDS] [--no-gratuitous] [--dhcp]
+                                 [--format {jsonl,csv}]
+           python cli.py snapshot (--subnet SUBNET | --from PATH) [--layout NAME] [--no-labels]
+                                  --output PATH [--output PATH ...]
+
+License:
+    This program is under the GNU GPLv3 License.
+"""
+
+import argparse
+import csv
+import functools
+import ipaddress
+import json
+import os
+import queue
+import sys
+import time
+
+# Imports of Self-Made files
+import arp_monitor
+import arp_scan
+import layouts
+import metrics
+import scan_scheduler
+
+ENRICHMENT_TIMEOUT = 300  # Default seconds the scan waits for the enrichment of the discovered devices
+
+CSV_FIELDS = ["record", "kind", "subnet", "ip", "mac", "previous_mac", "vendor", "hostname", "open_ports", "phase",
+              "seconds", "timestamp"]
+
+
+class RecordWriter:
+    """
+    Writes device and timing records to a stream, flushing after every record so consumers see them immediately.
+    """
+
+    def __init__(self, output_format: str, stream=sys.stdout):
+        """
+        :param output_format: "jsonl" or "csv".
+        :param stream: the stream records are written to.
+        """
+        self.stream = stream
+        self.csv_writer = None
+        if output_format == "csv":
+            self.csv_writer = csv.DictWriter(stream, fieldnames=CSV_FIELDS, extrasaction="ignore")
+            self.csv_writer.writeheader()
+
+    def write(self, record: dict) -> None:
+        """
+        Writes a single record.
+        :param record: the record, with a "record" key set to "device", "info", "event" or "timing".
+        :return None:
+        """
+        if self.csv_writer:
+            self.csv_writer.writerow(record)
+        else:
+            self.stream.write(json.dumps(record) + "\n")
+        self.stream.flush()
+
+    def device(self, subnet, ip: str, mac: str) -> None:
+        """
+        Writes a discovered device.
+        :param subnet: the subnet the device was discovered in.
+        :param ip: the IP address of the device.
+        :param mac: the MAC address of the device.
+        :return None:
+        """
+        self.write({"record": "device", "subnet": str(subnet), "ip": ip, "mac": mac})
+
+    def info(self, info) -> None:
+        """
+        Writes what the enrichment learned about a device.
+        :param info: the enrichment.DeviceInfo.
+        :return None:
+        """
+        record = {"record": "info", "subnet": str(info.network), "ip": info.ip, "mac": info.mac,
+                  "vendor": info.vendor or "", "hostname": info.hostname or "", "open_ports": list(info.open_ports)}
+        if self.csv_writer:
+            record["open_ports"] = " ".join(map(str, info.open_ports))
+        self.write(record)
+
+    def event(self, event) -> None:
+        """
+        Writes a device event of the passive monitor.
+        :param event: the arp_monitor.DeviceEvent.
+        :return None:
+        """
+        self.write({"record": "event", "kind": event.kind, "subnet": str(event.network), "ip": event.ip,
+                    "mac": event.mac, "previous_mac": event.previous_mac or "", "timestamp": event.timestamp})
+
+    def timing(self, phase: str, seconds: float, subnet=None) -> None:
+        """
+        Writes how long a phase of the scan took.
+        :param phase: the name of the phase.
+        :param seconds: the duration of the phase.
+        :param subnet: the subnet the phase relates to, if any.
+        :return None:
+        """
+        self.write({"record": "timing", "subnet": str(subnet) if subnet else "", "phase": phase,
+                    "seconds": round(seconds, 6)})
+
+
+def select_targets(interfaces: [str], subnets: [str]) -> [(str, ipaddress.IPv4Network)]:
+    """
+    Selects the (interface, subnet) pairs to scan.
+    :param interfaces: names of the interfaces to scan. If both this and subnets are empty, all active ones are.
+    :param subnets: subnets to scan, sent on the interface routing to them.
+    :return list: (interface, subnet) tuples. The interface is None for subnets given explicitly.
+    """
+    targets = []
+    if interfaces or not subnets:
+        active_interfaces = arp_scan.get_active_interfaces()
+        unknown = set(interfaces) - {interface for interface, _ in active_interfaces}
+        if unknown:
+            raise ValueError(f"Not an active interface: {', '.join(sorted(unknown))}")
+        targets += [(interface, network) for interface, network in active_interfaces
+                    if not interfaces or interface in interfaces]
+    targets += [(None, ipaddress.ip_network(subnet, strict=False)) for subnet in subnets]
+    return targets
+
+
+def scan_command(args: argparse.Namespace) -> None:
+    """
+    Runs a scan and streams its records to stdout.
+    :param args: the parsed command line arguments.
+    :return None:
+    """
+    writer = RecordWriter(args.format)
+    start_time = time.perf_counter()
+    targets = select_targets(args.interface, args.subnet)
+    writer.timing("select_targets", time.perf_counter() - start_time)
+
+    scan_function = None
+    store = None
+    if args.incremental:
+        import inventory
+        store = inventory.Inventory()
+        scan_function = store.refresh
+
+    pool = None
+    if args.processes:
+        import scan_workers
+        pool = scan_workers.ScanWorkerPool(args.processes, inventory_store=store)
+        scan_function = pool.refresh if store else pool.discover
+
+    scheduler = None
+    if args.watch:
+        scheduler = scan_scheduler.RescanScheduler(functools.partial(scan_function or arp_scan.discover,
+                                                                     timeout=args.timeout, engine=args.engine),
+                                                   interval=args.watch)
+        interface_of = {network: interface for interface, network in targets}
+
+    enricher = None
+    if args.enrich or args.ports:
+        import enrichment
+        enricher = enrichment.Enricher(ports=args.ports)
+        enricher.start()
+
+    try:
+        scan_start_time = time.perf_counter()
+        for network, discovered, elapsed, error in arp_scan.scan_concurrently(targets, timeout=args.timeout,
+                                                                              max_workers=args.concurrency,
+                                                                              engine=args.engine,
+                                                                              scan_function=scan_function):
+            if error is not None:
+                print(f"Could not scan {network}: {error}", file=sys.stderr)
+                if scheduler:
+                    scheduler.schedule(interface_of[network], network, [])
+                continue
+            for ip, mac in discovered:
+                writer.device(network, ip, mac)
+            writer.timing("scan_subnet", elapsed, network)
+            if enricher:
+                enricher.submit(network, discovered)
+            if scheduler:
+                scheduler.schedule(interface_of[network], network, discovered)
+        writer.timing("scan", time.perf_counter() - scan_start_time)
+        if enricher:
+            enrichment_start_time = time.perf_counter()
+            deadline = enrichment_start_time + args.enrich_timeout
+            while (enricher.pending or not enricher.results.empty()) and time.perf_counter() < deadline:
+                try:
+                    writer.info(enricher.results.get(timeout=0.1))
+                except queue.Empty:
+                    pass
+            if enricher.pending:
+                print(f"Enrichment timed out, {enricher.pending} devices were not enriched", file=sys.stderr)
+            enricher.stop()
+            writer.timing("enrichment", time.perf_counter() - enrichment_start_time)
+        writer.timing("total", time.perf_counter() - start_time)
+        if scheduler:
+            stream_events(writer, scheduler)
+    finally:
+        if pool:
+            pool.stop()
+
+
+def stream_events(writer: RecordWriter, source) -> None:
+    """
+    Starts a source of device events and writes its events, until interrupted.
+    :param writer: the writer of the records.
+    :param source: an arp_monitor.ArpMonitor or a scan_scheduler.RescanScheduler.
+    :return None:
+    """
+    source.start()
+    try:
+        while True:
+            writer.event(source.events.get())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        source.stop()
+
+
+def monitor_command(args: argparse.Namespace) -> None:
+    """
+    Monitors the network passively and streams the device events to stdout, until interrupted.
+    :param args: the parsed command line arguments.
+    :return None:
+    """
+    writer = RecordWriter(args.format)
+    interfaces = select_targets(args.interface, [])
+    monitor = arp_monitor.ArpMonitor(interfaces, leave_after=args.leave_after, gratuitous=args.gratuitous,
+                                     dhcp=args.dhcp)
+    stream_events(writer, monitor)
+
+
+def snapshot_command(args: argparse.Namespace) -> None:
+    """
+    Takes the snapshot of a subnet overview (or loads one) and writes it to every output, by extension: a
+    snapshot (.json, .npz) or an image (.svg, .png). Streams the timing of every phase to stdout.
+    :param args: the parsed command line arguments.
+    :return None:
+    """
+    import offline_renderer
+    import snapshot
+    import topology
+
+    for path in args.output:
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in snapshot.SNAPSHOT_FORMATS + offline_renderer.RENDER_FORMATS:
+            raise ValueError(f"Unknown output format {extension or path}, expected one of "
+                             f"{', '.join(snapshot.SNAPSHOT_FORMATS + offline_renderer.RENDER_FORMATS)}")
+
+    writer = RecordWriter("jsonl")
+    start_time = time.perf_counter()
+    if args.source:
+        subnet_snapshot = snapshot.load(args.source)
+        writer.timing("load", time.perf_counter() - start_time, subnet_snapshot.subnet)
+    else:
+        import inventory
+        network = ipaddress.ip_network(args.subnet, strict=False)
+        devices = [(device.ip, device.mac) for device in inventory.Inventory().devices(network)]
+        if not devices:
+            raise ValueError(f"No known device in {network}, scan it first (cli.py scan --incremental)")
+        subnet_topology = topology.build_topology(network, devices, gateways=arp_scan.get_gateways(),
+                                                  neighbors=topology.read_neighbor_table(),
+                                                  local_ip=arp_scan.get_local_address(network))
+        writer.timing("topology", time.perf_counter() - start_time, network)
+        layout_start_time = time.perf_counter()
+        coordinates = layouts.LAYOUTS[args.layout](len(subnet_topology.nodes), center=subnet_topology.hub,
+                                                   edges=subnet_topology.all_edges())
+        writer.timing("layout", time.perf_counter() - layout_start_time, network)
+        subnet_snapshot = snapshot.take(network, args.layout, devices, subnet_topology,
+                                        dict(zip(subnet_topology.nodes, coordinates.tolist())))
+
+    for path in args.output:
+        output_start_time = time.perf_counter()
+        if os.path.splitext(path)[1].lower() in snapshot.SNAPSHOT_FORMATS:
+            snapshot.save(subnet_snapshot, path)
+        else:
+            offline_renderer.render(subnet_snapshot.topology, subnet_snapshot.positions, path, labels=args.labels)
+        writer.timing(f"write {path}", time.perf_counter() - output_start_time, subnet_snapshot.subnet)
+    writer.timing("total", time.perf_counter() - start_time)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Builds the command line parser.
+    :return argparse.ArgumentParser:
+    """
+    parser = argparse.ArgumentParser(prog="cli.py", description="Network Visualizer - headless scanner.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    metrics_options = argparse.ArgumentParser(add_help=False)
+    metrics_options.add_argument("--metrics-port", type=int, metavar="PORT",
+                                 help="serve the scan metrics on http://127.0.0.1:PORT/metrics (Prometheus text "
+                                      "format) and /metrics.json while running")
+    metrics_options.add_argument("--metrics-json", metavar="PATH", help="write the scan metrics to PATH on exit")
+
+    scan_parser = commands.add_parser("scan", parents=[metrics_options],
+                                      help="scan the local network and stream the discovered devices")
+    scan_parser.add_argument("-i", "--interface", action="append", default=[],
+                             help="interface to scan (repeatable, default: all active interfaces)")
+    scan_parser.add_argument("-s", "--subnet", action="append", default=[],
+                             help="subnet to scan, e.g. 192.168.1.0/24 (repeatable)")
+    scan_parser.add_argument("-t", "--timeout", type=float, default=arp_scan.DEFAULT_TIMEOUT,
+                             help="reply timeout in seconds (default: %(default)s)")
+    scan_parser.add_argument("-c", "--concurrency", type=int,
+                             help="maximum number of subnets scanned at the same time (default: all)")
+    scan_parser.add_argument("-e", "--engine", choices=arp_scan.ENGINES, default=arp_scan.DEFAULT_ENGINE,
+                             help="scan engine (default: %(default)s)")
+    scan_parser.add_argument("-f", "--format", choices=["jsonl", "csv"], default="jsonl",
+                             help="output format (default: %(default)s)")
+    scan_parser.add_argument("-P", "--processes", type=int, metavar="N",
+                             help="scan the subnets in N worker processes instead of threads of a single process "
+                                  "(for many subnets, e.g. VLANs)")
+    scan_parser.add_argument("--incremental", action="store_true",
+                             help="rescan incrementally, using and updating the persistent device inventory")
+    scan_parser.add_argument("--enrich", action="store_true",
+                             help="also look up the vendor and host name of every device, after discovery")
+    scan_parser.add_argument("-p", "--ports", type=int, nargs="+", default=[], metavar="PORT",
+                             help="also probe these TCP ports on every device (implies --enrich)")
+    scan_parser.add_argument("--enrich-timeout", type=float, default=ENRICHMENT_TIMEOUT, metavar="SECONDS",
+                             help="maximum time spent waiting for the enrichment (default: %(default)s)")
+    scan_parser.add_argument("-w", "--watch", type=float, metavar="SECONDS",
+                             help="keep rescanning every SECONDS, streaming join/leave/change events")
+    scan_parser.set_defaults(function=scan_command)
+
+    monitor_parser = commands.add_parser("monitor", parents=[metrics_options],
+                                         help="passively listen to ARP traffic and stream device events")
+    monitor_parser.add_argument("-i", "--interface", action="append", default=[],
+                                help="interface to listen on (repeatable, default: all active interfaces)")
+    monitor_parser.add_argument("--leave-after", type=float, default=arp_monitor.LEAVE_AFTER,
+                                help="seconds without traffic before a device is reported as gone "
+                                     "(default: %(default)s)")
+    monitor_parser.add_argument("--no-gratuitous", dest="gratuitous", action="store_false",
+                                help="ignore gratuitous ARP announcements")
+    monitor_parser.add_argument("--dhcp", action="store_true", help="also sniff DHCP acknowledgements")
+    monitor_parser.add_argument("-f", "--format", choices=["jsonl", "csv"], default="jsonl",
+                                help="output format (default: %(default)s)")
+    monitor_parser.set_defaults(function=monitor_command)
+
+    snapshot_parser = commands.add_parser("snapshot", parents=[metrics_options],
+                                          help="export the overview of a subnet as a snapshot or an SVG/PNG image")
+    source = snapshot_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("-s", "--subnet", help="subnet whose known devices (see scan --incremental) are exported")
+    source.add_argument("--from", dest="source", metavar="PATH", help="snapshot to load instead, e.g. to render it")
+    snapshot_parser.add_argument("-l", "--layout", choices=list(layouts.LAYOUTS), default=layouts.DEFAULT_LAYOUT,
+                                 help="layout of the subnet overview (default: %(default)s)")
+    snapshot_parser.add_argument("-o", "--output", action="append", required=True, metavar="PATH",
+                                 help="file to write (repeatable): a snapshot (.npz, .json) or an image (.svg, .png)")
+    snapshot_parser.add_argument("--no-labels", dest="labels", action="store_false",
+                                 help="do not draw the labels of the devices on images")
+    snapshot_parser.set_defaults(function=snapshot_command)
+    return parser
+
+
+def main() -> None:
+    """
+    Entry point of the headless scanner.
+    :return None:
+    """
+    parser = build_parser()
+    args = parser.parse_args()
+    metrics_server = metrics.serve(args.metrics_port) if args.metrics_port else None
+    try:
+        args.function(args)
+    except ValueError as error:
+        parser.error(str(error))
+    finally:
+        if metrics_server:
+            metrics_server.stop()
+        if args.metrics_json:
+            metrics.REGISTRY.dump_json(args.metrics_json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,411 @@
+"""
+This program was written by Yonatan Deri.
+It follows the PEP8 guidelines.
+
+Description:
+    This file serves as a module in the network_visualizer project.
+    It implements the DeviceTable, the in-memory store of the discovered devices: IPv4 addresses as uint32, MAC
+    addresses as 48-bit integers (uint64) and last-seen times in NumPy columns, an open-addressing hash index from
+    (subnet, IP address) to row, and rows kept grouped (and sorted by IP address) per subnet, so every subnet is a
+    contiguous slice of the columns. Filters (IP range, vendor prefix, last seen) are vectorised over the columns.
+
+License:
+    This program is under the GNU GPLv3 License.
+"""
+
+import ipaddress
+import socket
+import threading
+import time
+from typing import Iterable, Optional
+
+import numpy as np
+
+DEFAULT_CAPACITY = 1024
+MAX_LOAD_FACTOR = 0.5  # Maximum ratio of used slots in the hash index
+FIBONACCI_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)  # 2^64 / golden ratio, spreads consecutive keys
+
+
+def ips_to_ints(ips: Iterable[str]) -> np.ndarray:
+    """
+    Converts IPv4 addresses to integers.
+    :param ips: the IPv4 addresses, as strings.
+    :return np.ndarray: uint32 array.
+    """
+    return np.frombuffer(b"".join(map(socket.inet_aton, ips)), dtype=">u4").astype(np.uint32)
+
+
+def ints_to_ips(values: np.ndarray) -> [str]:
+    """
+    Converts integers to IPv4 addresses.
+    :param values: uint32 array.
+    :return list: the IPv4 addresses, as strings.
+    """
+    packed = np.asarray(values, dtype=">u4").tobytes()
+    return [socket.inet_ntoa(packed[i:i + 4]) for i in range(0, len(packed), 4)]
+
+
+def macs_to_ints(macs: Iterable[str]) -> np.ndarray:
+    """
+    Converts MAC addresses (with ':' or '-' separators, or none) to 48-bit integers.
+    :param macs: the MAC addresses, as strings.
+    :return np.ndarray: uint64 array.
+    """
+    packed = np.frombuffer(b"".join(bytes.fromhex(mac.replace(":", "").replace("-", "")) for mac in macs),
+                           dtype=np.uint8).reshape(-1, 6).astype(np.uint64)
+    return (packed << np.arange(40, -1, -8, dtype=np.uint64)).sum(axis=1, dtype=np.uint64)
+
+
+def ints_to_macs(values: np.ndarray) -> [str]:
+    """
+    Converts 48-bit integers to MAC addresses.
+    :param values: uint64 array.
+    :return list: the MAC addresses, as lowercase strings with ':' separators.
+    """
+    packed = np.asarray(values, dtype=">u8").tobytes()
+    return [packed[i + 2:i + 8].hex(":") for i in range(0, len(packed), 8)]
+
+
+def parse_prefix(prefix: str) -> (int, int):
+    """
+    Parses a MAC address prefix, e.g. "00:50:56" (OUI) or "00:1B:C5:00:00/36".
+    :param prefix: the prefix.
+    :return tuple: (prefix length in bits, prefix value).
+    """
+    digits, _, bits = prefix.partition("/")
+    digits = digits.replace(":", "").replace("-", "")
+    bits = int(bits) if bits else 4 * len(digits)
+    return bits, (int(digits, 16) << (48 - 4 * len(digits))) >> (48 - bits)
+
+
+class DeviceTable:
+    """
+    Devices of every subnet, stored column-wise. Thread-safe.
+    Updates of known devices are done in place; new devices are appended, and removed ones only marked dead, until
+    the next read by subnet regroups the rows (see compact()).
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        """
+        :param capacity: number of rows allocated up front (the columns grow as needed).
+        """
+        self._lock = threading.RLock()
+        self._networks = []  # Subnet id -> subnet
+        self._network_ids = {}  # Subnet -> subnet id
+        self._size = 0  # Rows in use, dead ones included
+        self._ip = np.zeros(capacity, dtype=np.uint32)
+        self._mac = np.zeros(capacity, dtype=np.uint64)
+        self._subnet = np.zeros(capacity, dtype=np.uint16)
+        self._last_seen = np.zeros(capacity, dtype=np.float64)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._compact = True  # Whether the rows are grouped by subnet, sorted by IP address, without dead rows
+        self._starts = np.zeros(1, dtype=np.int64)  # First row of every subnet (when compact)
+        self._rebuild_index()
+
+    # Hash index: open addressing with linear probing over the keys (subnet id << 32 | IP address) of the rows.
+    # A slot only holds row + 1 (0 marks an empty slot); keys are compared through the columns.
+
+    @staticmethod
+    def _keys(subnet_ids: np.ndarray, ips: np.ndarray) -> np.ndarray:
+        return (subnet_ids.astype(np.uint64) << np.uint64(32)) | ips.astype(np.uint64)
+
+    def _hash(self, keys: np.ndarray) -> np.ndarray:
+        return ((keys * FIBONACCI_MULTIPLIER) >> np.uint64(64 - self._index_bits)).astype(np.int64)
+
+    def _row_keys(self, rows: np.ndarray) -> np.ndarray:
+        return self._keys(self._subnet[rows], self._ip[rows])
+
+    def _rebuild_index(self) -> None:
+        self._index_bits = max(int(np.ceil(np.log2(max(self._size, 1) / MAX_LOAD_FACTOR))), 4)
+        self._slots = np.zeros(1 << self._index_bits, dtype=np.int32)
+        self._used_slots = 0
+        self._insert(self._keys(self._subnet[:self._size], self._ip[:self._size]),
+                     np.arange(self._size, dtype=np.int32))
+
+    def _insert(self, keys: np.ndarray, rows: np.ndarray) -> None:
+        """
+        Adds keys (missing from the index, and unique) to the index, probing for all of them at once.
+        """
+        mask = len(self._slots) - 1
+        slots = self._hash(keys)
+        pending = np.arange(len(keys))
+        while len(pending):
+            empty = self._slots[slots[pending]] == 0
+            candidates = pending[empty]
+            _, first = np.unique(slots[candidates], return_index=True)  # One key per free slot and round
+            placed = candidates[first]
+            self._slots[slots[placed]] = rows[placed] + 1
+            is_placed = np.zeros(len(keys), dtype=bool)
+            is_placed[placed] = True
+            pending = pending[~is_placed[pending]]
+            slots[pending] = (slots[pending] + 1) & mask
+        self._used_slots += len(keys)
+
+    def _lookup(self, keys: np.ndarray) -> np.ndarray:
+        """
+        Finds the rows of keys, probing for all of them at once.
+        :return np.ndarray: the row of every key, or -1 if it is missing.
+        """
+        mask = len(self._slots) - 1
+        slots = self._hash(keys)
+        rows = np.full(len(keys), -1, dtype=np.int64)
+        pending = np.arange(len(keys))
+        while len(pending):
+            slot_rows = self._slots[slots[pending]].astype(np.int64) - 1
+            occupied = slot_rows >= 0
+            found = occupied.copy()
+            found[occupied] = self._row_keys(slot_rows[occupied]) == keys[pending[occupied]]
+            rows[pending[found]] = slot_rows[found]
+            pending = pending[occupied & ~found]
+            slots[pending] = (slots[pending] + 1) & mask
+        return rows
+
+    def _lookup_one(self, network_id: int, ip: int) -> int:
+        """
+        Finds the row of a single key, probing without array operations (faster than _lookup() for one key).
+        :return int: the row, or -1 if it is missing.
+        """
+        mask = len(self._slots) - 1
+        slot = ((((network_id << 32) | ip) * int(FIBONACCI_MULTIPLIER)) & 0xFFFFFFFFFFFFFFFF) >> (64 - self._index_bits)
+        slots, subnets, ips = self._slots, self._subnet, self._ip
+        while True:
+            row = int(slots[slot]) - 1
+            if row < 0:
+                return -1
+            if ips[row] == ip and subnets[row] == network_id:
+                return row
+            slot = (slot + 1) & mask
+
+    def _network_id(self, network, create: bool = False) -> Optional[int]:
+        network_id = self._network_ids.get(network)
+        if network_id is not None:
+            return network_id
+        network = ipaddress.ip_network(str(network), strict=False)
+        network_id = self._network_ids.get(network)
+        if network_id is None and create:
+            network_id = self._network_ids[network] = len(self._networks)
+            self._networks.append(network)
+            self._compact = False
+        return network_id
+
+    def _grow(self, size: int) -> None:
+        capacity = max(len(self._ip), 1)
+        if size <= len(self._ip):
+            return
+        while capacity < size:
+            capacity *= 2
+        for name in ("_ip", "_mac", "_subnet", "_last_seen", "_alive"):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            setattr(self, name, grown)
+
+    def _upsert(self, network_id: int, ips: np.ndarray, macs: np.ndarray, seen_at) -> None:
+        rows = self._lookup(self._keys(np.full(len(ips), network_id, dtype=np.uint16), ips))
+        known = rows >= 0
+        self._mac[rows[known]] = macs[known]
+        self._last_seen[rows[known]] = seen_at[known] if np.ndim(seen_at) else seen_at
+        self._alive[rows[known]] = True
+
+        new_ips, last = np.unique(ips[~known][::-1], return_index=True)  # The last duplicate wins, as for updates
+        if not len(new_ips):
+            return
+        last = np.count_nonzero(~known) - 1 - last
+        start = self._size
+        self._grow(start + len(new_ips))
+        self._size += len(new_ips)
+        self._ip[start:self._size] = new_ips
+        self._mac[start:self._size] = macs[~known][last]
+        self._last_seen[start:self._size] = seen_at[~known][last] if np.ndim(seen_at) else seen_at
+        self._subnet[start:self._size] = network_id
+        self._alive[start:self._size] = True
+        self._compact = False
+        if (self._used_slots + len(new_ips)) > MAX_LOAD_FACTOR * len(self._slots):
+            self._rebuild_index()
+        else:
+            self._insert(self._keys(self._subnet[start:self._size], new_ips),
+                         np.arange(start, self._size, dtype=np.int32))
+
+    def add(self, network, devices: [(str, str)], seen_at=None) -> None:
+        """
+        Adds devices to a subnet, or updates them if they are already known.
+        :param network: the subnet.
+        :param devices: (ip, mac) tuples.
+        :param seen_at: when the devices were seen (UNIX timestamp), or a timestamp per device. Defaults to now.
+        :return None:
+        """
+        devices = list(devices)
+        seen_at = np.asarray(time.time() if seen_at is None else seen_at, dtype=np.float64)
+        with self._lock:
+            network_id = self._network_id(network, create=True)
+            if devices:
+                self._upsert(network_id, ips_to_ints(ip for ip, _ in devices),
+                             macs_to_ints(mac for _, mac in devices), seen_at)
+
+    def replace(self, network, devices: [(str, str)], seen_at=None) -> None:
+        """
+        Sets the devices of a subnet (e.g. to the result of a scan), removing the ones not among them.
+        :param network: the subnet.
+        :param devices: (ip, mac) tuples.
+        :param seen_at: when the devices were seen (UNIX timestamp), or a timestamp per device. Defaults to now.
+        :return None:
+        """
+        with self._lock:
+            network_id = self._network_id(network)
+            if network_id is not None:
+                if self._compact:
+                    self._alive[self._starts[network_id]:self._starts[network_id + 1]] = False
+                else:
+                    self._alive[:self._size][self._subnet[:self._size] == network_id] = False
+                self._compact = False
+            self.add(network, devices, seen_at)
+
+    def remove(self, network, ip: str) -> None:
+        """
+        Removes a device.
+        :param network: the subnet of the device.
+        :param ip: the IP address of the device.
+        :return None:
+        """
+        with self._lock:
+            network_id = self._network_id(network)
+            if network_id is None:
+                return
+            row = self._lookup_one(network_id, int.from_bytes(socket.inet_aton(ip), "big"))
+            if row >= 0 and self._alive[row]:
+                self._alive[row] = False
+                self._compact = False
+
+    def get(self, network, ip: str) -> Optional[str]:
+        """
+        Gets the MAC address of a device.
+        :param network: the subnet of the device.
+        :param ip: the IP address of the device.
+        :return str: the MAC address, or None if the device is unknown.
+        """
+        with self._lock:
+            network_id = self._network_id(network)
+            if network_id is None:
+                return None
+            row = self._lookup_one(network_id, int.from_bytes(socket.inet_aton(ip), "big"))
+            if row < 0 or not self._alive[row]:
+                return None
+            return int(self._mac[row]).to_bytes(6, "big").hex(":")
+
+    def compact(self) -> None:
+        """
+        Drops the dead rows and regroups the rows by subnet (sorted by IP address), rebuilding the hash index.
+        Called on the first read by subnet after a change; cheap when nothing changed.
+        :return None:
+        """
+        with self._lock:
+            if self._compact:
+                return
+            alive = np.flatnonzero(self._alive[:self._size])
+            order = alive[np.argsort(self._keys(self._subnet[alive], self._ip[alive]), kind="stable")]
+            for name in ("_ip", "_mac", "_subnet", "_last_seen", "_alive"):
+                column = getattr(self, name)
+                column[:len(order)] = column[order]
+                column[len(order):self._size] = 0
+            self._size = len(order)
+            self._starts = np.searchsorted(self._subnet[:self._size], np.arange(len(self._networks) + 1))
+            self._rebuild_index()
+            self._compact = True
+
+    def columns(self, network) -> (np.ndarray, np.ndarray, np.ndarray):
+        """
+        Gets the columns of a subnet, sorted by IP address.
+        :param network: the subnet.
+        :return tuple: copies of the (uint32 IP address, uint64 MAC address, float64 last seen) columns.
+        """
+        with self._lock:
+            self.compact()
+            network_id = self._network_id(network)
+            if network_id is None:
+                return (np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.float64))
+            rows = slice(self._starts[network_id], self._starts[network_id + 1])
+            return self._ip[rows].copy(), self._mac[rows].copy(), self._last_seen[rows].copy()
+
+    def devices(self, network) -> [(str, str)]:
+        """
+        Gets the devices of a subnet, sorted by IP address.
+        :param network: the subnet.
+        :return list: (ip, mac) tuples.
+        """
+        ips, macs, _ = self.columns(network)
+        return list(zip(ints_to_ips(ips), ints_to_macs(macs)))
+
+    def count(self, network) -> int:
+        """
+        Gets the number of devices of a subnet.
+        :param network: the subnet.
+        :return int:
+        """
+        with self._lock:
+            network_id = self._network_id(network)
+            if network_id is None:
+                return 0
+            return int(np.count_nonzero(self._alive[:self._size] & (self._subnet[:self._size] == network_id)))
+
+    def subnets(self) -> [ipaddress.IPv4Network]:
+        """
+        Gets the subnets added to the table, including the ones without devices.
+        :return list:
+        """
+        with self._lock:
+            return list(self._networks)
+
+    def select(self, network=None, ip_range=None, vendor_prefix: Optional[str] = None,
+               seen_since: Optional[float] = None, seen_before: Optional[float] = None) -> [(str, str, str)]:
+        """
+        Finds the devices matching every given filter, evaluated over whole columns at once.
+        :param network: only the devices of this subnet.
+        :param ip_range: only the devices in this range: a subnet (e.g. "10.0.0.0/16") or a (first, last) tuple of
+        IP addresses.
+        :param vendor_prefix: only the devices whose MAC address starts with this prefix, e.g. "00:50:56" or
+        "00:1B:C5:00:00/36".
+        :param seen_since: only the devices seen at or after this time (UNIX timestamp).
+        :param seen_before: only the devices last seen before this time (UNIX timestamp).
+        :return list: (subnet, ip, mac) tuples.
+        """
+        with self._lock:
+            self.compact()
+            rows = slice(0, self._size)
+            if network is not None:
+                network_id = self._network_id(network)
+                if network_id is None:
+                    return []
+                rows = slice(self._starts[network_id], self._starts[network_id + 1])
+            ips, macs, last_seen = self._ip[rows], self._mac[rows], self._last_seen[rows]
+            subnet_ids = self._subnet[rows]
+
+            selected = np.ones(len(ips), dtype=bool)
+            if ip_range is not None:
+                if isinstance(ip_range, tuple):
+                    first, last = (int(ipaddress.IPv4Address(ip)) for ip in ip_range)
+                else:
+                    ip_range = ipaddress.ip_network(str(ip_range), strict=False)
+                    first, last = int(ip_range.network_address), int(ip_range.broadcast_address)
+                selected &= (ips >= first) & (ips <= last)
+            if vendor_prefix is not None:
+                bits, value = parse_prefix(vendor_prefix)
+                selected &= (macs >> np.uint64(48 - bits)) == value
+            if seen_since is not None:
+                selected &= last_seen >= seen_since
+            if seen_before is not None:
+                selected &= last_seen < seen_before
+            return [(self._networks[network_id], ip, mac) for network_id, ip, mac in
+                    zip(subnet_ids[selected].tolist(), ints_to_ips(ips[selected]), ints_to_macs(macs[selected]))]
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The memory used by the columns and the hash index, in bytes.
+        :return int:
+        """
+        return sum(array.nbytes for array in (self._ip, self._mac, self._subnet, self._last_seen, self._alive,
+                                              self._slots, self._starts))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return int(np.count_nonzero(self._alive[:self._size]))
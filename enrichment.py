@@ -0,0 +1,420 @@
+"""
+This program was written by Yonatan Deri.
+It follows the PEP8 guidelines.
+
+Description:
+    This file serves as a module in the network_visualizer project.
+    It enriches discovered devices with their vendor (from the OUI prefix of their MAC address), their host name
+    (reverse DNS) and, optionally, their open TCP ports. Vendors are looked up by binary search in a pre-built,
+    memory-mapped index of the Wireshark "manuf" table; host names and ports are resolved with bounded asyncio
+    concurrency in a background thread, and cached with a TTL, so enrichment never blocks discovery.
+
+License:
+    This program is under the GNU GPLv3 License.
+"""
+
+import asyncio
+import concurrent.futures
+import ipaddress
+import mmap
+import os
+import queue
+import socket
+import struct
+import sys
+import threading
+import time
+from typing import Iterable, NamedTuple, Optional
+
+import numpy as np
+
+# Imports of Self-Made files
+import arp_monitor
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.expanduser("~"), ".network_visualizer", "oui.idx")
+INDEX_MAGIC = b"OUIX0001"
+INDEX_HEADER = struct.Struct("<8sQ")  # Magic, number of entries
+
+DNS_TTL = 60 * 60  # Seconds a resolved host name stays cached
+PORTS_TTL = 10 * 60  # Seconds the result of a port probe stays cached
+DNS_TIMEOUT = 2
+CONNECT_TIMEOUT = 0.5
+MAX_CONCURRENCY = 256  # Maximum number of DNS queries and connection attempts in flight
+DNS_WORKERS = 64  # Threads running the (blocking) reverse DNS queries
+COMMON_PORTS = (22, 53, 80, 139, 443, 445, 3389, 8080)
+
+
+class DeviceInfo(NamedTuple):
+    """
+    What was learned about a device besides its IP and MAC addresses.
+    """
+    network: Optional[ipaddress.IPv4Network]
+    ip: str
+    mac: str
+    vendor: Optional[str]
+    hostname: Optional[str]
+    open_ports: tuple
+
+    def label(self) -> str:
+        """
+        Short description of the device, for the subnet overview.
+        :return str:
+        """
+        details = [detail for detail in (self.hostname, self.vendor) if detail]
+        if self.open_ports:
+            details.append("ports " + ",".join(map(str, self.open_ports)))
+        return "\n".join(details)
+
+
+def mac_to_int(mac: str) -> int:
+    """
+    Converts a MAC address (with ':', '-' or '.' separators, or none) to a 48-bit integer.
+    :param mac: the MAC address.
+    :return int:
+    """
+    return int(mac.replace(":", "").replace("-", "").replace(".", ""), 16)
+
+
+def read_manuf(lines: Iterable[str]) -> [(int, int, str)]:
+    """
+    Parses a table in the Wireshark "manuf" format ("00:00:0C<TAB>Cisco<TAB>Cisco Systems, Inc", prefixes longer
+    than 24 bits being written as "00:1B:C5:00:00/36").
+    :param lines: the lines of the table.
+    :return list: (prefix length in bits, prefix, vendor) tuples.
+    """
+    entries = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        parts = [part.strip() for part in line.split("\t")]
+        prefix, _, bits = parts[0].partition("/")
+        digits = prefix.replace(":", "").replace("-", "").replace(".", "")
+        try:
+            value = int(digits, 16)
+        except ValueError:
+            continue
+        bits = int(bits) if bits else 4 * len(digits)
+        value = (value << max(48 - 4 * len(digits), 0)) >> (48 - bits)  # Keep the first `bits` bits only
+        vendor = parts[2] if len(parts) > 2 and parts[2] else parts[1] if len(parts) > 1 else ""
+        entries.append((bits, value, vendor))
+    return entries
+
+
+def manuf_lines(path: Optional[str] = None) -> [str]:
+    """
+    Reads the lines of a "manuf" table.
+    :param path: path of the table. Defaults to the copy bundled with scapy.
+    :return list:
+    """
+    if path:
+        with open(path, "r", encoding="utf-8", errors="replace") as file:
+            return file.readlines()
+    from scapy.libs.manuf import DATA
+    return DATA.split("\n")
+
+
+def build_oui_index(path: str = DEFAULT_INDEX_PATH, source: Optional[str] = None) -> None:
+    """
+    Builds the vendor index: sorted 64-bit keys (prefix length << 48 | prefix), the offsets of the vendor names,
+    then the UTF-8 names, so the index can be memory-mapped and binary-searched without being parsed.
+    :param path: path of the index to write.
+    :param source: path of the "manuf" table. Defaults to the copy bundled with scapy.
+    :return None:
+    """
+    entries = {(bits << 48) | value: vendor for bits, value, vendor in read_manuf(manuf_lines(source))}
+    keys = np.array(sorted(entries), dtype="<u8")
+    names = [entries[int(key)].encode() for key in keys]
+    offsets = np.zeros(len(names) + 1, dtype="<u4")
+    offsets[1:] = np.cumsum([len(name) for name in names])
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(INDEX_HEADER.pack(INDEX_MAGIC, len(keys)))
+        file.write(keys.tobytes())
+        file.write(offsets.tobytes())
+        file.write(b"".join(names))
+    os.replace(temporary_path, path)
+
+
+class OuiTable:
+    """
+    Vendor lookup by the OUI (or longer MA-M/MA-S prefix) of MAC addresses, over the memory-mapped index.
+    Lookups binary-search the keys of every prefix length in use, longest first.
+    """
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH, source: Optional[str] = None):
+        """
+        :param path: path of the index. It is built on first use (and rebuilt when older than the source).
+        :param source: path of the "manuf" table. Defaults to the copy bundled with scapy.
+        """
+        if not os.path.exists(path) or (source and os.path.getmtime(source) > os.path.getmtime(path)):
+            build_oui_index(path, source)
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = INDEX_HEADER.unpack_from(self._map)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"Not a vendor index: {path}")
+        self._keys = np.frombuffer(self._map, dtype="<u8", count=count, offset=INDEX_HEADER.size)
+        self._offsets = np.frombuffer(self._map, dtype="<u4", count=count + 1,
+                                      offset=INDEX_HEADER.size + 8 * count)
+        self._names_offset = INDEX_HEADER.size + 12 * count + 4
+        self._lengths = sorted(np.unique(self._keys >> np.uint64(48)).tolist(), reverse=True)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _name(self, index: int) -> str:
+        start = self._names_offset + int(self._offsets[index])
+        return self._map[start:self._names_offset + int(self._offsets[index + 1])].decode()
+
+    def vendor(self, mac: str) -> Optional[str]:
+        """
+        Looks up the vendor of a MAC address.
+        :param mac: the MAC address.
+        :return str: the vendor, or None if its prefix is not registered.
+        """
+        return self.vendors([mac])[0]
+
+    def vendors(self, macs: [str]) -> [Optional[str]]:
+        """
+        Looks up the vendors of many MAC addresses at once.
+        :param macs: the MAC addresses.
+        :return list: the vendor of every MAC address, or None if its prefix is not registered.
+        """
+        values = np.array([mac_to_int(mac) for mac in macs], dtype=np.uint64)
+        found = np.full(len(values), -1, dtype=np.int64)
+        for bits in self._lengths:
+            missing = found < 0
+            if not missing.any():
+                break
+            wanted = (np.uint64(bits) << np.uint64(48)) | (values[missing] >> np.uint64(48 - bits))
+            indices = np.searchsorted(self._keys, wanted)
+            hits = indices < len(self._keys)
+            hits[hits] = self._keys[indices[hits]] == wanted[hits]
+            found[np.flatnonzero(missing)[hits]] = indices[hits]
+        return [self._name(index) if index >= 0 else None for index in found.tolist()]
+
+    def close(self) -> None:
+        """
+        Unmaps the index.
+        :return None:
+        """
+        self._keys = self._offsets = None
+        self._map.close()
+
+
+class TTLCache:
+    """
+    A thread-safe dictionary whose entries expire a fixed time after being set.
+    """
+
+    def __init__(self, ttl: float):
+        """
+        :param ttl: seconds an entry stays valid.
+        """
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Gets the value of a key, if set and not expired.
+        :param key: the key.
+        :param default: returned if the key is missing or expired.
+        :return: the value.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return default
+            return entry[1]
+
+    def set(self, key, value) -> None:
+        """
+        Sets the value of a key, valid for ttl seconds.
+        :param key: the key.
+        :param value: the value.
+        :return None:
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, self) is not self
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class Enricher:
+    """
+    Enrichment stage fed by discovery: submit() returns immediately, and the DeviceInfo of every submitted device
+    is put on the bounded `results` queue (dropping the oldest ones when the consumer lags) as soon as it is known.
+    Host names and ports are resolved on an asyncio loop of its own, in a background thread.
+    """
+
+    def __init__(self, ports: Iterable[int] = (), oui_table: Optional[OuiTable] = None,
+                 max_concurrency: int = MAX_CONCURRENCY, resolve_names: bool = True,
+                 queue_size: int = arp_monitor.EVENT_QUEUE_SIZE):
+        """
+        :param ports: TCP ports to probe on every device (none by default).
+        :param oui_table: the vendor table. Defaults to OuiTable(), opened on first use.
+        :param max_concurrency: maximum number of DNS queries and connection attempts in flight.
+        :param resolve_names: whether host names are resolved (reverse DNS).
+        :param queue_size: maximum number of results waiting on the queue.
+        """
+        self.ports = tuple(ports)
+        self.max_concurrency = max_concurrency
+        self.resolve_names = resolve_names
+        self.results = queue.Queue(maxsize=queue_size)
+        self.dropped_results = 0
+        self.hostnames = TTLCache(DNS_TTL)
+        self.port_states = TTLCache(PORTS_TTL)
+        self._oui_table = oui_table
+        self._loop = None
+        self._thread = None
+        self._semaphore = self._semaphore_loop = None
+        self._dns_executor = concurrent.futures.ThreadPoolExecutor(max_workers=min(DNS_WORKERS, max_concurrency),
+                                                                   thread_name_prefix="enricher_dns")
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+
+    @property
+    def oui_table(self) -> OuiTable:
+        """
+        The vendor table, opened (and its index built, if needed) on first use.
+        :return OuiTable:
+        """
+        if self._oui_table is None:
+            self._oui_table = OuiTable()
+        return self._oui_table
+
+    @property
+    def pending(self) -> int:
+        """
+        The number of submitted devices whose DeviceInfo is not on the queue yet.
+        :return int:
+        """
+        return self._pending
+
+    def start(self) -> None:
+        """
+        Starts the asyncio loop of the enrichment, in a background thread.
+        :return None:
+        """
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="enricher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops the enrichment, abandoning the devices still pending.
+        :return None:
+        """
+        if self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = self._thread = None
+
+    def submit(self, network, devices: [(str, str)]) -> None:
+        """
+        Queues devices for enrichment, without waiting for it.
+        :param network: the subnet of the devices.
+        :param devices: (ip, mac) tuples.
+        :return None:
+        """
+        devices = list(devices)
+        if not devices:
+            return
+        with self._pending_lock:
+            self._pending += len(devices)
+        asyncio.run_coroutine_threadsafe(self._publish(network, devices), self._loop)
+
+    async def _publish(self, network, devices: [(str, str)]) -> None:
+        """
+        Enriches submitted devices, putting their DeviceInfo on the results queue. Devices that could not be
+        enriched (e.g. the vendor table failed to build) are no longer counted as pending.
+        :param network: the subnet of the devices.
+        :param devices: (ip, mac) tuples.
+        :return None:
+        """
+        published = 0
+        try:
+            async for info in self.enrich(devices, network):
+                self.dropped_results += arp_monitor.put_dropping_oldest(self.results, info)
+                published += 1
+                with self._pending_lock:
+                    self._pending -= 1
+        except Exception as error:  # Raised in the loop thread, where nobody would see it
+            print(f"Could not enrich {len(devices) - published} devices of {network}: {error}", file=sys.stderr)
+        finally:
+            with self._pending_lock:
+                self._pending -= len(devices) - published
+
+    async def enrich(self, devices: [(str, str)], network=None):
+        """
+        Enriches devices, yielding the DeviceInfo of each of them as soon as it is complete.
+        :param devices: (ip, mac) tuples.
+        :param network: the subnet of the devices, if known.
+        :return AsyncIterator[DeviceInfo]:
+        """
+        if self._semaphore is None or self._semaphore_loop is not asyncio.get_running_loop():
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = asyncio.get_running_loop()
+        vendors = self.oui_table.vendors([mac for _, mac in devices])
+        tasks = [asyncio.ensure_future(self._enrich_device(network, ip, mac, vendor))
+                 for (ip, mac), vendor in zip(devices, vendors)]
+        for task in asyncio.as_completed(tasks):
+            yield await task
+
+    async def _enrich_device(self, network, ip: str, mac: str, vendor: Optional[str]) -> DeviceInfo:
+        hostname, *open_ports = await asyncio.gather(self.hostname(ip), *(self.port_open(ip, port)
+                                                                          for port in self.ports))
+        return DeviceInfo(network, ip, mac, vendor, hostname,
+                          tuple(port for port, is_open in zip(self.ports, open_ports) if is_open))
+
+    async def hostname(self, ip: str) -> Optional[str]:
+        """
+        Resolves the host name of an IP address (reverse DNS), through the cache.
+        :param ip: the IP address.
+        :return str: the host name, or None if it has none.
+        """
+        if not self.resolve_names:
+            return None
+        if ip in self.hostnames:
+            return self.hostnames.get(ip)
+        async with self._semaphore:
+            try:
+                hostname, _ = await asyncio.wait_for(asyncio.get_running_loop().run_in_executor(
+                    self._dns_executor, socket.getnameinfo, (ip, 0), socket.NI_NAMEREQD), DNS_TIMEOUT)
+            except (OSError, asyncio.TimeoutError):
+                hostname = None
+        self.hostnames.set(ip, hostname)
+        return hostname
+
+    async def port_open(self, ip: str, port: int) -> bool:
+        """
+        Checks whether a TCP port accepts connections, through the cache.
+        :param ip: the IP address.
+        :param port: the TCP port.
+        :return bool:
+        """
+        is_open = self.port_states.get((ip, port))
+        if is_open is not None:
+            return is_open
+        async with self._semaphore:
+            try:
+                _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), CONNECT_TIMEOUT)
+                writer.close()
+                is_open = True
+            except (OSError, asyncio.TimeoutError):
+                is_open = False
+        self.port_states.set((ip, port), is_open)
+        return is_open
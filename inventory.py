@@ -0,0 +1,197 @@
+"""
+This program was written by Yonatan Deri.
+It follows the PEP8 guidelines.
+
+Description:
+    This file serves as a module in the network_visualizer project.
+    It keeps a persistent (SQLite) inventory of the discovered devices, so results survive restarts,
+    and implements incremental rescans on top of it: known hosts are probed first with a short timeout,
+    and the rest of the range is only swept once every FULL_SWEEP_INTERVAL seconds.
+
+License:
+    This program is under the GNU GPLv3 License.
+"""
+
+import ipaddress
+import os
+import sqlite3
+import threading
+import time
+from typing import NamedTuple, Optional
+
+# Imports of Self-Made files
+import arp_scan
+
+DEFAULT_INVENTORY_PATH = os.path.join(os.path.expanduser("~"), ".network_visualizer", "inventory.db")
+
+FULL_SWEEP_INTERVAL = 15 * 60  # Seconds between two sweeps of a whole subnet
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS devices (
+    subnet TEXT NOT NULL,
+    ip TEXT NOT NULL,
+    mac TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    PRIMARY KEY (subnet, ip, mac)
+);
+CREATE TABLE IF NOT EXISTS subnets (
+    subnet TEXT PRIMARY KEY,
+    last_sweep REAL
+);
+"""
+
+
+class InventoryDevice(NamedTuple):
+    """
+    A device of the inventory, with the first and last time (UNIX timestamps) it was seen.
+    """
+    ip: str
+    mac: str
+    first_seen: float
+    last_seen: float
+
+
+class Inventory:
+    """
+    Persistent inventory of the discovered devices, keyed by subnet, IP and MAC.
+    Safe to use from several threads (e.g. the workers of arp_scan.scan_concurrently).
+    """
+
+    def __init__(self, path: str = DEFAULT_INVENTORY_PATH):
+        """
+        Opens (and creates, if needed) the inventory database.
+        :param path: path of the SQLite database file, or ":memory:".
+        """
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """
+        Closes the inventory database.
+        :return None:
+        """
+        with self._lock:
+            self._connection.close()
+
+    def record(self, subnet, devices: [(str, str)], seen_at: Optional[float] = None,
+               full_sweep: bool = False) -> None:
+        """
+        Records devices seen in a subnet.
+        :param subnet: the subnet the devices were discovered in.
+        :param devices: (ip, mac) tuples of the devices.
+        :param seen_at: when the devices were seen (UNIX timestamp). Defaults to now.
+        :param full_sweep: whether the whole subnet was swept (and not only its known hosts probed).
+        :return None:
+        """
+        seen_at = time.time() if seen_at is None else seen_at
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT INTO devices (subnet, ip, mac, first_seen, last_seen) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (subnet, ip, mac) DO UPDATE SET last_seen = excluded.last_seen",
+                [(str(subnet), ip, mac, seen_at, seen_at) for ip, mac in devices])
+            if full_sweep:
+                self._connection.execute(
+                    "INSERT INTO subnets (subnet, last_sweep) VALUES (?, ?) "
+                    "ON CONFLICT (subnet) DO UPDATE SET last_sweep = excluded.last_sweep", (str(subnet), seen_at))
+            else:
+                self._connection.execute("INSERT OR IGNORE INTO subnets (subnet) VALUES (?)", (str(subnet),))
+
+    def subnets(self) -> [ipaddress.IPv4Network]:
+        """
+        Gets every subnet of the inventory.
+        :return list: the subnets, sorted.
+        """
+        with self._lock:
+            rows = self._connection.execute("SELECT subnet FROM subnets").fetchall()
+        return sorted(ipaddress.ip_network(subnet) for subnet, in rows)
+
+    def devices(self, subnet, since: Optional[float] = None) -> [InventoryDevice]:
+        """
+        Gets the devices of a subnet. An IP seen with several MACs is listed with the most recent one.
+        :param subnet: the subnet.
+        :param since: if given, only devices seen at or after this UNIX timestamp are listed.
+        :return list: the devices, sorted by IP.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT ip, mac, first_seen, MAX(last_seen) FROM devices WHERE subnet = ? AND last_seen >= ? "
+                "GROUP BY ip", (str(subnet), since or 0)).fetchall()
+        return sorted((InventoryDevice(*row) for row in rows), key=lambda device: ipaddress.ip_address(device.ip))
+
+    def known_hosts(self, subnet) -> [str]:
+        """
+        Gets the IPs of every device ever seen in a subnet.
+        :param subnet: the subnet.
+        :return list: the IPs.
+        """
+        return [device.ip for device in self.devices(subnet)]
+
+    def full_sweep_due(self, subnet, interval: float = FULL_SWEEP_INTERVAL) -> bool:
+        """
+        Checks whether the whole range of a subnet should be swept again.
+        :param subnet: the subnet.
+        :param interval: seconds between two sweeps of the subnet.
+        :return bool: True if the subnet was never swept, or was last swept more than interval seconds ago.
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT last_sweep FROM subnets WHERE subnet = ?",
+                                           (str(subnet),)).fetchone()
+        return row is None or row[0] is None or time.time() - row[0] >= interval
+
+    def plan(self, network, force_full_sweep: bool = False) -> ([str], bool):
+        """
+        Plans the incremental rescan of a subnet, as run by rescan().
+        :param network: the subnet to rescan.
+        :param force_full_sweep: sweep the whole range even if the last sweep is recent.
+        :return tuple: (known hosts, whether the whole range is swept).
+        """
+        known = self.known_hosts(network)
+        return known, not known or force_full_sweep or self.full_sweep_due(network)
+
+    def refresh(self, network, iface: Optional[str] = None, timeout: float = arp_scan.DEFAULT_TIMEOUT,
+                engine: str = arp_scan.DEFAULT_ENGINE, force_full_sweep: bool = False) -> [(str, str)]:
+        """
+        Incrementally rescans a subnet and records the results.
+        Known hosts are probed first (with arp_scan.PROBE_TIMEOUT); the rest of the range is only swept if a
+        full sweep is due (or forced). Usable as the scan_function of arp_scan.scan_concurrently.
+        :param network: the subnet to rescan.
+        :param iface: interface to send the requests on.
+        :param timeout: reply timeout (in seconds) of the full sweep.
+        :param engine: one of arp_scan.ENGINES.
+        :param force_full_sweep: sweep the whole range even if the last sweep is recent.
+        :return list: (ip, mac) tuples of every device that answered.
+        """
+        known, full_sweep = self.plan(network, force_full_sweep)
+        devices = rescan(network, known, full_sweep, iface=iface, timeout=timeout, engine=engine)
+        self.record(network, devices, full_sweep=full_sweep)
+        return devices
+
+
+def rescan(network, known: [str], full_sweep: bool, iface: Optional[str] = None,
+           timeout: float = arp_scan.DEFAULT_TIMEOUT, engine: str = arp_scan.DEFAULT_ENGINE) -> [(str, str)]:
+    """
+    Rescans a subnet as planned by Inventory.plan(), without touching the inventory (so it can run in another
+    process, see scan_workers.py).
+    :param network: the subnet to rescan.
+    :param known: the known hosts of the subnet. If empty, the whole range is discovered.
+    :param full_sweep: whether the rest of the range is swept after probing the known hosts.
+    :param iface: interface to send the requests on.
+    :param timeout: reply timeout (in seconds) of the full sweep.
+    :param engine: one of arp_scan.ENGINES.
+    :return list: (ip, mac) tuples of every device that answered.
+    """
+    if not known:
+        return arp_scan.discover(network, iface=iface, timeout=timeout, engine=engine)
+
+    devices = arp_scan.probe(known, iface=iface, engine=engine, subnet=network)
+    if full_sweep:
+        known = set(known)
+        rest = (host for host in ipaddress.ip_network(str(network), strict=False).hosts()
+                if str(host) not in known)
+        devices += arp_scan.probe(rest, iface=iface, timeout=timeout, engine=engine, subnet=network, kind="sweep")
+    return devices
@@ -0,0 +1,301 @@
+"""
+This program was written by Yonatan Deri.
+It follows the PEP8 guidelines.
+
+Description:
+    This file serves as a module in the network_visualizer project.
+    It computes the positions of the devices drawn on the subnet overview canvas. Every layout is a function
+    registered in LAYOUTS, taking the number of nodes and returning an (n, 2) array of canvas coordinates:
+     - grid: square-ish grid.
+     - radial: a center node (the gateway) surrounded by concentric rings.
+     - force: force-directed (Fruchterman-Reingold), vectorised with NumPy. Repulsion is only computed between
+       nodes in neighbouring grid buckets, so it stays interactive with thousands of nodes.
+
+License:
+    This program is under the GNU GPLv3 License.
+"""
+
+import math
+import threading
+from typing import Callable, Optional
+
+import numpy as np
+
+NODE_SPACING = 200  # Distance between two neighbouring nodes, in pixels
+MARGIN = 100  # Distance between the canvas origin and the nearest node, in pixels
+
+FORCE_ITERATIONS = 60
+FORCE_SEED = 0
+
+# Neighbouring buckets visited for repulsion. Only half of the neighbourhood, so every pair is visited once.
+_NEIGHBOUR_OFFSETS = ((0, 0), (1, 0), (-1, 1), (0, 1), (1, 1))
+
+
+def grid_layout(count: int, center: Optional[int] = None, edges: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Arranges nodes in a square-ish grid, row after row.
+    :param count: the number of nodes.
+    :param center: unused, accepted for a uniform layout signature.
+    :param edges: unused, accepted for a uniform layout signature.
+    :return np.ndarray: (count, 2) array of positions.
+    """
+    columns = max(1, math.ceil(math.sqrt(count)))
+    indices = np.arange(count)
+    positions = np.column_stack((indices % columns, indices // columns)).astype(float) * NODE_SPACING
+    return positions + MARGIN
+
+
+def radial_layout(count: int, center: Optional[int] = None, edges: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Places the center node in the middle and the other nodes on concentric rings around it, NODE_SPACING apart.
+    :param count: the number of nodes.
+    :param center: index of the center node (e.g. the gateway). Defaults to the first node.
+    :param edges: unused, accepted for a uniform layout signature.
+    :return np.ndarray: (count, 2) array of positions.
+    """
+    positions = np.zeros((count, 2))
+    if count <= 1:
+        return positions + MARGIN
+    center = 0 if center is None else center
+    others = np.delete(np.arange(count), center)
+
+    # Ring r has a radius of r * NODE_SPACING, so it fits floor(2 * pi * r) nodes
+    capacities = []
+    while sum(capacities) < len(others):
+        capacities.append(int(2 * math.pi * (len(capacities) + 1)))
+    ring_starts = np.cumsum([0] + capacities[:-1])
+    ring_of = np.searchsorted(np.cumsum(capacities), np.arange(len(others)), side="right")
+    slot = np.arange(len(others)) - ring_starts[ring_of]
+    nodes_in_ring = np.minimum(np.array(capacities), len(others) - ring_starts)[ring_of]
+
+    angle = 2 * math.pi * slot / nodes_in_ring
+    radius = (ring_of + 1) * NODE_SPACING
+    positions[others] = np.column_stack((radius * np.cos(angle), radius * np.sin(angle)))
+    return positions - positions.min(axis=0) + MARGIN
+
+
+def force_directed_layout(count: int, center: Optional[int] = None, edges: Optional[np.ndarray] = None,
+                          iterations: int = FORCE_ITERATIONS, seed: int = FORCE_SEED) -> np.ndarray:
+    """
+    Fruchterman-Reingold force-directed layout. Edges attract their nodes, all nodes repel each other (within
+    twice the ideal distance, using grid buckets), and a weak gravity keeps disconnected nodes together.
+    :param count: the number of nodes.
+    :param center: index of a node pinned in the middle (e.g. the gateway), if any.
+    :param edges: (m, 2) array of node index pairs. Defaults to a star around the center node, if given.
+    :param iterations: number of simulation steps.
+    :param seed: seed of the random initial positions, so the layout is reproducible.
+    :return np.ndarray: (count, 2) array of positions.
+    """
+    if count <= 1:
+        return np.full((count, 2), float(MARGIN))
+    if edges is None:
+        edges = np.empty((0, 2), dtype=np.int64)
+        if center is not None:
+            others = np.delete(np.arange(count), center)
+            edges = np.column_stack((np.full(len(others), center), others))
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    # Edges of hubs (e.g. the gateway of a star) pull less, or the hub would collapse the whole graph onto itself
+    degree = np.bincount(edges.ravel(), minlength=count)
+    edge_weight = 1 / np.maximum(degree[edges[:, 0]], degree[edges[:, 1]]) if len(edges) else np.empty(0)
+
+    k = float(NODE_SPACING)  # Ideal distance between two nodes
+    side = k * math.sqrt(count)
+    positions = np.random.default_rng(seed).uniform(-side / 2, side / 2, (count, 2))
+    if center is not None:
+        positions[center] = 0
+    temperature = side / 10
+
+    for step in range(iterations):
+        displacement = np.zeros((count, 2))
+
+        # Repulsion between nearby nodes
+        i, j = _neighbour_pairs(positions, 2 * k)
+        delta = positions[i] - positions[j]
+        distance = np.maximum(np.hypot(delta[:, 0], delta[:, 1]), 0.01)
+        force = np.where(distance < 2 * k, k * k / distance, 0) / distance
+        for axis in range(2):
+            push = delta[:, axis] * force
+            displacement[:, axis] += np.bincount(i, push, count) - np.bincount(j, push, count)
+
+        # Attraction along the edges
+        if len(edges):
+            i, j = edges[:, 0], edges[:, 1]
+            delta = positions[i] - positions[j]
+            distance = np.maximum(np.hypot(delta[:, 0], delta[:, 1]), 0.01)
+            force = distance / k * edge_weight
+            for axis in range(2):
+                pull = delta[:, axis] * force
+                displacement[:, axis] -= np.bincount(i, pull, count) - np.bincount(j, pull, count)
+
+        # Gravity towards the middle
+        displacement -= positions * (k / side)
+
+        length = np.maximum(np.hypot(displacement[:, 0], displacement[:, 1]), 0.01)
+        positions += displacement / length[:, None] * np.minimum(length, temperature)[:, None]
+        if center is not None:
+            positions[center] = 0
+        temperature *= 1 - (step + 1) / (iterations + 1)
+
+    return positions - positions.min(axis=0) + MARGIN
+
+
+def _neighbour_pairs(positions: np.ndarray, cell_size: float) -> (np.ndarray, np.ndarray):
+    """
+    Finds every pair of nodes lying in the same or in adjacent grid buckets, without comparing all pairs.
+    :param positions: (n, 2) array of positions.
+    :param cell_size: the side of a bucket.
+    :return tuple: two arrays (i, j) of node indices, every unordered pair appearing once.
+    """
+    count = len(positions)
+    cells = np.floor(positions / cell_size).astype(np.int64)
+    cells -= cells.min(axis=0) - 1  # Keep an empty column/row of buckets around, so neighbours never wrap
+    width = int(cells[:, 0].max()) + 2
+    keys = cells[:, 1] * width + cells[:, 0]
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+
+    pairs_i, pairs_j = [], []
+    for dx, dy in _NEIGHBOUR_OFFSETS:
+        neighbour_keys = keys + dy * width + dx
+        start = np.searchsorted(sorted_keys, neighbour_keys, side="left")
+        counts = np.searchsorted(sorted_keys, neighbour_keys, side="right") - start
+        i = np.repeat(np.arange(count), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        j = order[np.repeat(start, counts) + offsets]
+        if (dx, dy) == (0, 0):
+            keep = i < j
+            i, j = i[keep], j[keep]
+        pairs_i.append(i)
+        pairs_j.append(j)
+    return np.concatenate(pairs_i), np.concatenate(pairs_j)
+
+
+def free_positions(occupied: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+    """
+    Places new nodes among nodes already placed, without moving them. The plane is divided in NODE_SPACING
+    squares: a new node keeps its candidate position if no node lies in its square, otherwise it takes the
+    center of the nearest free square (of non-negative coordinates, so it stays on the canvas).
+    :param occupied: (k, 2) array of the positions of the nodes already placed.
+    :param candidates: (m, 2) array of the positions the new nodes would have in a fresh layout.
+    :return np.ndarray: (m, 2) array of positions.
+    """
+    taken = set(map(tuple, np.floor(occupied / NODE_SPACING).astype(np.int64).tolist()))
+    positions = np.array(candidates, dtype=float).reshape(-1, 2)
+    for n, (x, y) in enumerate(positions.tolist()):
+        cell = (math.floor(x / NODE_SPACING), math.floor(y / NODE_SPACING))
+        if cell in taken or min(cell) < 0:
+            column, row = max(cell[0], 0), max(cell[1], 0)
+            radius = 0
+            while cell in taken or min(cell) < 0:
+                radius += 1
+                ring = [(column + dx, row + dy) for dx in range(-radius, radius + 1) for dy in (-radius, radius)]
+                ring += [(column + dx, row + dy) for dx in (-radius, radius) for dy in range(1 - radius, radius)]
+                free = [square for square in ring if square not in taken and min(square) >= 0]
+                if free:
+                    cell = min(free, key=lambda square: math.hypot((square[0] + 0.5) * NODE_SPACING - x,
+                                                                   (square[1] + 0.5) * NODE_SPACING - y))
+            positions[n] = (np.array(cell) + 0.5) * NODE_SPACING
+        taken.add(cell)
+    return positions
+
+
+LAYOUTS = {
+    "grid": grid_layout,
+    "radial": radial_layout,
+    "force": force_directed_layout,
+}  # type: dict[str, Callable[..., np.ndarray]]
+
+DEFAULT_LAYOUT = "grid"
+
+
+class LayoutCache:
+    """
+    Caches the computed layout of every subnet, so re-opening a subnet overview does not recompute it.
+    A cached layout is reused as long as the subnet has the same devices (in the same order).
+    """
+
+    def __init__(self):
+        self._layouts = {}
+        self._lock = threading.Lock()
+
+    def positions(self, subnet, layout: str, ips: [str], center: Optional[int] = None,
+                  edges: Optional[np.ndarray] = None) -> {str: (float, float)}:
+        """
+        Gets the positions of the devices of a subnet, computing them only if they are not cached.
+        :param subnet: the subnet.
+        :param layout: name of the layout, one of LAYOUTS.
+        :param ips: the IP addresses of the devices, in node order.
+        :param center: index of the center node (e.g. the gateway), if any.
+        :param edges: (m, 2) array of node index pairs, if any.
+        :return dict: IP address -> (x, y) canvas position.
+        """
+        key = (str(subnet), layout)
+        ips = tuple(ips)
+        with self._lock:
+            cached = self._layouts.get(key)
+        if cached is not None and cached[0] == ips:
+            return cached[1]
+
+        coordinates = LAYOUTS[layout](len(ips), center=center, edges=edges)
+        positions = {ip: (float(x), float(y)) for ip, (x, y) in zip(ips, coordinates)}
+        with self._lock:
+            self._layouts[key] = (ips, positions)
+        return positions
+
+    def update(self, subnet, layout: str, ips: [str], center: Optional[int] = None,
+               edges: Optional[np.ndarray] = None) -> {str: (float, float)}:
+        """
+        Gets the positions of the devices of a subnet after some devices joined or left, keeping the cached
+        positions of the devices that did not change (see free_positions()), so the overview does not move.
+        :param subnet: the subnet.
+        :param layout: name of the layout, one of LAYOUTS.
+        :param ips: the IP addresses of the devices, in node order.
+        :param center: index of the center node (e.g. the gateway), if any.
+        :param edges: (m, 2) array of node index pairs, if any.
+        :return dict: IP address -> (x, y) canvas position.
+        """
+        key = (str(subnet), layout)
+        ips = tuple(ips)
+        with self._lock:
+            cached = self._layouts.get(key)
+        if cached is None:
+            return self.positions(subnet, layout, ips, center, edges)
+        if cached[0] == ips:
+            return cached[1]
+
+        positions = {ip: cached[1][ip] for ip in ips if ip in cached[1]}
+        new = [i for i, ip in enumerate(ips) if ip not in positions]
+        if new:
+            occupied = np.array(list(positions.values()), dtype=float).reshape(-1, 2)
+            candidates = LAYOUTS[layout](len(ips), center=center, edges=edges)[new]
+            for i, (x, y) in zip(new, free_positions(occupied, candidates).tolist()):
+                positions[ips[i]] = (x, y)
+        positions = {ip: positions[ip] for ip in ips}
+        with self._lock:
+            self._layouts[key] = (ips, positions)
+        return positions
+
+    def put(self, subnet, layout: str, ips: [str], positions: {str: (float, float)}) -> None:
+        """
+        Caches positions computed elsewhere (e.g. loaded from a snapshot, see snapshot.py).
+        :param subnet: the subnet.
+        :param layout: name of the layout.
+        :param ips: the IP addresses of the devices, in node order.
+        :param positions: IP address -> (x, y) canvas position.
+        :return None:
+        """
+        with self._lock:
+            self._layouts[(str(subnet), layout)] = (tuple(ips), positions)
+
+    def invalidate(self, subnet=None) -> None:
+        """
+        Drops the cached layouts of a subnet, or of every subnet.
+        :param subnet: the subnet, or None for all of them.
+        :return None:
+        """
+        with self._lock:
+            if subnet is None:
+                self._layouts.clear()
+            else:
+                for key in [key for key in self._layouts if key[0] == str(subnet)]:
+                    del self._layouts[key]
@@ -12,34 +12,74 @@ License:
 
 # GUI related Imports
 import customtkinter
+from tkinter import filedialog, messagebox
 
 # Threading related Imports
+import queue
 import threading
 
 # Miscellaneous Imports
 import time
-import math
+import functools
+import ipaddress
 from PIL import Image, ImageTk
 import os
+from typing import TYPE_CHECKING
 
-# Imports of Self-Made files
-import arp_scan
+# Imports of Self-Made files (the scanning, monitoring and snapshot ones are imported on first use, keeping the
+# startup down to what the first frame needs)
+import canvas_renderer
+import device_table
+import layouts
+import scan_log
+import topology
+
+if TYPE_CHECKING:
+    import snapshot
 
 APP_TITLE = "Network Visualizer - written by Yonatan Deri."
 
 ABOUT_FILE = "special_credits"
 
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "gui_images")
+
 WIDTH_RATIO = 4.2424242424242424242424242424242
 HEIGHT_RATIO = 1.0668151447661469933184855233853
 
 WIDTH = 700
 HEIGHT = 479
 
-devices = {}
+DEVICE_EVENTS_INTERVAL = 200  # Milliseconds between two drains of the rescan and passive monitor events
+DEVICE_EVENTS_BATCH_SIZE = 500  # Maximum number of device events handled per drain, keeping the GUI responsive
+
+# File types of the Export Snapshot dialog: snapshots (see snapshot.py) and renders (see offline_renderer.py)
+EXPORT_FILE_TYPES = [("Snapshot (binary)", "*.npz"), ("Snapshot (JSON)", "*.json"), ("SVG image", "*.svg"),
+                     ("PNG image", "*.png")]
+SNAPSHOT_FILE_TYPES = [("Snapshot", "*.npz *.json"), ("All files", "*")]
+
+# From this number of active subnets (e.g. VLANs) on, they are scanned in worker processes instead of threads
+WORKER_PROCESSES_MIN_SUBNETS = 4
+
+devices = device_table.DeviceTable()
+device_info = {}  # (subnet, IP address) -> enrichment.DeviceInfo, filled in the background after discovery
+
+
+@functools.lru_cache(maxsize=None)
+def load_image(name: str) -> Image.Image:
+    """
+    Opens an image from the gui_images directory. Every image is read from disk once, then served from the cache.
+    :param name: the file name of the image.
+    :return Image.Image:
+    """
+    return Image.open(os.path.join(IMAGES_DIR, name))
 
 
 class App(customtkinter.CTk):
-    def __init__(self):
+    def __init__(self, services: bool = True):
+        """
+        :param services: whether the background services (scans, enrichment, rescans, metrics server) are
+                         started. Disabled to measure the startup of the window alone.
+        """
         super().__init__()
 
         self.title(APP_TITLE)
@@ -52,16 +92,8 @@ class App(customtkinter.CTk):
 
         self.resizable(True, True)
 
-        # Images
-        image_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "gui_images")
-        self.iconbitmap(os.path.join(image_path, "lan.ico"))
-        self.host_image = ImageTk.PhotoImage(Image.open(os.path.join(image_path, "host.png")), size=(10, 10))
-        self.about_image = customtkinter.CTkImage(light_image=Image.open(os.path.join(image_path, "info_dark.png")),
-                                                  dark_image=Image.open(os.path.join(image_path, "info_light.png")),
-                                                  size=(20, 20))
-        self.home_image = customtkinter.CTkImage(light_image=Image.open(os.path.join(image_path, "home_dark.png")),
-                                                 dark_image=Image.open(os.path.join(image_path, "home_light.png")),
-                                                 size=(20, 20))
+        # Images (loaded on first use, see the image properties below)
+        self.iconbitmap(os.path.join(IMAGES_DIR, "lan.ico"))
 
         # Create Home frame
         self.home_frame = customtkinter.CTkFrame(self, corner_radius=0, fg_color="transparent")
@@ -81,11 +113,24 @@ class App(customtkinter.CTk):
         self.home_button = customtkinter.CTkButton(self.navigation_frame, corner_radius=0, height=40, border_spacing=10,
                                                    text="Home",
                                                    fg_color="transparent", text_color=("gray10", "gray90"),
-                                                   hover_color=("gray70", "gray30"), image=self.home_image,
-                                                   anchor="w",
+                                                   hover_color=("gray70", "gray30"), anchor="w",
                                                    command=self.home_button_event)
         self.home_button.grid(row=1, column=0, sticky="ew")
 
+        # Create the Export and Import Snapshot buttons, saving the shown subnet overview and reopening a saved one
+        self.export_button = customtkinter.CTkButton(self.navigation_frame, corner_radius=0, height=40,
+                                                     border_spacing=10, text="Export Snapshot",
+                                                     fg_color="transparent", text_color=("gray10", "gray90"),
+                                                     hover_color=("gray70", "gray30"), anchor="w",
+                                                     command=self.export_snapshot_event)
+        self.export_button.grid(row=2, column=0, sticky="ew")
+        self.import_button = customtkinter.CTkButton(self.navigation_frame, corner_radius=0, height=40,
+                                                     border_spacing=10, text="Import Snapshot",
+                                                     fg_color="transparent", text_color=("gray10", "gray90"),
+                                                     hover_color=("gray70", "gray30"), anchor="w",
+                                                     command=self.import_snapshot_event)
+        self.import_button.grid(row=3, column=0, sticky="ew")
+
         # Create commands Frame
         self.commands_frame = customtkinter.CTkFrame(self.home_frame, corner_radius=0, fg_color="transparent",
                                                      border_width=2, border_color="black")
@@ -100,7 +145,17 @@ class App(customtkinter.CTk):
                                                               fg_color="green", text_color=("gray10", "gray90"),
                                                               hover_color=("gray70", "gray30"),
                                                               command=self.list_subnets_thread)
-        self.display_network_button.pack(pady=20)
+        self.display_network_button.pack(side=customtkinter.LEFT, expand=True, pady=20)
+
+        # Create Monitor button, toggling the passive discovery mode
+        self.monitor = None
+        self.monitor_button = customtkinter.CTkButton(self.commands_frame,
+                                                      border_spacing=10,
+                                                      text="Start Monitoring",
+                                                      fg_color="#44475a", text_color=("gray10", "gray90"),
+                                                      hover_color=("gray70", "gray30"),
+                                                      command=self.toggle_monitor)
+        self.monitor_button.pack(side=customtkinter.LEFT, expand=True, pady=20)
 
         self.canvas = customtkinter.CTkCanvas(self.home_frame, bg="#242424", highlightthickness=0)
 
@@ -110,27 +165,38 @@ class App(customtkinter.CTk):
         canvas_scrollbar_x.pack(side='bottom', fill='x')
         canvas_scrollbar_y = customtkinter.CTkScrollbar(self.canvas, command=self.canvas.yview)
         canvas_scrollbar_y.pack(side="right", fill='y')
-        self.canvas.configure(xscrollcommand=canvas_scrollbar_x.set)
-        self.canvas.configure(yscrollcommand=canvas_scrollbar_y.set)
+
+        # Draws only the visible part of the subnet overview, redrawing it on scroll, drag (pan) and wheel (zoom)
+        self.canvas_renderer = canvas_renderer.CanvasRenderer(self.canvas, lambda: self.host_image)
+        self.canvas_renderer.attach_scrollbars(canvas_scrollbar_x, canvas_scrollbar_y)
 
         # Create About button
         self.about_button = customtkinter.CTkButton(self.navigation_frame, corner_radius=0, height=40,
                                                     border_spacing=10, text="About",
                                                     fg_color="transparent", text_color=("gray10", "gray90"),
-                                                    hover_color=("gray70", "gray30"), image=self.about_image,
-                                                    anchor="w", command=self.about_button_event)
+                                                    hover_color=("gray70", "gray30"), anchor="w",
+                                                    command=self.about_button_event)
         self.about_button.grid(row=7, column=0, sticky="ew")
 
         # Create the subnets panel
+        self.subnet_buttons = {}
         self.subnets_frame = customtkinter.CTkScrollableFrame(self.home_frame, corner_radius=0)
         self.subnets_frame.pack(side=customtkinter.TOP, fill="both", expand=True)
 
         # Create verbose text box for scanning details
-        self.scanning_details = customtkinter.CTkTextbox(self.home_frame,
-                                                         fg_color="transparent", border_width=2,
-                                                         border_color="black")
+        self.scanning_details = scan_log.ScanLog(self.home_frame,
+                                                 fg_color="transparent", border_width=2,
+                                                 border_color="black")
         self.scanning_details.pack(side=customtkinter.BOTTOM, fill="both", expand=True)
-        self.scanning_details.configure(state="disabled")
+
+        # Create layout menu
+        self.layout_name = layouts.DEFAULT_LAYOUT
+        self.layout_cache = layouts.LayoutCache()
+        self.current_subnet = None
+        self.overview_context = None  # Gateways, ARP table and local address read when the overview was opened
+        self.layout_menu = customtkinter.CTkOptionMenu(self.navigation_frame, values=list(layouts.LAYOUTS),
+                                                       command=self.change_layout_event)
+        self.layout_menu.grid(row=9, column=0, padx=20, pady=(0, 20), sticky="s")
 
         # Create appearance mode menu
         self.appearance_mode_menu = customtkinter.CTkOptionMenu(self.navigation_frame,
@@ -144,8 +210,108 @@ class App(customtkinter.CTk):
         self.about_label = customtkinter.CTkLabel(self.about_frame, text=about_file_text, justify="left")
         self.about_label.grid(row=0, column=0)
 
-        # Start the GUI in the Home frame
+        # Start the GUI in the Home frame, adding the navigation icons once it is drawn
         self.select_frame_by_name("home")
+        self.after_idle(self.show_navigation_icons)
+
+        # Background services: inventory, scans, enrichment, rescans and metrics (see start_services)
+        self.inventory = self.enricher = self.scheduler = self.scan_workers = self.metrics_server = None
+        self.refresh_subnet = None
+        if services:
+            self.start_services()
+
+    def start_services(self) -> None:
+        """
+        Starts the background services of the application: the inventory, the scan workers (for many subnets),
+        the enrichment, the periodic rescans and the metrics server, then lists the subnets and scans them.
+        :return None:
+        """
+        import arp_scan
+        import enrichment
+        import inventory
+        import metrics
+        import scan_scheduler
+        import scan_workers
+
+        self.inventory = inventory.Inventory()
+
+        # Scan many subnets in worker processes (not bound by the GIL of this one), merging into the inventory
+        self.refresh_subnet = self.inventory.refresh
+        if len(arp_scan.get_active_interfaces()) >= WORKER_PROCESSES_MIN_SUBNETS:
+            self.scan_workers = scan_workers.ScanWorkerPool(inventory_store=self.inventory)
+            self.refresh_subnet = self.scan_workers.refresh
+
+        # Enrich the discovered devices (vendor, host name) in the background, without delaying discovery
+        self.enricher = enrichment.Enricher()
+        self.enricher.start()
+
+        # Rescan every listed subnet periodically, applying only the differences (see process_device_events)
+        self.scheduler = scan_scheduler.RescanScheduler(self.refresh_subnet)
+        self.scheduler.start()
+        self.after(DEVICE_EVENTS_INTERVAL, self.process_device_events)
+
+        # Export the scan and GUI metrics on http://127.0.0.1:9464/metrics (and /metrics.json)
+        self.register_queue_metrics()
+        try:
+            self.metrics_server = metrics.serve(metrics.DEFAULT_PORT)
+        except OSError as error:
+            self.metrics_server = None
+            print(f"Could not serve the metrics on port {metrics.DEFAULT_PORT}: {error}")
+
+        # Show the devices of the last runs right away, while refreshing them in the background
+        self.show_cached_subnets()
+        self.list_subnets_thread()
+
+    def register_queue_metrics(self) -> None:
+        """
+        Exports the depth of the queues consumed by the GUI, and the items dropped from the bounded ones.
+        :return None:
+        """
+        import metrics
+
+        metrics.QUEUE_DEPTH.set_function(self.scanning_details.queue_depth, queue="scan_log")
+        metrics.QUEUE_DEPTH.set_function(self.scheduler.events.qsize, queue="rescan_events")
+        metrics.QUEUE_DEPTH.set_function(self.enricher.results.qsize, queue="enrichment_results")
+        metrics.QUEUE_DEPTH.set_function(lambda: self.monitor.events.qsize() if self.monitor else 0,
+                                         queue="monitor_events")
+        metrics.DROPPED_ITEMS.set_function(lambda: self.scheduler.dropped_events, queue="rescan_events")
+        metrics.DROPPED_ITEMS.set_function(lambda: self.enricher.dropped_results, queue="enrichment_results")
+        metrics.DROPPED_ITEMS.set_function(lambda: self.monitor.dropped_events if self.monitor else 0,
+                                           queue="monitor_events")
+
+    def show_navigation_icons(self) -> None:
+        """
+        Sets the icons of the Home and About buttons, loading them after the first frame instead of before it.
+        :return None:
+        """
+        self.home_button.configure(image=self.home_image)
+        self.about_button.configure(image=self.about_image)
+
+    @functools.cached_property
+    def host_image(self) -> ImageTk.PhotoImage:
+        """
+        The image of a device on the subnet overview canvas, loaded the first time a subnet is displayed.
+        :return ImageTk.PhotoImage:
+        """
+        return ImageTk.PhotoImage(load_image("host.png"), size=(10, 10))
+
+    @functools.cached_property
+    def about_image(self) -> customtkinter.CTkImage:
+        """
+        The icon of the About button.
+        :return customtkinter.CTkImage:
+        """
+        return customtkinter.CTkImage(light_image=load_image("info_dark.png"), dark_image=load_image("info_light.png"),
+                                      size=(20, 20))
+
+    @functools.cached_property
+    def home_image(self) -> customtkinter.CTkImage:
+        """
+        The icon of the Home button.
+        :return customtkinter.CTkImage:
+        """
+        return customtkinter.CTkImage(light_image=load_image("home_dark.png"), dark_image=load_image("home_light.png"),
+                                      size=(20, 20))
 
     @staticmethod
     def about_text_pull() -> str:
@@ -169,13 +335,6 @@ class App(customtkinter.CTk):
         """
         self.select_frame_by_name("about")
 
-    def update_scrollregion(self) -> None:
-        # Update the scrollregion based on all items on the canvas
-        bbox = self.canvas.bbox("all")
-        if bbox:
-            extended_bbox = (bbox[0], bbox[1], bbox[2] + 30, bbox[3] + 30)
-            self.canvas.configure(scrollregion=extended_bbox)
-
     def list_subnets_thread(self) -> None:
         """
         Starts the process of listing all subnets in the network as buttons, with their active device counter.
@@ -186,67 +345,198 @@ class App(customtkinter.CTk):
 
     def list_subnets(self) -> None:
         """
-        Lists all subnets in the network as buttons, with their active device counter.
+        Lists all subnets in the network as buttons, with their active device counter, and schedules their
+        periodic rescans. Buttons are updated in place; the ones of subnets no longer active are removed.
+        Runs in a worker thread: the buttons are updated on the Tk main loop (widgets are never touched here).
         :return None:
         """
+        import arp_scan
+
         global devices
         start_time = time.time()
-        self.delete_all_buttons(self.subnets_frame)
-        networks = arp_scan.get_active_networks()
-        displayed_text = ""
-        for network in networks:
-            devices[network] = []
-            device_counter = 0
-            displayed_text += f"Scanning network: {network}\n"
-            self.update_textbox(displayed_text)
-            clients = arp_scan.scan(network)
-            displayed_text += "[*] IP Address      MAC Address\n"
-            self.update_textbox(displayed_text)
-            for sent, received in clients:
-                device_counter += 1
-                ip = received.psrc  # Source IP
-                mac = received.hwsrc  # Source MAC
-                devices[network].append((ip, mac))
-                displayed_text += f"{ip}      {mac}\n"
-                self.update_textbox(displayed_text)
-            self.create_subnet_button(network, device_counter)
-        displayed_text += f"\n*****************************\nDone Scanning The Network!\nScanning Time: " \
-                          f"{round(time.time() - start_time, 2)} seconds\n*****************************\n"
-        self.update_textbox(displayed_text)
+        interfaces = arp_scan.get_active_interfaces()
+        interface_of = {network: interface for interface, network in interfaces}
+        subnets_time = 0
+        self.scanning_details.clear()
+        for interface, network in interfaces:
+            self.scanning_details.write(f"Scanning network: {network} ({interface})")
+        scan_results = arp_scan.scan_concurrently(interfaces, scan_function=self.refresh_subnet)
+        for network, discovered, elapsed, error in scan_results:
+            if error is not None:
+                # Rescanned periodically all the same, from the devices known so far
+                self.scheduler.schedule(interface_of[network], network, devices.devices(network))
+                self.scanning_details.write(f"\nNetwork: {network}\nCould not scan the network: {error}")
+                continue
+            self.scheduler.schedule(interface_of[network], network, discovered)
+            self.enricher.submit(network, discovered)
+            if self.monitor is not None:
+                self.monitor.seed(network, discovered)
+            devices.replace(network, discovered)
+            self.scanning_details.write(f"\nNetwork: {network}\n[*] IP Address      MAC Address")
+            for ip, mac in discovered:
+                self.scanning_details.write(f"{ip}      {mac}")
+            subnets_time += elapsed
+            self.scanning_details.write(f"Subnet Scanning Time: {round(elapsed, 2)} seconds")
+            self.after(0, self.update_subnet_button, network)
+            self.after(0, self.refresh_overview, network)
+        self.after(0, self.remove_inactive_subnet_buttons, set(interface_of))
+        self.scanning_details.write(f"\n*****************************\nDone Scanning The Network!\nScanning Time: "
+                                    f"{round(time.time() - start_time, 2)} seconds\n"
+                                    f"Sum Of Subnets Scanning Times: {round(subnets_time, 2)} seconds\n"
+                                    f"*****************************")
+
+    def show_cached_subnets(self) -> None:
+        """
+        Lists the subnets of the inventory as buttons, with the devices known in them, without scanning.
+        :return None:
+        """
+        global devices
+        for network in self.inventory.subnets():
+            known = self.inventory.devices(network)
+            devices.replace(network, [(device.ip, device.mac) for device in known],
+                            seen_at=[device.last_seen for device in known])
+            self.enricher.submit(network, devices.devices(network))
+            self.create_subnet_button(network, devices.count(network), cached=True)
+
+    def create_subnet_button(self, subnet: str, devices_count: int, cached: bool = False) -> None:
+        """
+        Create subnet button inside the list of subnet buttons.
+        :param subnet: for which the button will be created.
+        :param devices_count: indicating the number of devices within the given subnet, within the button details.
+        :param cached: whether the devices come from the inventory rather than from a scan of this run.
+        :return: None
+        """
+        button = customtkinter.CTkButton(self.subnets_frame, fg_color="#44475a",
+                                         text=f"Network: {subnet}, Devices: {devices_count}"
+                                              f"{' (cached)' if cached else ''}",
+                                         anchor="w", command=lambda: self.switch2subnet_overview(subnet))
+        button.pack(side=customtkinter.TOP, fill="both", expand=True)
+        self.subnet_buttons[subnet] = button
+
+    def update_subnet_button(self, subnet) -> None:
+        """
+        Updates the device counter of a subnet button in place, creating the button if the subnet is new.
+        :param subnet: the subnet whose button is updated.
+        :return None:
+        """
+        button = self.subnet_buttons.get(subnet)
+        if button is None:
+            self.create_subnet_button(subnet, devices.count(subnet))
+        else:
+            button.configure(text=f"Network: {subnet}, Devices: {devices.count(subnet)}")
 
-    @staticmethod
-    def delete_all_buttons(widget) -> None:
+    def remove_subnet_button(self, subnet) -> None:
         """
-        Deletes all buttons inside a given widget.
-        :param widget: given widget, from where the buttons will be deleted.
+        Removes the button of a subnet from the list of subnet buttons, and drops its cached layouts.
+        :param subnet: the subnet whose button is removed.
         :return None:
         """
-        for widget in widget.winfo_children():
-            widget.destroy()
+        button = self.subnet_buttons.pop(subnet, None)
+        if button is not None:
+            button.destroy()
+        self.layout_cache.invalidate(subnet)
 
-    def update_textbox(self, text: str) -> None:
+    def remove_inactive_subnet_buttons(self, active_subnets: set) -> None:
         """
-        Updates the textbox responsible for displaying scanning details, with the given text parameter.
-        :param text: updated text for the textbox for displaying scanning details.
+        Removes the buttons of the subnets that are no longer active.
+        :param active_subnets: the active subnets.
         :return None:
         """
-        self.scanning_details.configure(state="normal")
-        self.scanning_details.delete('0.0', 'end')
-        self.scanning_details.insert('0.0', text=text)
-        self.scanning_details.configure(state="disabled")
-        self.scanning_details.yview_moveto(1)
-        self.scanning_details.update_idletasks()  # Ensures the GUI updates immediately
+        for subnet in set(self.subnet_buttons) - active_subnets:
+            self.remove_subnet_button(subnet)
 
-    def create_subnet_button(self, subnet: str, devices_count: int) -> None:
+    def toggle_monitor(self) -> None:
         """
-        Create subnet button inside the list of subnet buttons.
-        :param subnet: for which the button will be created.
-        :param devices_count: indicating the number of devices within the given subnet, within the button details.
-        :return: None
+        Starts or stops the passive discovery mode, in which the devices are kept up to date from the ARP traffic
+        heard on the network instead of being swept.
+        :return None:
+        """
+        import arp_monitor
+
+        if self.monitor is not None:
+            self.monitor.stop()
+            self.monitor = None
+            self.monitor_button.configure(text="Start Monitoring")
+            self.scanning_details.write("\nPassive monitoring stopped.")
+            return
+
+        monitor = arp_monitor.ArpMonitor()
+        for network in devices.subnets():
+            monitor.seed(network, devices.devices(network))
+        try:
+            monitor.start()
+        except OSError as error:
+            self.scanning_details.write(f"\nCould not start passive monitoring: {error}")
+            return
+        self.monitor = monitor
+        self.monitor_button.configure(text="Stop Monitoring")
+        self.scanning_details.write("\nPassive monitoring started.")
+
+    def process_device_events(self) -> None:
+        """
+        Applies the pending events of the periodic rescans and of the passive monitor to the devices, on the Tk
+        main loop, updating the subnet buttons and the shown subnet overview in place.
+        :return None:
+        """
+        changed_subnets = self.apply_device_events(self.scheduler.events)
+        if self.monitor is not None:
+            changed_subnets |= self.apply_device_events(self.monitor.events, record=True)
+        enriched_devices = self.apply_device_info()
+
+        for subnet in changed_subnets:
+            self.update_subnet_button(subnet)
+        if self.canvas.winfo_ismapped():
+            if self.current_subnet in changed_subnets:
+                self.update_overview()
+            elif self.current_subnet in enriched_devices:
+                self.canvas_renderer.update_labels({info.ip: topology.device_label(info.ip, info.mac, info.label())
+                                                    for info in enriched_devices[self.current_subnet]})
+        self.after(DEVICE_EVENTS_INTERVAL, self.process_device_events)
+
+    def apply_device_events(self, events: queue.Queue, record: bool = False) -> set:
+        """
+        Applies pending join/leave/change events to the devices, logging each of them.
+        :param events: queue of arp_monitor.DeviceEvent.
+        :param record: whether joining and changed devices are recorded in the inventory.
+        :return set: the subnets that changed.
+        """
+        import arp_monitor
+
+        global devices
+        changed_subnets = set()
+        for _ in range(DEVICE_EVENTS_BATCH_SIZE):
+            try:
+                event = events.get_nowait()
+            except queue.Empty:
+                break
+            if event.kind == arp_monitor.LEAVE:
+                devices.remove(event.network, event.ip)
+            else:
+                devices.add(event.network, [(event.ip, event.mac)], seen_at=event.timestamp)
+                self.enricher.submit(event.network, [(event.ip, event.mac)])
+                if record:
+                    self.inventory.record(event.network, [(event.ip, event.mac)], seen_at=event.timestamp)
+            changed_subnets.add(event.network)
+            previous = f" (was {event.previous_mac}, possible ARP spoofing)" if event.previous_mac else ""
+            self.scanning_details.write(f"[{event.kind}] {event.network}: {event.ip}      {event.mac}{previous}")
+        return changed_subnets
+
+    def apply_device_info(self) -> dict:
         """
-        customtkinter.CTkButton(self.subnets_frame, fg_color="#44475a",
-                                text=f"Network: {subnet}, Devices: {devices_count}", anchor="w", command=lambda: self.
-                                switch2subnet_overview(subnet)).pack(side=customtkinter.TOP, fill="both", expand=True)
+        Stores the pending results of the enrichment, shown in the labels of the subnet overview.
+        :return dict: subnet -> list of the new enrichment.DeviceInfo of its devices.
+        """
+        global device_info
+        enriched_devices = {}
+        for _ in range(DEVICE_EVENTS_BATCH_SIZE):
+            try:
+                info = self.enricher.results.get_nowait()
+            except queue.Empty:
+                break
+            if device_info.get((info.network, info.ip)) != info:
+                device_info[(info.network, info.ip)] = info
+                enriched_devices.setdefault(info.network, []).append(info)
+        return enriched_devices
 
     def switch2subnet_overview(self, subnet: str) -> None:
         """
@@ -254,96 +544,154 @@ class App(customtkinter.CTk):
 
         This function clears the current canvas, hides home widgets, and
         then displays the devices associated with the provided subnet in a
-        graphical format. It also establishes bidirectional connections
-        between devices (graphically).
+        graphical format. Devices are connected to the gateway of the subnet
+        (or to its broadcast domain), and the current device to its neighbours.
 
         :param subnet: The identifier of the subnet to visualize.
         :return: None
         """
+        self.overview_context = None
+        subnet_topology = self.build_subnet_topology(subnet)
+        device_positions = self.layout_cache.positions(subnet, self.layout_name, subnet_topology.nodes,
+                                                       center=subnet_topology.hub,
+                                                       edges=subnet_topology.all_edges())
+        self.show_overview(subnet, subnet_topology, device_positions)
+
+    def build_subnet_topology(self, subnet) -> topology.Topology:
+        """
+        Builds the topology of the devices of a subnet. The gateways, ARP table and local address are read
+        once per opened overview (see overview_context), not on every update of its devices.
+        :param subnet: the subnet.
+        :return topology.Topology:
+        """
+        import arp_scan
+
         global devices
+        if self.overview_context is None:
+            self.overview_context = dict(gateways=arp_scan.get_gateways(), neighbors=topology.read_neighbor_table(),
+                                         local_ip=arp_scan.get_local_address(subnet))
+        subnet_devices = devices.devices(subnet)
+        return topology.build_topology(subnet, subnet_devices, **self.overview_context,
+                                       details={ip: device_info[(subnet, ip)].label() for ip, _ in subnet_devices
+                                                if (subnet, ip) in device_info})
+
+    def update_overview(self) -> None:
+        """
+        Applies the changes of the devices of the shown subnet to its overview in place: nodes are added and
+        removed, the other nodes keep their positions, and the zoom and scroll position are kept.
+        :return None:
+        """
+        subnet_topology = self.build_subnet_topology(self.current_subnet)
+        device_positions = self.layout_cache.update(self.current_subnet, self.layout_name, subnet_topology.nodes,
+                                                    center=subnet_topology.hub, edges=subnet_topology.all_edges())
+        self.canvas_renderer.update_topology(subnet_topology, device_positions)
+
+    def refresh_overview(self, subnet) -> None:
+        """
+        Applies the devices of a rescanned subnet to its overview in place (see update_overview), if it is shown.
+        :param subnet: the rescanned subnet.
+        :return None:
+        """
+        if subnet == self.current_subnet and self.canvas.winfo_ismapped():
+            self.update_overview()
+
+    def show_overview(self, subnet, subnet_topology: topology.Topology,
+                      device_positions: {str: (float, float)}) -> None:
+        """
+        Clears the current canvas, hides home widgets and draws the overview of a subnet.
+        :param subnet: the subnet.
+        :param subnet_topology: the topology of the subnet.
+        :param device_positions: node id -> (x, y) canvas position.
+        :return None:
+        """
         self.clear_canvas()
         self.home_widgets_forget()
         self.canvas.pack(side=customtkinter.TOP, fill="both", expand=True)
-        device_positions = {}
-        radius = 33  # Radius of the nodes
-        nodes_per_row = 3  # Number of nodes per row
-
-        self.arrange_devices_in_rows(subnet, nodes_per_row, device_positions)
-
-        for i in range(len(devices[subnet])):
-            for j in range(i + 1, len(devices[subnet])):
-                self.draw_bidirectional_connection(devices[subnet][i][0], devices[subnet][j][0],
-                                                   device_positions, radius)
-
-        self.arrange_devices_in_rows(subnet, nodes_per_row, device_positions)
+        self.current_subnet = subnet
+        self.canvas_renderer.set_topology(subnet_topology, device_positions)
 
-    def arrange_devices_in_rows(self, subnet: str, nodes_per_row: int, device_positions: dict) -> None:
+    def export_snapshot_event(self) -> None:
         """
-        Arranges the active devices within the specified subnet in rows.
-
-        This function positions each device based on the number of nodes
-        that should be displayed per row.
-
-        :param subnet: The identifier of the subnet containing devices.
-        :param nodes_per_row: The maximum number of devices to display in one row.
-        :param device_positions: A dictionary to store the positions of devices.
-        :return: None
+        Saves the subnet overview shown to a file chosen by the user: a snapshot (.npz or .json) that can be
+        imported again, or an image (.svg or .png) drawn by offline_renderer. Saved in the background, as
+        rendering a large subnet takes a few seconds.
+        :return None:
         """
-        for i, device in enumerate(devices[subnet]):
-            x = 100 + (i % nodes_per_row) * 200  # Position nodes horizontally
-            y = 100 + (i // nodes_per_row) * 200  # Position nodes vertically
-            device_positions[device[0]] = (x, y)  # Store center position
-            self.canvas.create_image(x, y, image=self.host_image)
-            self.canvas.create_text(x, y + 45, text=f"    {device[0]}\n    {device[1]}", fill="white",
-                                    font=("TimesNewRoman", 8))
+        import snapshot
 
-    def draw_bidirectional_connection(self, ip1: str, ip2: str, device_positions: dict, radius: float) -> None:
+        global devices
+        shown_topology = self.canvas_renderer.topology
+        if shown_topology is None or not self.canvas.winfo_ismapped():
+            messagebox.showinfo(APP_TITLE, "Open a subnet overview to export it.")
+            return
+        path = filedialog.asksaveasfilename(title="Export Snapshot", filetypes=EXPORT_FILE_TYPES,
+                                            defaultextension=".npz")
+        if not path:
+            return
+        subnet_snapshot = snapshot.take(self.current_subnet, self.layout_name, devices.devices(self.current_subnet),
+                                        shown_topology, dict(zip(shown_topology.nodes,
+                                                                 self.canvas_renderer.positions.tolist())))
+        threading.Thread(target=self.export_snapshot, args=(subnet_snapshot, path), daemon=True).start()
+
+    def export_snapshot(self, subnet_snapshot: "snapshot.Snapshot", path: str) -> None:
         """
-        Draws a bidirectional connection between two devices.
-
-        This function calculates the positions of the two devices and draws
-        a line to represent their connection.
-
-        :param ip1: The IP address of the first device.
-        :param ip2: The IP address of the second device.
-        :param device_positions: A dictionary containing the positions of devices.
-        :param radius: The radius used to offset the connection lines.
-        :return: None
+        Saves a snapshot, or renders it if the path ends with an image extension.
+        :param subnet_snapshot: the snapshot of the subnet overview.
+        :param path: the path of the file.
+        :return None:
         """
-        x1, y1 = device_positions[ip1]
-        x2, y2 = device_positions[ip2]
-
-        # Draw the connection lines
-        self.draw_line(x1, y1, x2, y2, radius)
+        import offline_renderer
+        import snapshot
 
-    def draw_line(self, x1: float, y1: float, x2: float, y2: float, radius: float) -> None:
+        try:
+            if os.path.splitext(path)[1].lower() in offline_renderer.RENDER_FORMATS:
+                offline_renderer.render(subnet_snapshot.topology, subnet_snapshot.positions, path)
+            else:
+                snapshot.save(subnet_snapshot, path)
+        except (OSError, ValueError) as error:
+            self.after(0, messagebox.showerror, APP_TITLE, f"Could not export the snapshot: {error}")
+
+    def import_snapshot_event(self) -> None:
         """
-        Draws a line between two points, offsetting by the specified radius.
-
-        The line is drawn from the edge of the first device to the edge of
-        the second device, with an arrow indicating direction.
-
-        :param x1: The x-coordinate of the first device.
-        :param y1: The y-coordinate of the first device.
-        :param x2: The x-coordinate of the second device.
-        :param y2: The y-coordinate of the second device.
-        :param radius: The radius of the devices, used to calculate line start/end points.
-        :return: None
+        Opens a snapshot chosen by the user: its devices are listed (as cached ones) and its overview is shown
+        with the saved layout, without scanning the subnet or computing the layout.
+        :return None:
         """
-        angle = math.atan2(y2 - y1, x2 - x1)
-        # Move to the edge of the first object
-        start_x = x1 + radius * math.cos(angle)
-        start_y = y1 + radius * math.sin(angle)
-
-        # Move to the edge of the second object
-        end_x = x2 - radius * math.cos(angle)
-        end_y = y2 - radius * math.sin(angle)
-
-        # Draw the first direction (A to B)
-        self.canvas.create_line(start_x, start_y, end_x, end_y, fill="#44475a", arrow="last")
+        import snapshot
 
-        # Draw the second direction (B to A)
-        self.canvas.create_line(end_x, end_y, start_x, start_y, fill="#44475a", arrow="last")
+        global devices
+        path = filedialog.askopenfilename(title="Import Snapshot", filetypes=SNAPSHOT_FILE_TYPES)
+        if not path:
+            return
+        try:
+            subnet_snapshot = snapshot.load(path)
+        except (OSError, ValueError, KeyError) as error:
+            messagebox.showerror(APP_TITLE, f"Could not import the snapshot: {error}")
+            return
+        subnet = ipaddress.ip_network(subnet_snapshot.subnet)
+        devices.replace(subnet, subnet_snapshot.devices, seen_at=subnet_snapshot.created)
+        if subnet not in self.subnet_buttons:
+            self.create_subnet_button(subnet, devices.count(subnet), cached=True)
+        else:
+            self.update_subnet_button(subnet)
+        positions = subnet_snapshot.positions_dict()
+        if subnet_snapshot.layout in layouts.LAYOUTS:
+            self.layout_name = subnet_snapshot.layout
+            self.layout_menu.set(subnet_snapshot.layout)
+        # Cached as the positions of the current layout, so later changes of the devices do not move the nodes
+        self.layout_cache.put(subnet, self.layout_name, subnet_snapshot.topology.nodes, positions)
+        self.overview_context = None
+        self.show_overview(subnet, subnet_snapshot.topology, positions)
+
+    def change_layout_event(self, new_layout: str) -> None:
+        """
+        This function is responsible for changing the layout of the subnet overview, redrawing it if it is shown.
+        :param new_layout: name of the layout, one of layouts.LAYOUTS.
+        :return None:
+        """
+        self.layout_name = new_layout
+        if self.current_subnet is not None and self.canvas.winfo_ismapped():
+            self.switch2subnet_overview(self.current_subnet)
 
     def select_frame_by_name(self, name: str) -> None:
         """
@@ -390,8 +738,7 @@ class App(customtkinter.CTk):
         self.scanning_details.configure(state="disabled")
 
     def clear_canvas(self) -> None:
-        self.canvas.delete("all")
-        self.update_scrollregion()
+        self.canvas_renderer.clear()
 
     @staticmethod
     def change_appearance_mode_event(new_appearance_mode: str) -> None:
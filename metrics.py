@@ -0,0 +1,439 @@
+"""
+This program was written by Yonatan Deri.
+It follows the PEP8 guidelines.
+
+Description:
+    This file serves as a module in the network_visualizer project.
+    It implements the metrics of the scans and of the GUI (counters, gauges and histograms, with labels) and
+    exports them in the Prometheus text format and as JSON, either served from a local HTTP thread
+    (/metrics and /metrics.json) or dumped to a file, so monitoring can alert on scan slowdowns or packet loss.
+
+License:
+    This program is under the GNU GPLv3 License.
+"""
+
+import bisect
+import contextlib
+import json
+import math
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+DEFAULT_PORT = 9464
+DEFAULT_HOST = "127.0.0.1"  # Only reachable from the current device
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+               for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """
+    Base of the metric types: a name, a help text and the values of every combination of labels.
+    """
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        """
+        :param name: the name of the metric.
+        :param documentation: what the metric measures.
+        :param labels: names of the labels of the metric.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}  # Label values tuple -> value
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} expects the labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def samples(self) -> [(str, dict, float)]:
+        """
+        Gets the current samples of the metric.
+        :return list: (sample name, labels, value) tuples.
+        """
+        with self._lock:
+            values = list(self._values.items())
+        return [(self.name, dict(zip(self.labels, key)), value) for key, value in values]
+
+    def clear(self) -> None:
+        """
+        Forgets the values of every combination of labels.
+        :return None:
+        """
+        with self._lock:
+            self._values.clear()
+
+    def values(self) -> dict:
+        """
+        Gets the raw values of the metric, e.g. to send them to another process (see Registry.merge()).
+        :return dict: label values tuple -> value. Values read from a function are left out.
+        """
+        with self._lock:
+            return {key: value for key, value in self._values.items() if not callable(value)}
+
+    def merge(self, values: dict) -> None:
+        """
+        Merges raw values (see values()) of the same metric, e.g. recorded in another process.
+        Replaces the current values by default; counters and histograms add them instead.
+        :param values: label values tuple -> value.
+        :return None:
+        """
+        with self._lock:
+            self._values.update(values)
+
+
+class Counter(Metric):
+    """
+    A value that only goes up (e.g. packets sent).
+    """
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """
+        Increments the counter.
+        :param amount: the (non negative) increment.
+        :param labels: the values of the labels.
+        :return None:
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def merge(self, values: dict) -> None:
+        with self._lock:
+            for key, amount in values.items():
+                self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """
+    A value that goes up and down (e.g. a queue depth), set directly or read from a function when collected.
+    """
+    type = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        """
+        Sets the gauge.
+        :param value: the value.
+        :param labels: the values of the labels.
+        :return None:
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function: Callable[[], float], **labels) -> None:
+        """
+        Makes the gauge read its value from a function whenever it is collected.
+        :param function: returns the current value.
+        :param labels: the values of the labels.
+        :return None:
+        """
+        self.set(function, **labels)
+
+    def samples(self) -> [(str, dict, float)]:
+        return [(name, labels, value() if callable(value) else value)
+                for name, labels, value in super().samples()]
+
+
+class Histogram(Metric):
+    """
+    Counts of observations (e.g. durations) in cumulative buckets, with their sum and count.
+    """
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        """
+        :param buckets: upper bounds of the buckets (a +Inf bucket is added).
+        """
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels) -> None:
+        """
+        Records an observation.
+        :param value: the observed value.
+        :param labels: the values of the labels.
+        :return None:
+        """
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            counts = counts.copy()  # Samples being collected keep a consistent copy
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def merge(self, values: dict) -> None:
+        with self._lock:
+            for key, (counts, total) in values.items():
+                current_counts, current_total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+                self._values[key] = ([a + b for a, b in zip(current_counts, counts)], current_total + total)
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """
+        Observes the duration (in seconds) of a block of code: `with histogram.time(): ...`.
+        :param labels: the values of the labels.
+        """
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start_time, **labels)
+
+    def samples(self) -> [(str, dict, float)]:
+        samples = []
+        for _, labels, (counts, total) in super().samples():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+
+class Registry:
+    """
+    The set of metrics exported together.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        """
+        Adds a metric to the registry.
+        :param metric: the metric.
+        :return Metric: the metric.
+        """
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Duplicate metric: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def metrics(self) -> [Metric]:
+        """
+        Gets the registered metrics.
+        :return list:
+        """
+        with self._lock:
+            return list(self._metrics.values())
+
+    def values(self) -> {str: dict}:
+        """
+        Gets the raw values of every metric (see Metric.values()), e.g. to send them to another process.
+        :return dict: metric name -> (label values tuple -> value).
+        """
+        values = {metric.name: metric.values() for metric in self.metrics()}
+        return {name: metric_values for name, metric_values in values.items() if metric_values}
+
+    def merge(self, values: {str: dict}) -> None:
+        """
+        Merges the raw values of metrics recorded in another process (e.g. a scan worker, see scan_workers.py):
+        counters and histograms are added, gauges are set. Unknown metrics are ignored.
+        :param values: metric name -> (label values tuple -> value), as returned by values().
+        :return None:
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+        for name, metric_values in values.items():
+            if name in metrics:
+                metrics[name].merge(metric_values)
+
+    def clear(self) -> None:
+        """
+        Forgets the values of every metric.
+        :return None:
+        """
+        for metric in self.metrics():
+            metric.clear()
+
+    def to_prometheus(self) -> str:
+        """
+        Renders every metric in the Prometheus text exposition format.
+        :return str:
+        """
+        lines = []
+        for metric in self.metrics():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines += [f"{name}{_format_labels(labels)} {_format_value(value)}"
+                      for name, labels, value in metric.samples()]
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> dict:
+        """
+        Gets every metric as a JSON serialisable dictionary.
+        :return dict: metric name -> {"type", "help", "samples": [{"name", "labels", "value"}]}.
+        """
+        return {"timestamp": time.time(),
+                "metrics": {metric.name: {"type": metric.type, "help": metric.documentation,
+                                          "samples": [{"name": name, "labels": labels,
+                                                       "value": value if math.isfinite(value) else str(value)}
+                                                      for name, labels, value in metric.samples()]}
+                            for metric in self.metrics()}}
+
+    def dump_json(self, path: str) -> None:
+        """
+        Writes every metric to a JSON file.
+        :param path: path of the file.
+        :return None:
+        """
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+
+REGISTRY = Registry()
+
+# Scans
+ARP_REQUESTS_SENT = REGISTRY.register(Counter("arp_requests_sent_total", "ARP requests sent.", ["engine"]))
+ARP_REPLIES_RECEIVED = REGISTRY.register(Counter("arp_replies_received_total",
+                                                 "ARP replies received from scanned hosts.", ["engine"]))
+ARP_RETRIES = REGISTRY.register(Counter("arp_retried_requests_total",
+                                        "ARP requests sent again to hosts that did not answer.", ["engine"]))
+ARP_REPLY_LATENCY = REGISTRY.register(Histogram("arp_reply_latency_seconds",
+                                                "Round trip time of ARP requests (scapy engine only).", ["engine"],
+                                                buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                                                         0.25, 0.5, 1)))
+SCAN_DURATION = REGISTRY.register(Histogram("scan_duration_seconds", "Duration of the scan of a subnet.",
+                                            ["subnet", "kind"]))
+SCAN_HOSTS_ASKED = REGISTRY.register(Gauge("scan_hosts_asked", "Hosts asked during the last scan of a subnet.",
+                                           ["subnet", "kind"]))
+SCAN_HOSTS_ANSWERED = REGISTRY.register(Gauge("scan_hosts_answered",
+                                              "Hosts that answered during the last scan of a subnet.",
+                                              ["subnet", "kind"]))
+SCAN_REPLY_RATIO = REGISTRY.register(Gauge("scan_reply_ratio",
+                                           "Ratio of the asked hosts that answered during the last scan of a subnet "
+                                           "(for probes of known hosts, a drop means packet loss or devices gone).",
+                                           ["subnet", "kind"]))
+
+# GUI
+RENDER_DURATION = REGISTRY.register(Histogram("render_duration_seconds", "Duration of a canvas refresh.",
+                                              ["view"], buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                                                                 0.25, 0.5, 1, 2.5)))
+QUEUE_DEPTH = REGISTRY.register(Gauge("ui_queue_depth", "Items waiting on a queue consumed by the GUI.", ["queue"]))
+DROPPED_ITEMS = REGISTRY.register(Gauge("ui_queue_dropped_items",
+                                        "Items dropped from a bounded queue because its consumer lagged.", ["queue"]))
+
+
+def observe_scan(subnet, kind: str, asked: int, answered: int, duration: float) -> None:
+    """
+    Records the outcome of the scan of a subnet.
+    :param subnet: the subnet.
+    :param kind: "discover" (whole range) or "probe" (specific hosts).
+    :param asked: the number of hosts asked.
+    :param answered: the number of hosts that answered.
+    :param duration: the duration of the scan, in seconds.
+    :return None:
+    """
+    SCAN_DURATION.observe(duration, subnet=subnet, kind=kind)
+    SCAN_HOSTS_ASKED.set(asked, subnet=subnet, kind=kind)
+    SCAN_HOSTS_ANSWERED.set(answered, subnet=subnet, kind=kind)
+    SCAN_REPLY_RATIO.set(answered / asked if asked else 0, subnet=subnet, kind=kind)
+
+
+class MetricsServer:
+    """
+    Serves a registry over HTTP, in a background thread: /metrics (Prometheus text format) and /metrics.json.
+    """
+
+    def __init__(self, port: int = DEFAULT_PORT, host: str = DEFAULT_HOST, registry: Registry = REGISTRY):
+        """
+        :param port: the TCP port to listen on (0 for any free port).
+        :param host: the address to listen on.
+        :param registry: the registry served.
+        """
+        import http.server  # Only needed when serving, not by the modules recording metrics
+
+        self.registry = registry
+        self._server = http.server.ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def address(self) -> (str, int):
+        """
+        The (host, port) the server listens on.
+        :return tuple:
+        """
+        return self._server.server_address[:2]
+
+    def _handler(self):
+        import http.server
+
+        registry = self.registry
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                path = self.path.split("?")[0]
+                if path == "/metrics":
+                    body, content_type = registry.to_prometheus().encode(), PROMETHEUS_CONTENT_TYPE
+                elif path == "/metrics.json":
+                    body, content_type = json.dumps(registry.to_dict()).encode(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        return Handler
+
+    def start(self) -> None:
+        """
+        Starts serving, in a background thread.
+        :return None:
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics_server", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops serving.
+        :return None:
+        """
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def serve(port: int = DEFAULT_PORT, host: str = DEFAULT_HOST, registry: Optional[Registry] = None) -> MetricsServer:
+    """
+    Starts serving a registry over HTTP.
+    :param port: the TCP port to listen on.
+    :param host: the address to listen on.
+    :param registry: the registry served. Defaults to REGISTRY.
+    :return MetricsServer: the running server.
+    """
+    server = MetricsServer(port, host, registry or REGISTRY)
+    server.start()
+    return server
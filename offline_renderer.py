@@ -0,0 +1,246 @@
+"""
+This program was written by Yonatan Deri.
+It follows the PEP8 guidelines.
+
+Description:
+    This file serves as a module in the network_visualizer project.
+    It renders the topology of a subnet (see topology.py) to an SVG or PNG file, straight from its layout,
+    without Tk (so it runs on headless machines) and without creating a canvas item per node: edges and their
+    arrow heads are computed as NumPy arrays, then written as single SVG paths or drawn with PIL ImageDraw.
+    It looks like the subnet overview of the GUI (see canvas_renderer.py): same colors, images and labels.
+    PNG images larger than max_size pixels are scaled down; as when zooming out in the GUI, devices are then
+    drawn as dots, labels are left out and, far enough, the edges from the hub are bundled: one per CLUSTER_CELL
+    square of the image, to the center of its devices (thousands of single pixel lines would only fill the
+    image, and take most of the rendering time).
+
+License:
+    This program is under the GNU GPLv3 License.
+"""
+
+import base64
+import math
+import os
+from xml.sax.saxutils import escape
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# Imports of Self-Made files
+from topology import Topology
+
+HOST_IMAGE_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "gui_images", "host.png")
+
+BACKGROUND_COLOR = "#242424"
+EDGE_COLOR = "#44475a"
+NEIGHBOR_EDGE_COLOR = "#6272a4"
+HUB_COLOR = "#6272a4"
+LABEL_COLOR = "white"
+LABEL_FONT_SIZE = 8
+LABEL_LINE_HEIGHT = 1.25  # In font sizes
+
+NODE_RADIUS = 33  # Radius of the nodes, edges start and end on their border
+LABEL_OFFSET = 45  # Distance between the center of a node and its label
+DOT_RADIUS = 4
+ARROW_LENGTH = 8  # Arrow heads of the edges, as drawn by Tk
+ARROW_HALF_WIDTH = 3
+MARGIN = 100  # Space around the outermost nodes (and their labels), in layout coordinates
+
+MAX_IMAGE_SIZE = 4096  # Maximum width and height of PNG images, in pixels
+PNG_COMPRESS_LEVEL = 1  # zlib level of PNG images: higher levels take several times longer for little gain
+IMAGE_MIN_SCALE = 0.4  # Below this scale, devices are drawn as dots instead of images (PNG only)
+LABEL_MIN_SCALE = 0.75  # Below this scale, labels are not drawn (PNG only)
+BUNDLE_MAX_SCALE = 0.2  # Below this scale, the edges from the hub are bundled per CLUSTER_CELL (PNG only)
+CLUSTER_CELL = 60  # Side (in pixels) of the image area whose edges from the hub are bundled
+
+RENDER_FORMATS = (".svg", ".png")
+
+
+def render(topology: Topology, positions: np.ndarray, path: str, labels: bool = True,
+           max_size: int = MAX_IMAGE_SIZE) -> None:
+    """
+    Renders a topology to a file: SVG if the path ends with .svg, an image in the format of its extension
+    (e.g. PNG) otherwise.
+    :param topology: the topology.
+    :param positions: (n, 2) array of the layout positions, in the order of topology.nodes.
+    :param path: the path of the file.
+    :param labels: whether the labels of the nodes are drawn.
+    :param max_size: maximum width and height of images, in pixels.
+    :return None:
+    """
+    if path.lower().endswith(".svg"):
+        render_svg(topology, positions, path, labels)
+    else:
+        render_image(topology, positions, labels, max_size).save(path, compress_level=PNG_COMPRESS_LEVEL)
+
+
+def edge_segments(topology: Topology, positions: np.ndarray, radius: float) -> ([np.ndarray], [str]):
+    """
+    Computes the segments of the edges, shortened by the node radius on both ends.
+    :param topology: the topology.
+    :param positions: (n, 2) array of the node positions.
+    :param radius: the node radius, in the coordinates of the positions.
+    :return tuple: ([(m, 4) arrays of x1, y1, x2, y2 per edge], [their colors]), hub edges first.
+    """
+    segments = []
+    for edges in (topology.edges, topology.neighbor_edges):
+        start, end = positions[edges[:, 0]], positions[edges[:, 1]]
+        delta = end - start
+        length = np.hypot(delta[:, 0], delta[:, 1])
+        offset = delta * (radius / np.maximum(length, 1e-9))[:, None]
+        segments.append(np.hstack((start + offset, end - offset)))
+    return segments, [EDGE_COLOR, NEIGHBOR_EDGE_COLOR]
+
+
+def bundled_segments(topology: Topology, positions: np.ndarray, radius: float, cell: float) -> np.ndarray:
+    """
+    Computes the segments of the edges from the hub bundled per cell: one from the hub to the center of the
+    nodes linked to it in every cell of a grid, shortened by the node radius at the hub.
+    :param topology: the topology.
+    :param positions: (n, 2) array of the node positions.
+    :param radius: the node radius, in the coordinates of the positions.
+    :param cell: side of the cells, in the coordinates of the positions.
+    :return np.ndarray: (k, 4) array of x1, y1, x2, y2 per bundle.
+    """
+    ends = positions[topology.edges[:, 1]]
+    if not len(ends):
+        return np.empty((0, 4))
+    _, bundle_of, sizes = np.unique(np.floor(ends / cell).astype(np.int64), axis=0, return_inverse=True,
+                                    return_counts=True)
+    bundle_of = bundle_of.ravel()
+    centers = np.column_stack([np.bincount(bundle_of, ends[:, axis]) / sizes for axis in range(2)])
+    hub = positions[topology.hub]
+    delta = centers - hub
+    offset = delta * (radius / np.maximum(np.hypot(delta[:, 0], delta[:, 1]), 1e-9))[:, None]
+    return np.hstack((hub + offset, centers))
+
+
+def arrow_heads(segments: np.ndarray) -> np.ndarray:
+    """
+    Computes the arrow heads of both ends of segments, as drawn by Tk for arrow="both".
+    :param segments: (m, 4) array of x1, y1, x2, y2.
+    :return np.ndarray: (2m, 3, 2) array of triangles.
+    """
+    tips = np.concatenate((segments[:, 2:], segments[:, :2]))
+    tails = np.concatenate((segments[:, :2], segments[:, 2:]))
+    direction = tips - tails
+    direction /= np.maximum(np.hypot(direction[:, 0], direction[:, 1]), 1e-9)[:, None]
+    normal = np.column_stack((-direction[:, 1], direction[:, 0]))
+    base = tips - direction * ARROW_LENGTH
+    return np.stack((tips, base + normal * ARROW_HALF_WIDTH, base - normal * ARROW_HALF_WIDTH), axis=1)
+
+
+def _bounds(positions: np.ndarray) -> (np.ndarray, float, float):
+    """
+    Computes the area drawn.
+    :param positions: (n, 2) array of the node positions.
+    :return tuple: (origin (top left corner), width, height), in layout coordinates.
+    """
+    if not len(positions):
+        return np.zeros(2), 2 * MARGIN, 2 * MARGIN
+    origin = positions.min(axis=0) - MARGIN
+    width, height = positions.max(axis=0) + MARGIN - origin
+    return origin, float(width), float(height)
+
+
+def render_svg(topology: Topology, positions: np.ndarray, path: str, labels: bool = True) -> None:
+    """
+    Renders a topology to an SVG file. The host image is embedded once and referenced by every device.
+    :param topology: the topology.
+    :param positions: (n, 2) array of the layout positions, in the order of topology.nodes.
+    :param path: the path of the file.
+    :param labels: whether the labels of the nodes are drawn.
+    :return None:
+    """
+    origin, width, height = _bounds(positions)
+    positions = positions - origin
+    with open(HOST_IMAGE_PATH, "rb") as file:
+        host_image = base64.b64encode(file.read()).decode()
+    with Image.open(HOST_IMAGE_PATH) as image:
+        image_width, image_height = image.size
+
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+             f'width="{width:.0f}" height="{height:.0f}" viewBox="0 0 {width:.0f} {height:.0f}">\n',
+             f'<rect width="100%" height="100%" fill="{BACKGROUND_COLOR}"/>\n<defs>\n',
+             f'<image id="host" x="{-image_width / 2}" y="{-image_height / 2}" width="{image_width}" '
+             f'height="{image_height}" xlink:href="data:image/png;base64,{host_image}"/>\n</defs>\n']
+
+    segments, colors = edge_segments(topology, positions, NODE_RADIUS)
+    for lines, color in zip(segments, colors):
+        if len(lines):
+            data = "".join(f"M{x1:.1f} {y1:.1f}L{x2:.1f} {y2:.1f}" for x1, y1, x2, y2 in lines.tolist())
+            parts.append(f'<path d="{data}" stroke="{color}" fill="none"/>\n')
+            heads = "".join(f"M{x1:.1f} {y1:.1f}L{x2:.1f} {y2:.1f}L{x3:.1f} {y3:.1f}z"
+                            for (x1, y1), (x2, y2), (x3, y3) in arrow_heads(lines).tolist())
+            parts.append(f'<path d="{heads}" fill="{color}"/>\n')
+
+    for i, (x, y) in enumerate(positions.tolist()):
+        if i == topology.hub and topology.virtual_hub:
+            parts.append(f'<circle cx="{x:.1f}" cy="{y:.1f}" r="{NODE_RADIUS / 2}" fill="{HUB_COLOR}"/>\n')
+        else:
+            parts.append(f'<use xlink:href="#host" x="{x:.1f}" y="{y:.1f}"/>\n')
+
+    if labels:
+        parts.append(f'<g font-family="Times New Roman, serif" font-size="{LABEL_FONT_SIZE}" '
+                     f'fill="{LABEL_COLOR}" text-anchor="middle">\n')
+        line_height = LABEL_FONT_SIZE * LABEL_LINE_HEIGHT
+        for label, (x, y) in zip(topology.labels, positions.tolist()):
+            lines = label.split("\n")
+            # Centered vertically on LABEL_OFFSET below the node, as the canvas texts are
+            first_y = y + LABEL_OFFSET - (len(lines) - 1) * line_height / 2
+            spans = "".join(f'<tspan x="{x:.1f}" y="{first_y + n * line_height:.1f}">{escape(line)}</tspan>'
+                            for n, line in enumerate(lines))
+            parts.append(f"<text>{spans}</text>\n")
+        parts.append("</g>\n")
+    parts.append("</svg>\n")
+
+    with open(path, "w", encoding="utf-8") as file:
+        file.writelines(parts)
+
+
+def render_image(topology: Topology, positions: np.ndarray, labels: bool = True,
+                 max_size: int = MAX_IMAGE_SIZE) -> Image.Image:
+    """
+    Renders a topology to an image with PIL ImageDraw.
+    :param topology: the topology.
+    :param positions: (n, 2) array of the layout positions, in the order of topology.nodes.
+    :param labels: whether the labels of the nodes are drawn (only if the image is not scaled down too much).
+    :param max_size: maximum width and height of the image, in pixels. Larger layouts are scaled down.
+    :return Image.Image: the RGB image.
+    """
+    origin, width, height = _bounds(positions)
+    scale = min(1.0, max_size / max(width, height))
+    positions = (positions - origin) * scale
+    image = Image.new("RGB", (max(math.ceil(width * scale), 1), max(math.ceil(height * scale), 1)),
+                      BACKGROUND_COLOR)
+    draw = ImageDraw.Draw(image)
+
+    segments, colors = edge_segments(topology, positions, NODE_RADIUS * scale)
+    if scale < BUNDLE_MAX_SCALE:
+        segments[0] = bundled_segments(topology, positions, NODE_RADIUS * scale, CLUSTER_CELL)
+    for lines, color in zip(segments, colors):
+        for line in lines.tolist():
+            draw.line(line, fill=color)
+        if scale >= IMAGE_MIN_SCALE:
+            for triangle in arrow_heads(lines).tolist():
+                draw.polygon([tuple(point) for point in triangle], fill=color)
+
+    host = None
+    if scale >= IMAGE_MIN_SCALE:
+        with Image.open(HOST_IMAGE_PATH) as host_image:
+            host = host_image.convert("RGBA").resize((max(round(host_image.width * scale), 1),
+                                                      max(round(host_image.height * scale), 1)))
+    for i, (x, y) in enumerate(positions.tolist()):
+        if i == topology.hub and topology.virtual_hub:
+            radius = NODE_RADIUS / 2 * scale
+            draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=HUB_COLOR)
+        elif host is not None:
+            image.paste(host, (round(x - host.width / 2), round(y - host.height / 2)), host)
+        else:
+            draw.ellipse((x - DOT_RADIUS, y - DOT_RADIUS, x + DOT_RADIUS, y + DOT_RADIUS), fill=LABEL_COLOR)
+
+    if labels and scale >= LABEL_MIN_SCALE:
+        font = ImageFont.load_default()
+        for label, (x, y) in zip(topology.labels, positions.tolist()):
+            draw.multiline_text((x, y + LABEL_OFFSET * scale), label, fill=LABEL_COLOR, font=font, anchor="mm",
+                                align="center")
+    return image
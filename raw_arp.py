@@ -0,0 +1,262 @@
+"""
+This program was written by Yonatan Deri.
+It follows the PEP8 guidelines.
+
+Description:
+    This file serves as a module in the network_visualizer project.
+    It implements a lightweight ARP scanning engine, sending prebuilt ARP frames over an AF_PACKET socket
+    and parsing the replies in place, without building scapy packet objects. Linux only, requires root.
+
+License:
+    This program is under the GNU GPLv3 License.
+"""
+
+import netifaces
+import ipaddress
+import select
+import socket
+import struct
+import time
+from typing import Container, Iterable, Optional, Sequence, Tuple
+
+# Imports of Self-Made files
+import metrics
+
+ETH_P_ARP = 0x0806
+ARP_REQUEST = 1
+ARP_REPLY = 2
+
+ETHERNET_HEADER = struct.Struct("!6s6sH")
+ARP_HEADER = struct.Struct("!HHBBH6s4s6s4s")
+FRAME_SIZE = ETHERNET_HEADER.size + ARP_HEADER.size
+
+# Offsets inside an ARP over Ethernet frame
+OPCODE_OFFSET = 20
+SENDER_MAC_OFFSET = 22
+SENDER_IP_OFFSET = 28
+TARGET_IP_OFFSET = 38
+
+UINT16 = struct.Struct("!H")
+UINT32 = struct.Struct("!I")
+
+RECEIVE_BUFFER_SIZE = 4 * 1024 * 1024
+MAX_FRAME_SIZE = 2048
+
+
+def get_interface_addresses(iface: str) -> (bytes, bytes):
+    """
+    Gets the MAC and IPv4 addresses of an interface, packed as raw bytes.
+    :param iface: the interface name.
+    :return tuple: (6 bytes MAC address, 4 bytes IPv4 address).
+    """
+    addresses = netifaces.ifaddresses(iface)
+    mac = bytes.fromhex(addresses[netifaces.AF_LINK][0]['addr'].replace(':', ''))
+    ip = ipaddress.IPv4Address(addresses[netifaces.AF_INET][0]['addr']).packed
+    return mac, ip
+
+
+def build_request(src_mac: bytes, src_ip: bytes) -> bytearray:
+    """
+    Builds a broadcast ARP request frame, used as a template: only its target ip bytes change between requests.
+    :param src_mac: the MAC address of the sending interface (6 bytes).
+    :param src_ip: the IPv4 address of the sending interface (4 bytes).
+    :return bytearray: the request frame, with an all-zero target ip.
+    """
+    frame = bytearray(FRAME_SIZE)
+    ETHERNET_HEADER.pack_into(frame, 0, b'\xff' * 6, src_mac, ETH_P_ARP)
+    ARP_HEADER.pack_into(frame, ETHERNET_HEADER.size, 1, 0x0800, 6, 4, ARP_REQUEST,
+                         src_mac, src_ip, b'\x00' * 6, b'\x00' * 4)
+    return frame
+
+
+def open_socket(iface: str) -> socket.socket:
+    """
+    Opens a non-blocking AF_PACKET socket bound to an interface, receiving ARP frames only.
+    :param iface: the interface name.
+    :return socket.socket: the opened socket.
+    """
+    sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ARP))
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER_SIZE)
+        sock.bind((iface, ETH_P_ARP))
+        sock.setblocking(False)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def send_requests(sock: socket.socket, template: bytearray, addresses: Iterable[int],
+                  rate_limit: Optional[float] = None, replies: Optional[dict] = None,
+                  accepted: Container[int] = ()) -> int:
+    """
+    Sends an ARP request for every given address, reusing the same frame buffer.
+    Replies that already arrived are collected between sends (if a replies dict is given), so the socket
+    receive buffer does not overflow during long sweeps.
+    :param sock: socket opened with open_socket().
+    :param template: request frame built with build_request(). Its target ip bytes are overwritten.
+    :param addresses: target IPv4 addresses, as integers.
+    :param rate_limit: maximum number of requests sent per second. None for no limit.
+    :param replies: dict collecting the replies, as described in receive_replies().
+    :param accepted: sender addresses (integers) whose replies are kept.
+    :return int: the number of requests sent.
+    """
+    buffer = bytearray(MAX_FRAME_SIZE)
+    view = memoryview(buffer)
+    inter = 1 / rate_limit if rate_limit else 0
+    next_send = time.perf_counter()
+    sent = 0
+    for address in addresses:
+        UINT32.pack_into(template, TARGET_IP_OFFSET, address)
+        while True:
+            try:
+                sock.send(template)
+                break
+            except BlockingIOError:
+                select.select([], [sock], [])
+        sent += 1
+        if replies is not None:
+            _drain(sock, view, accepted, replies)
+        if inter:
+            next_send += inter
+            delay = next_send - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+    return sent
+
+
+def receive_replies(sock: socket.socket, accepted: Container[int], timeout: float, replies: dict) -> dict:
+    """
+    Collects ARP replies until the timeout expires.
+    :param sock: socket opened with open_socket().
+    :param accepted: sender addresses (integers) whose replies are kept.
+    :param timeout: how much time (in seconds) to wait for replies.
+    :param replies: dict of sender address (integer) -> sender MAC (6 bytes), updated in place.
+    :return dict: the given replies dict.
+    """
+    buffer = bytearray(MAX_FRAME_SIZE)
+    view = memoryview(buffer)
+    deadline = time.perf_counter() + timeout
+    while True:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            return replies
+        ready, _, _ = select.select([sock], [], [], remaining)
+        if ready:
+            _drain(sock, view, accepted, replies)
+
+
+def _drain(sock: socket.socket, view: memoryview, accepted: Container[int], replies: dict) -> None:
+    """
+    Reads every frame waiting on the socket, keeping the ARP replies sent from accepted addresses.
+    :param sock: socket opened with open_socket().
+    :param view: memoryview over the buffer frames are read into.
+    :param accepted: sender addresses (integers) whose replies are kept.
+    :param replies: dict of sender address (integer) -> sender MAC (6 bytes), updated in place.
+    :return None:
+    """
+    while True:
+        try:
+            size = sock.recv_into(view)
+        except BlockingIOError:
+            return
+        if size < FRAME_SIZE or UINT16.unpack_from(view, OPCODE_OFFSET)[0] != ARP_REPLY:
+            continue
+        sender = UINT32.unpack_from(view, SENDER_IP_OFFSET)[0]
+        if sender in accepted and sender not in replies:
+            replies[sender] = bytes(view[SENDER_MAC_OFFSET:SENDER_MAC_OFFSET + 6])
+
+
+def parse_frame(view: memoryview, size: int) -> Optional[Tuple[int, int, bytes, int]]:
+    """
+    Parses an ARP frame read from a socket opened with open_socket().
+    :param view: memoryview over the buffer the frame was read into.
+    :param size: the size of the frame.
+    :return tuple: (opcode, sender address (integer), sender MAC (6 bytes), target address (integer)),
+                   or None if the frame is too short to be an ARP frame.
+    """
+    if size < FRAME_SIZE:
+        return None
+    return (UINT16.unpack_from(view, OPCODE_OFFSET)[0], UINT32.unpack_from(view, SENDER_IP_OFFSET)[0],
+            bytes(view[SENDER_MAC_OFFSET:SENDER_MAC_OFFSET + 6]), UINT32.unpack_from(view, TARGET_IP_OFFSET)[0])
+
+
+def host_range(ip_range) -> (int, int):
+    """
+    Gets the first and last host addresses of an ip range.
+    :param ip_range: the ip range (subnet).
+    :return tuple: (first, last) host addresses, as integers.
+    """
+    network = ipaddress.ip_network(str(ip_range), strict=False)
+    first, last = int(network.network_address), int(network.broadcast_address)
+    if network.prefixlen < 31:
+        first, last = first + 1, last - 1
+    return first, last
+
+
+def target_addresses(targets) -> Sequence[int]:
+    """
+    Converts scan targets to the integer addresses requests are sent to.
+    :param targets: an ip range (subnet), an iterable of ip addresses, or a range of integer addresses
+                    (returned as is).
+    :return Sequence[int]: the addresses, as a range for an ip range or as a sorted list otherwise.
+    """
+    if isinstance(targets, range):
+        return targets
+    if isinstance(targets, (str, ipaddress.IPv4Network)):
+        first, last = host_range(targets)
+        return range(first, last + 1)
+    return sorted({int(ipaddress.IPv4Address(address)) for address in targets})
+
+
+def scan(targets, iface: str, timeout: float = 1, rate_limit: Optional[float] = None,
+         retries: int = 0) -> [(str, str)]:
+    """
+    Scans an ip range (or specific hosts) for discovering active devices in it, over a raw AF_PACKET socket.
+    :param targets: the ip range (subnet) to scan, or an iterable of ip addresses.
+    :param iface: interface to send the requests on.
+    :param timeout: how much time (in seconds) to wait for replies after the last request has been sent.
+    :param rate_limit: maximum number of requests sent per second. None for no limit.
+    :param retries: how many times hosts that did not answer are asked again.
+    :return list: (ip, mac) tuples of every device discovered, in order of reply.
+    """
+    targets = target_addresses(targets)
+    if not targets:
+        return []
+    src_mac, src_ip = get_interface_addresses(iface)
+    with open_socket(iface) as sock:
+        return scan_socket(sock, src_mac, src_ip, targets, timeout, rate_limit, retries)
+
+
+def scan_socket(sock: socket.socket, src_mac: bytes, src_ip: bytes, targets, timeout: float = 1,
+                rate_limit: Optional[float] = None, retries: int = 0) -> [(str, str)]:
+    """
+    Scans ip addresses over an already opened socket, carrying whole Ethernet frames (an AF_PACKET socket from
+    open_socket(), or any non-blocking packet socket, e.g. one connected to a simulated network).
+    :param sock: the non-blocking socket.
+    :param src_mac: the MAC address the requests are sent from (6 bytes).
+    :param src_ip: the IPv4 address the requests are sent from (4 bytes).
+    :param targets: the ip range (subnet) to scan, or an iterable of ip addresses.
+    :param timeout: how much time (in seconds) to wait for replies after the last request has been sent.
+    :param rate_limit: maximum number of requests sent per second. None for no limit.
+    :param retries: how many times hosts that did not answer are asked again.
+    :return list: (ip, mac) tuples of every device discovered, in order of reply.
+    """
+    targets = target_addresses(targets)
+    if not targets:
+        return []
+    accepted = targets if isinstance(targets, range) else set(targets)
+    template = build_request(src_mac, src_ip)
+    replies = {}
+    addresses = targets
+    for attempt in range(retries + 1):
+        sent = send_requests(sock, template, addresses, rate_limit, replies, accepted)
+        metrics.ARP_REQUESTS_SENT.inc(sent, engine="raw")
+        if attempt:
+            metrics.ARP_RETRIES.inc(sent, engine="raw")
+        receive_replies(sock, accepted, timeout, replies)
+        addresses = [address for address in targets if address not in replies]
+        if not addresses:
+            break
+    metrics.ARP_REPLIES_RECEIVED.inc(len(replies), engine="raw")
+    return [(str(ipaddress.IPv4Address(ip)), mac.hex(':')) for ip, mac in replies.items()]
@@ -0,0 +1,106 @@
+"""
+This program was written by Yonatan Deri.
+It follows the PEP8 guidelines.
+
+Description:
+    This file serves as a module in the network_visualizer project.
+    It implements the scan log widget: an append-only textbox that any thread can write to. Lines are queued
+    and appended by the Tk main loop at a fixed frame rate, and only the last max_lines lines are retained.
+
+License:
+    This program is under the GNU GPLv3 License.
+"""
+
+# GUI related Imports
+import customtkinter
+
+# Miscellaneous Imports
+import queue
+
+FRAME_INTERVAL = 33  # Milliseconds between two flushes of the queued lines (~30 frames per second)
+MAX_LINES = 5000
+
+
+class ScanLog(customtkinter.CTkTextbox):
+    """
+    Read-only, append-only log textbox. write() and clear() are thread-safe; the widget itself is only touched
+    from the Tk main loop.
+    """
+
+    def __init__(self, master, max_lines: int = MAX_LINES, frame_interval: int = FRAME_INTERVAL, **kwargs):
+        """
+        :param master: the parent widget.
+        :param max_lines: maximum number of lines retained, older lines are dropped.
+        :param frame_interval: milliseconds between two flushes of the queued lines.
+        :param kwargs: passed to customtkinter.CTkTextbox.
+        """
+        super().__init__(master, **kwargs)
+        self.configure(state="disabled")
+        self.max_lines = max_lines
+        self.frame_interval = frame_interval
+        self._pending = queue.Queue()
+        self._displayed_lines = 0
+        self._flush_job = self.after(self.frame_interval, self._flush)
+
+    def write(self, text: str) -> None:
+        """
+        Queues text to be appended to the log, as one or more lines. Can be called from any thread.
+        :param text: the text to append.
+        :return None:
+        """
+        self._pending.put(text)
+
+    def clear(self) -> None:
+        """
+        Queues the removal of every line of the log. Can be called from any thread.
+        :return None:
+        """
+        self._pending.put(None)
+
+    def queue_depth(self) -> int:
+        """
+        Gets the number of writes waiting for the next flush.
+        :return int:
+        """
+        return self._pending.qsize()
+
+    def _flush(self) -> None:
+        """
+        Appends every queued line to the textbox in a single insert, then drops the lines exceeding max_lines.
+        Reschedules itself every frame_interval milliseconds.
+        :return None:
+        """
+        new_lines = []
+        cleared = False
+        while True:
+            try:
+                text = self._pending.get_nowait()
+            except queue.Empty:
+                break
+            if text is None:
+                new_lines.clear()
+                cleared = True
+            else:
+                new_lines.extend(text.split("\n"))
+
+        if cleared or new_lines:
+            new_lines = new_lines[-self.max_lines:]
+            self.configure(state="normal")
+            if cleared:
+                self.delete("1.0", "end")
+                self._displayed_lines = 0
+            if new_lines:
+                self.insert("end", "\n".join(new_lines) + "\n")
+                self._displayed_lines += len(new_lines)
+                excess = self._displayed_lines - self.max_lines
+                if excess > 0:
+                    self.delete("1.0", f"{excess + 1}.0")
+                    self._displayed_lines -= excess
+            self.configure(state="disabled")
+            self.yview_moveto(1)
+
+        self._flush_job = self.after(self.frame_interval, self._flush)
+
+    def destroy(self) -> None:
+        self.after_cancel(self._flush_job)
+        super().destroy()
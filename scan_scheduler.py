@@ -0,0 +1,193 @@
+"""
+This program was written by Yonatan Deri.
+It follows the PEP8 guidelines.
+
+Description:
+    This file serves as a module in the network_visualizer project. It relies on the arp_scan.py file.
+    It rescans every scheduled subnet periodically, each on its own interval, in a background thread, and
+    compares every result with the previous one of the same subnet. Only the differences are published, as
+    arp_monitor.DeviceEvent join (new device), leave (gone device) and change (same IP, different MAC - a
+    replaced device or possibly ARP spoofing) events on a bounded queue, so consumers can update in place.
+
+License:
+    This program is under the GNU GPLv3 License.
+"""
+
+import ipaddress
+import queue
+import sys
+import threading
+import time
+from typing import Callable, Optional
+
+# Imports of Self-Made files
+import arp_monitor
+import arp_scan
+
+RESCAN_INTERVAL = 5 * 60  # Default seconds between two scans of the same subnet
+RETRY_INTERVAL = 30  # Seconds before a failed scan is retried
+
+
+def diff_devices(network, previous: [(str, str)], current: [(str, str)],
+                 timestamp: Optional[float] = None) -> [arp_monitor.DeviceEvent]:
+    """
+    Compares two scan results of the same subnet.
+    :param network: the subnet.
+    :param previous: (ip, mac) tuples of the previous scan.
+    :param current: (ip, mac) tuples of the current scan.
+    :param timestamp: when the current scan ran (UNIX timestamp). Defaults to now.
+    :return list: JOIN and CHANGE events (in the order of the current scan), then LEAVE events.
+    """
+    timestamp = time.time() if timestamp is None else timestamp
+    previous, current = dict(previous), dict(current)
+    events = []
+    for ip, mac in current.items():
+        previous_mac = previous.get(ip)
+        if previous_mac is None:
+            events.append(arp_monitor.DeviceEvent(arp_monitor.JOIN, network, ip, mac, timestamp))
+        elif previous_mac != mac:
+            events.append(arp_monitor.DeviceEvent(arp_monitor.CHANGE, network, ip, mac, timestamp,
+                                                  previous_mac=previous_mac))
+    events += [arp_monitor.DeviceEvent(arp_monitor.LEAVE, network, ip, mac, timestamp)
+               for ip, mac in previous.items() if ip not in current]
+    return events
+
+
+class RescanScheduler:
+    """
+    Periodic rescans of subnets, publishing the differences between two consecutive results.
+    Subnets are scanned one at a time; the next scan of a subnet is due its interval after the previous one ended.
+    Events are put on the bounded `events` queue; when it is full, the oldest events are dropped (and counted
+    in `dropped_events`).
+    """
+
+    def __init__(self, scan_function: Optional[Callable] = None, interval: float = RESCAN_INTERVAL,
+                 queue_size: int = arp_monitor.EVENT_QUEUE_SIZE):
+        """
+        :param scan_function: scans a single subnet, called as scan_function(network, iface=). Returns (ip, mac)
+        tuples. Defaults to arp_scan.discover (inventory.Inventory.refresh rescans incrementally).
+        :param interval: default seconds between two scans of the same subnet.
+        :param queue_size: maximum number of events waiting on the queue.
+        """
+        self.scan_function = scan_function or arp_scan.discover
+        self.interval = interval
+        self.events = queue.Queue(maxsize=queue_size)
+        self.dropped_events = 0
+        self._subnets = {}  # network -> {"iface", "interval", "devices", "due"}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def schedule(self, iface: Optional[str], network, devices: Optional[list] = None,
+                 interval: Optional[float] = None) -> None:
+        """
+        Schedules the periodic rescans of a subnet, or reschedules it if it already is.
+        :param iface: interface to scan the subnet on (None to use the one routing to it).
+        :param network: the subnet.
+        :param devices: (ip, mac) tuples of its latest scan, the next result is compared to. If None, the
+        previous result is kept (the first scan of a new subnet reports every device as joining).
+        :param interval: seconds between two scans of this subnet. Defaults to the scheduler's interval.
+        :return None:
+        """
+        network = ipaddress.ip_network(str(network), strict=False)
+        interval = self.interval if interval is None else interval
+        with self._lock:
+            entry = self._subnets.setdefault(network, {"devices": []})
+            entry.update(iface=iface, interval=interval, due=time.monotonic() + interval)
+            if devices is not None:
+                entry["devices"] = list(devices)
+        self._wakeup.set()
+
+    def unschedule(self, network) -> None:
+        """
+        Stops rescanning a subnet.
+        :param network: the subnet.
+        :return None:
+        """
+        with self._lock:
+            self._subnets.pop(ipaddress.ip_network(str(network), strict=False), None)
+        self._wakeup.set()
+
+    def subnets(self) -> [ipaddress.IPv4Network]:
+        """
+        Gets the scheduled subnets.
+        :return list:
+        """
+        with self._lock:
+            return list(self._subnets)
+
+    def start(self) -> None:
+        """
+        Starts rescanning, in a background thread.
+        :return None:
+        """
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="scan_scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops rescanning, waiting for a running scan to end.
+        :return None:
+        """
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def running(self) -> bool:
+        """
+        Whether the scheduler is running.
+        :return bool:
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def rescan(self, network) -> [arp_monitor.DeviceEvent]:
+        """
+        Rescans a scheduled subnet right away, publishing and returning the differences with its previous result.
+        :param network: the subnet.
+        :return list: the events published.
+        """
+        network = ipaddress.ip_network(str(network), strict=False)
+        with self._lock:
+            entry = self._subnets.get(network)
+        if entry is None:
+            return []
+        try:
+            current = self.scan_function(network, iface=entry["iface"])
+        except Exception as error:  # Any failure (e.g. the interface went down) is retried, never ends the thread
+            print(f"Could not rescan {network}, retrying in {RETRY_INTERVAL} seconds: {error}", file=sys.stderr)
+            with self._lock:
+                if network in self._subnets:
+                    self._subnets[network]["due"] = time.monotonic() + RETRY_INTERVAL
+            return []
+
+        with self._lock:
+            entry = self._subnets.get(network)
+            if entry is None:  # Unscheduled during the scan
+                return []
+            events = diff_devices(network, entry["devices"], current)
+            entry.update(devices=current, due=time.monotonic() + entry["interval"])
+        for event in events:
+            self.dropped_events += arp_monitor.put_dropping_oldest(self.events, event)
+        return events
+
+    def _run(self) -> None:
+        """
+        Rescans the subnets as they become due, until stopped.
+        :return None:
+        """
+        while not self._stop.is_set():
+            with self._lock:
+                next_due = min(self._subnets.items(), key=lambda item: item[1]["due"], default=None)
+            if next_due is None:
+                self._wakeup.wait()
+            elif next_due[1]["due"] > time.monotonic():
+                self._wakeup.wait(next_due[1]["due"] - time.monotonic())
+            else:
+                self.rescan(next_due[0])
+                continue
+            self._wakeup.clear()
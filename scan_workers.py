@@ -0,0 +1,305 @@
+"""
+This program was written by Yonatan Deri.
+It follows the PEP8 guidelines.
+
+Description:
+    This file serves as a module in the network_visualizer project. It relies on the arp_scan.py and
+    inventory.py files.
+    It scans subnets in a pool of worker processes, so scans of many subnets (e.g. dozens of VLANs watched from
+    one box) are not bound by the GIL of a single process: scapy builds and matches its packets in Python.
+    Workers take scan tasks from a shared queue and send their results back, in batches, each over its own
+    pipe. The devices of a subnet are sent once its scan ended (the scan functions return whole lists), with the
+    metrics the worker recorded meanwhile (packets sent and received, retries, reply latency). An aggregator
+    thread of the parent process reads every pipe, merges the results of each subnet and the metrics into the
+    parent's (records them in the single inventory and metrics.REGISTRY) and resolves the future of the task.
+    ScanWorkerPool.discover and ScanWorkerPool.refresh have the signatures of arp_scan.discover and
+    inventory.Inventory.refresh, so they can be the scan_function of arp_scan.scan_concurrently and of
+    scan_scheduler.RescanScheduler.
+
+License:
+    This program is under the GNU GPLv3 License.
+"""
+
+import ipaddress
+import itertools
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import Connection, wait
+from typing import NamedTuple, Optional
+
+# Imports of Self-Made files
+import arp_scan
+import inventory
+import metrics
+
+RESULT_BATCH_SIZE = 512  # Devices sent per message from a worker to the aggregator
+PARENT_CHECK_INTERVAL = 5  # Seconds between two checks of an idle worker that its parent is still alive
+
+# Workers are spawned rather than forked: the parent may run Tk and several threads, which a fork would copy
+START_METHOD = "spawn"
+
+
+class ScanTask(NamedTuple):
+    """
+    A subnet to scan, as sent to the workers.
+    """
+    task_id: int
+    network: ipaddress.IPv4Network
+    iface: Optional[str]
+    timeout: float
+    engine: str
+    known: Optional[list]  # Known hosts to probe first (see inventory.rescan), None to discover the whole range
+    full_sweep: bool
+    record: bool  # Whether the aggregator records the result in the inventory
+
+
+def _work(tasks, connection: Connection) -> None:
+    """
+    Entry point of a worker process: scans the subnets of the tasks taken from the queue, sending the
+    results over the pipe as ("started", task id, None), ("devices", task id, batch of devices) and
+    ("metrics", task id, metric values recorded during the task, see metrics.Registry.values()) messages, then
+    ("done", task id, elapsed seconds) or ("error", task id, exception). Ends on a None task, or when the
+    parent process is gone.
+    :param tasks: the queue the tasks are taken from.
+    :param connection: the worker end of its pipe to the aggregator.
+    :return None:
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Interrupts are handled by the parent, which stops the pool
+    parent = multiprocessing.parent_process()
+    with connection:
+        while True:
+            try:
+                task = tasks.get(timeout=PARENT_CHECK_INTERVAL)
+            except queue.Empty:
+                if parent is not None and not parent.is_alive():
+                    return
+                continue
+            if task is None:
+                return
+            connection.send(("started", task.task_id, None))
+            start_time = time.perf_counter()
+            try:
+                if task.known is None:
+                    devices = arp_scan.discover(task.network, iface=task.iface, timeout=task.timeout,
+                                                engine=task.engine)
+                else:
+                    devices = inventory.rescan(task.network, task.known, task.full_sweep, iface=task.iface,
+                                               timeout=task.timeout, engine=task.engine)
+            except Exception as error:  # Sent back, raised to the caller waiting for the task
+                _send_metrics(connection, task.task_id)
+                connection.send(("error", task.task_id, error))
+                continue
+            elapsed = time.perf_counter() - start_time
+            for start in range(0, len(devices), RESULT_BATCH_SIZE):
+                connection.send(("devices", task.task_id, devices[start:start + RESULT_BATCH_SIZE]))
+            _send_metrics(connection, task.task_id)
+            connection.send(("done", task.task_id, elapsed))
+
+
+def _send_metrics(connection: Connection, task_id: int) -> None:
+    """
+    Sends the metrics recorded by a worker during a task to the aggregator, and resets them for the next task.
+    :param connection: the worker end of its pipe to the aggregator.
+    :param task_id: the id of the task.
+    :return None:
+    """
+    values = metrics.REGISTRY.values()
+    metrics.REGISTRY.clear()
+    connection.send(("metrics", task_id, values))
+
+
+class ScanWorkerPool:
+    """
+    Pool of scan worker processes, started on the first submitted task. Safe to use from several threads.
+    """
+
+    def __init__(self, processes: Optional[int] = None, inventory_store: Optional[inventory.Inventory] = None):
+        """
+        :param processes: the number of worker processes. Defaults to the number of CPUs.
+        :param inventory_store: the inventory the results of refresh() are merged into.
+        """
+        self.processes = processes or os.cpu_count() or 1
+        self.inventory = inventory_store
+        self._context = multiprocessing.get_context(START_METHOD)
+        self._tasks = None
+        self._workers = {}  # Aggregator end of the pipe -> (worker process, id of its current task)
+        self._pending = {}  # Task id -> (task, future, devices received so far)
+        self._task_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._aggregator = None
+
+    def __enter__(self) -> "ScanWorkerPool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        """
+        Starts the worker processes and the aggregator thread, if not started yet.
+        :return None:
+        """
+        with self._lock:
+            if self._aggregator is not None:
+                return
+            self._tasks = self._context.Queue()
+            for _ in range(self.processes):
+                self._start_worker()
+            self._aggregator = threading.Thread(target=self._aggregate, name="scan_workers", daemon=True)
+            self._aggregator.start()
+
+    def _start_worker(self) -> None:
+        """
+        Starts a worker process. Called with the lock held.
+        :return None:
+        """
+        receiver, sender = self._context.Pipe(duplex=False)
+        process = self._context.Process(target=_work, args=(self._tasks, sender), name="scan_worker", daemon=True)
+        process.start()
+        sender.close()
+        self._workers[receiver] = (process, None)
+
+    def stop(self) -> None:
+        """
+        Stops the workers once the submitted tasks are done, and the aggregator thread.
+        :return None:
+        """
+        with self._lock:
+            aggregator, self._aggregator = self._aggregator, None
+            if aggregator is None:
+                return
+            for _ in self._workers:
+                self._tasks.put(None)
+        aggregator.join()
+        self._tasks.close()
+
+    def submit(self, network, iface: Optional[str] = None, timeout: float = arp_scan.DEFAULT_TIMEOUT,
+               engine: str = arp_scan.DEFAULT_ENGINE, known: Optional[list] = None, full_sweep: bool = True,
+               record: bool = False) -> Future:
+        """
+        Submits the scan of a subnet to the workers.
+        :param network: the subnet to scan.
+        :param iface: interface to send the requests on.
+        :param timeout: reply timeout (in seconds) of the scan.
+        :param engine: one of arp_scan.ENGINES.
+        :param known: known hosts probed first (see inventory.rescan). None to discover the whole range.
+        :param full_sweep: whether the rest of the range is swept after probing the known hosts.
+        :param record: whether the result is recorded in the inventory.
+        :return Future: resolves to the arp_scan.SubnetScanResult of the subnet, or raises the scan error.
+        """
+        self.start()
+        network = ipaddress.ip_network(str(network), strict=False)
+        future = Future()
+        with self._lock:
+            task = ScanTask(next(self._task_ids), network, iface, timeout, engine, known, full_sweep, record)
+            self._pending[task.task_id] = (task, future, [])
+        self._tasks.put(task)
+        return future
+
+    def discover(self, network, iface: Optional[str] = None, timeout: float = arp_scan.DEFAULT_TIMEOUT,
+                 engine: str = arp_scan.DEFAULT_ENGINE) -> [(str, str)]:
+        """
+        Scans a subnet in a worker process, as arp_scan.discover does, waiting for the result.
+        :param network: the subnet to scan.
+        :param iface: interface to send the requests on.
+        :param timeout: reply timeout (in seconds) of the scan.
+        :param engine: one of arp_scan.ENGINES.
+        :return list: (ip, mac) tuples of every device discovered.
+        """
+        return self.submit(network, iface, timeout, engine).result().devices
+
+    def refresh(self, network, iface: Optional[str] = None, timeout: float = arp_scan.DEFAULT_TIMEOUT,
+                engine: str = arp_scan.DEFAULT_ENGINE, force_full_sweep: bool = False) -> [(str, str)]:
+        """
+        Incrementally rescans a subnet in a worker process, as inventory.Inventory.refresh does: the rescan is
+        planned from the inventory, and its result recorded in it by the aggregator.
+        :param network: the subnet to rescan.
+        :param iface: interface to send the requests on.
+        :param timeout: reply timeout (in seconds) of the full sweep.
+        :param engine: one of arp_scan.ENGINES.
+        :param force_full_sweep: sweep the whole range even if the last sweep is recent.
+        :return list: (ip, mac) tuples of every device that answered.
+        """
+        if self.inventory is None:
+            raise ValueError("Incremental rescans need the pool to have an inventory")
+        known, full_sweep = self.inventory.plan(network, force_full_sweep)
+        return self.submit(network, iface, timeout, engine, known, full_sweep, record=True).result().devices
+
+    def _aggregate(self) -> None:
+        """
+        Reads the messages of every worker and merges the results of their tasks, until every worker ended.
+        A worker that died during a task is replaced, the task failing with an OSError. If every worker died
+        (e.g. at startup), the tasks left fail too, and the pool starts again on the next submitted task.
+        :return None:
+        """
+        while True:
+            with self._lock:
+                connections = list(self._workers)
+                if not connections:
+                    self._aggregator = None
+                    pending, self._pending = list(self._pending.values()), {}
+                    break
+            for connection in wait(connections):
+                try:
+                    kind, task_id, value = connection.recv()
+                except (EOFError, OSError):
+                    self._end_worker(connection)
+                    continue
+                if kind == "started":
+                    with self._lock:
+                        self._workers[connection] = (self._workers[connection][0], task_id)
+                elif kind == "devices":
+                    self._pending[task_id][2].extend(value)
+                elif kind == "metrics":
+                    metrics.REGISTRY.merge(value)
+                else:
+                    with self._lock:
+                        self._workers[connection] = (self._workers[connection][0], None)
+                        task, future, devices = self._pending.pop(task_id)
+                    if kind == "error":
+                        future.set_exception(value)
+                    else:
+                        self._finish(task, future, devices, value)
+        for task, future, _ in pending:
+            future.set_exception(OSError(f"No scan worker left to scan {task.network}"))
+
+    def _finish(self, task: ScanTask, future: Future, devices: [(str, str)], elapsed: float) -> None:
+        """
+        Merges the result of a task: records it (in the inventory and the metrics) and resolves its future.
+        :param task: the task.
+        :param future: the future of the task.
+        :param devices: (ip, mac) tuples received from the worker.
+        :param elapsed: the duration of the scan in the worker, in seconds.
+        :return None:
+        """
+        try:
+            if task.record and self.inventory is not None:
+                self.inventory.record(task.network, devices, full_sweep=task.full_sweep)
+        except Exception as error:
+            future.set_exception(error)
+            return
+        asked = len(task.known) if task.known and not task.full_sweep else task.network.num_addresses
+        metrics.observe_scan(task.network, "worker", asked, len(devices), elapsed)
+        future.set_result(arp_scan.SubnetScanResult(task.network, devices, elapsed))
+
+    def _end_worker(self, connection: Connection) -> None:
+        """
+        Handles the end of a worker: stopped, or died (then its task fails, and it is replaced if it had one).
+        :param connection: the aggregator end of the pipe of the worker.
+        :return None:
+        """
+        with self._lock:
+            process, task_id = self._workers.pop(connection)
+            connection.close()
+            process.join()
+            pending = self._pending.pop(task_id, None)
+            if pending is not None and self._aggregator is not None:
+                self._start_worker()
+        if pending is not None:
+            pending[1].set_exception(OSError(f"The scan worker of {pending[0].network} exited "
+                                             f"(exit code {process.exitcode})"))
@@ -0,0 +1,199 @@
+"""
+This program was written by Yonatan Deri.
+It follows the PEP8 guidelines.
+
+Description:
+    This file serves as a module in the network_visualizer project. It relies on the topology.py and
+    device_table.py files.
+    It saves and loads snapshots of a subnet overview: its devices, their topology and the computed layout, so a
+    subnet can be reopened (or rendered offline, see offline_renderer.py) without scanning it or computing its
+    layout again. Snapshots are stored either as JSON (readable, for other tools) or in a compact binary format:
+    a compressed NumPy .npz archive of packed columns (addresses as integers, positions as float32), loaded
+    without pickle.
+
+License:
+    This program is under the GNU GPLv3 License.
+"""
+
+import ipaddress
+import json
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+# Imports of Self-Made files
+import device_table
+from topology import Topology
+
+FORMAT_NAME = "network_visualizer.snapshot"
+FORMAT_VERSION = 1
+
+SNAPSHOT_FORMATS = (".json", ".npz")
+BINARY_MAGIC = b"PK\x03\x04"  # .npz archives are zip files
+
+
+class Snapshot(NamedTuple):
+    """
+    Snapshot of a subnet overview. Positions are in layout (world) coordinates, in the order of topology.nodes.
+    """
+    subnet: str
+    layout: str
+    created: float  # UNIX timestamp
+    devices: [(str, str)]
+    topology: Topology
+    positions: np.ndarray  # (n, 2) float array
+
+    def positions_dict(self) -> {str: (float, float)}:
+        """
+        Gets the positions by node, as used by canvas_renderer and layouts.LayoutCache.
+        :return dict: node id -> (x, y) position.
+        """
+        return {node: (float(x), float(y)) for node, (x, y) in zip(self.topology.nodes, self.positions)}
+
+
+def take(subnet, layout: str, devices: [(str, str)], topology: Topology,
+         positions: {str: (float, float)}) -> Snapshot:
+    """
+    Takes the snapshot of a subnet overview.
+    :param subnet: the subnet.
+    :param layout: name of the layout the positions were computed with.
+    :param devices: (ip, mac) tuples of the devices of the subnet.
+    :param topology: the topology drawn.
+    :param positions: node id -> (x, y) position of every node of the topology.
+    :return Snapshot:
+    """
+    coordinates = np.array([positions[node] for node in topology.nodes], dtype=np.float64).reshape(-1, 2)
+    return Snapshot(str(ipaddress.ip_network(str(subnet), strict=False)), layout, time.time(), list(devices),
+                    topology, coordinates)
+
+
+def save(snapshot: Snapshot, path: str) -> None:
+    """
+    Saves a snapshot, as JSON if the path ends with .json, in the binary format otherwise.
+    :param snapshot: the snapshot.
+    :param path: the path of the file.
+    :return None:
+    """
+    if path.lower().endswith(".json"):
+        save_json(snapshot, path)
+    else:
+        save_binary(snapshot, path)
+
+
+def load(path: str) -> Snapshot:
+    """
+    Loads a snapshot saved by save(), in either format.
+    :param path: the path of the file.
+    :return Snapshot:
+    """
+    with open(path, "rb") as file:
+        binary = file.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+    return load_binary(path) if binary else load_json(path)
+
+
+def save_json(snapshot: Snapshot, path: str) -> None:
+    """
+    Saves a snapshot as JSON.
+    :param snapshot: the snapshot.
+    :param path: the path of the file.
+    :return None:
+    """
+    topology = snapshot.topology
+    document = {"format": FORMAT_NAME, "version": FORMAT_VERSION, "subnet": snapshot.subnet,
+                "layout": snapshot.layout, "created": snapshot.created,
+                "devices": [[ip, mac] for ip, mac in snapshot.devices],
+                "nodes": topology.nodes, "labels": topology.labels, "hub": topology.hub,
+                "virtual_hub": topology.virtual_hub, "edges": topology.edges.tolist(),
+                "neighbor_edges": topology.neighbor_edges.tolist(),
+                "positions": np.round(snapshot.positions, 2).tolist()}
+    with open(path, "w") as file:
+        json.dump(document, file, separators=(",", ":"))
+
+
+def load_json(path: str) -> Snapshot:
+    """
+    Loads a snapshot saved as JSON.
+    :param path: the path of the file.
+    :return Snapshot:
+    """
+    with open(path) as file:
+        document = json.load(file)
+    _check_format(document.get("format"), document.get("version"), path)
+    topology = Topology(document["nodes"], document["labels"], document["hub"], document["virtual_hub"],
+                        np.array(document["edges"], dtype=np.int64).reshape(-1, 2),
+                        np.array(document["neighbor_edges"], dtype=np.int64).reshape(-1, 2))
+    return Snapshot(document["subnet"], document["layout"], document["created"],
+                    [(ip, mac) for ip, mac in document["devices"]], topology,
+                    np.array(document["positions"], dtype=np.float64).reshape(-1, 2))
+
+
+def save_binary(snapshot: Snapshot, path: str) -> None:
+    """
+    Saves a snapshot in the binary format. Written through a file object, so no .npz suffix is appended.
+    :param snapshot: the snapshot.
+    :param path: the path of the file.
+    :return None:
+    """
+    topology = snapshot.topology
+    ips = [ip for ip, _ in snapshot.devices]
+    macs = [mac for _, mac in snapshot.devices]
+    with open(path, "wb") as file:
+        np.savez_compressed(file, format=np.array(FORMAT_NAME), version=np.array(FORMAT_VERSION),
+                            subnet=np.array(snapshot.subnet), layout=np.array(snapshot.layout),
+                            created=np.array(snapshot.created), ips=device_table.ips_to_ints(ips),
+                            macs=device_table.macs_to_ints(macs), nodes=_pack_strings(topology.nodes),
+                            labels=_pack_strings(topology.labels), hub=np.array(topology.hub),
+                            virtual_hub=np.array(topology.virtual_hub), edges=topology.edges.astype(np.int32),
+                            neighbor_edges=topology.neighbor_edges.astype(np.int32),
+                            positions=snapshot.positions.astype(np.float32))
+
+
+def load_binary(path: str) -> Snapshot:
+    """
+    Loads a snapshot saved in the binary format.
+    :param path: the path of the file.
+    :return Snapshot:
+    """
+    with np.load(path, allow_pickle=False) as archive:
+        _check_format(str(archive["format"]) if "format" in archive else None,
+                      int(archive["version"]) if "version" in archive else None, path)
+        devices = list(zip(device_table.ints_to_ips(archive["ips"]), device_table.ints_to_macs(archive["macs"])))
+        topology = Topology(_unpack_strings(archive["nodes"]), _unpack_strings(archive["labels"]),
+                            int(archive["hub"]), bool(archive["virtual_hub"]),
+                            archive["edges"].astype(np.int64).reshape(-1, 2),
+                            archive["neighbor_edges"].astype(np.int64).reshape(-1, 2))
+        return Snapshot(str(archive["subnet"]), str(archive["layout"]), float(archive["created"]), devices,
+                        topology, archive["positions"].astype(np.float64).reshape(-1, 2))
+
+
+def _check_format(name, version, path: str) -> None:
+    """
+    Checks the format and version read from a snapshot file.
+    :param name: the format name read.
+    :param version: the format version read.
+    :param path: the path of the file, for the error message.
+    :return None:
+    """
+    if name != FORMAT_NAME:
+        raise ValueError(f"{path} is not a network_visualizer snapshot")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"{path} is a version {version} snapshot, only version {FORMAT_VERSION} is supported")
+
+
+def _pack_strings(strings: [str]) -> np.ndarray:
+    """
+    Packs strings into a single array of bytes (UTF-8, separated by NUL bytes).
+    :param strings: the strings.
+    :return np.ndarray: uint8 array.
+    """
+    return np.frombuffer("\0".join(strings).encode(), dtype=np.uint8)
+
+
+def _unpack_strings(packed: np.ndarray) -> [str]:
+    """
+    Unpacks strings packed by _pack_strings().
+    :param packed: uint8 array.
+    :return list: the strings.
+    """
+    return packed.tobytes().decode().split("\0") if len(packed) else []
@@ -0,0 +1,111 @@
+"""
+This program was written by Yonatan Deri.
+It follows the PEP8 guidelines.
+
+Description:
+    This file serves as a module in the network_visualizer project.
+    It models the topology of a subnet as a star: every device is linked to a hub, which is the gateway when
+    it was discovered, or a virtual node standing for the broadcast domain otherwise. Optionally, the links of
+    the current device to the neighbours listed in its ARP table are added. Edges grow linearly with the hosts.
+
+License:
+    This program is under the GNU GPLv3 License.
+"""
+
+from typing import Iterable, NamedTuple, Optional
+
+import numpy as np
+
+NEIGHBOR_TABLE = "/proc/net/arp"
+ATF_COM = 0x2  # Flag of completed entries in the ARP table
+
+
+class Topology(NamedTuple):
+    """
+    Topology of a subnet. Nodes are identified by IP address, except the virtual hub (identified by the subnet).
+    """
+    nodes: [str]
+    labels: [str]
+    hub: int  # Index of the hub node
+    virtual_hub: bool  # Whether the hub is the broadcast domain rather than a discovered device
+    edges: np.ndarray  # (m, 2) node index pairs linking every node to the hub
+    neighbor_edges: np.ndarray  # (k, 2) node index pairs linking the current device to its ARP table neighbours
+
+    def all_edges(self) -> np.ndarray:
+        """
+        Gets the hub and neighbour edges together.
+        :return np.ndarray: (m + k, 2) array of node index pairs.
+        """
+        return np.concatenate((self.edges, self.neighbor_edges))
+
+
+def read_neighbor_table(path: str = NEIGHBOR_TABLE) -> {str: str}:
+    """
+    Reads the ARP (neighbour) table of the current device. Only available on Linux.
+    :param path: path of the kernel ARP table.
+    :return dict: IP address -> MAC address of every complete entry. Empty if the table cannot be read.
+    """
+    try:
+        with open(path, 'r') as file:
+            lines = file.readlines()[1:]
+    except OSError:
+        return {}
+    neighbors = {}
+    for line in lines:
+        fields = line.split()
+        if len(fields) >= 4 and int(fields[2], 16) & ATF_COM:
+            neighbors[fields[0]] = fields[3]
+    return neighbors
+
+
+def device_label(ip: str, mac: str, details: Optional[str] = None) -> str:
+    """
+    Gets the label of a device node.
+    :param ip: the IP address of the device.
+    :param mac: the MAC address of the device.
+    :param details: extra label line(s) (e.g. host name and vendor), if any.
+    :return str:
+    """
+    return f"{ip}\n{mac}\n{details}" if details else f"{ip}\n{mac}"
+
+
+def build_topology(subnet, devices: [(str, str)], gateways: Iterable[str] = (),
+                   neighbors: Iterable[str] = (), local_ip: Optional[str] = None,
+                   details: Optional[dict] = None) -> Topology:
+    """
+    Builds the star topology of a subnet.
+    :param subnet: the subnet.
+    :param devices: (ip, mac) tuples of the devices discovered in the subnet.
+    :param gateways: IP addresses of the gateways. The first one found among the devices becomes the hub.
+    :param neighbors: IP addresses of the ARP table entries of the current device.
+    :param local_ip: IP address of the current device in the subnet. If given, it is added as a node, linked to
+                     the neighbors found among the devices.
+    :param details: IP address -> extra label line(s) of the device (e.g. host name and vendor), if any.
+    :return Topology:
+    """
+    nodes = [ip for ip, _ in devices]
+    details = details or {}
+    labels = [device_label(ip, mac, details.get(ip)) for ip, mac in devices]
+    index = {ip: i for i, ip in enumerate(nodes)}
+    if local_ip is not None and local_ip not in index:
+        index[local_ip] = len(nodes)
+        nodes.append(local_ip)
+        labels.append(f"{local_ip}\n(this device)")
+
+    hub = next((index[gateway] for gateway in gateways if gateway in index), None)
+    virtual_hub = hub is None
+    if virtual_hub:
+        hub = len(nodes)
+        nodes.append(str(subnet))
+        labels.append(f"{subnet}\n(broadcast domain)")
+
+    others = np.array([i for i in range(len(nodes)) if i != hub], dtype=np.int64)
+    edges = np.column_stack((np.full(len(others), hub, dtype=np.int64), others))
+
+    neighbor_edges = np.empty((0, 2), dtype=np.int64)
+    if local_ip is not None:
+        local = index[local_ip]
+        linked = sorted({index[neighbor] for neighbor in neighbors if neighbor in index} - {local, hub})
+        neighbor_edges = np.column_stack((np.full(len(linked), local, dtype=np.int64),
+                                          np.array(linked, dtype=np.int64)))
+    return Topology(nodes, labels, hub, virtual_hub, edges, neighbor_edges)